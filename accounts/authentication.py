@@ -1,9 +1,14 @@
 from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework import exceptions
 import logging
 
+from . import user_cache
+from .models import ClaimsUser
+from .tokens import CLAIMS_VERSION
+
 logger = logging.getLogger(__name__)
 
 User = settings.AUTH_USER_MODEL
@@ -40,3 +45,43 @@ class CookieJWTAuthentication(JWTAuthentication):
             raise exceptions.AuthenticationFailed("Your account has been blocked. Please contact support.")
         
         return user, validated_token
+
+    def get_user(self, validated_token):
+        """
+        Same checks as JWTAuthentication.get_user, but served from the
+        per-worker user cache so most requests skip the accounts_user query.
+
+        Tokens carrying the current claim set resolve to a ClaimsUser built
+        from the token; only the cached revocation state is looked up.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if validated_token.get("cv") == CLAIMS_VERSION:
+            return self.get_claims_user(user_id, validated_token)
+
+        try:
+            user = user_cache.get_user(user_id)
+        except self.user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return user
+
+    def get_claims_user(self, user_id, validated_token):
+        try:
+            state = user_cache.get_auth_state(user_id)
+        except self.user_model.DoesNotExist:
+            raise exceptions.AuthenticationFailed("User not found", code="user_not_found")
+
+        if not state.is_active:
+            raise exceptions.AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if validated_token.get("tv") != state.token_version:
+            raise exceptions.AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        return ClaimsUser.from_claims(user_id, validated_token, state)
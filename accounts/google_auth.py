@@ -0,0 +1,106 @@
+"""
+Google ID token verification with cached signing certificates.
+
+google.oauth2.id_token.verify_oauth2_token() fetches Google's certs on
+every call. Here the certs are kept in-process for as long as Google's
+Cache-Control max-age allows (usually hours), so most logins are
+verified without any network traffic. Fetches go through the "google"
+session of core.http (pooled, with timeouts, retries and a circuit
+breaker). A token signed with a key id we have not seen yet forces one
+early refetch, which covers key rotation.
+
+Tests swap the fetcher: ``google_auth.certs.fetcher = stub`` where the
+stub returns ``(certs, max_age)``.
+"""
+import json
+import logging
+import re
+import threading
+import time
+
+from google.auth import exceptions
+from google.auth import jwt as google_jwt
+from google.auth.transport import requests as google_requests
+
+from core import http
+from core.instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+DEFAULT_MAX_AGE = 300  # when Google sends no usable Cache-Control
+MIN_REFETCH_INTERVAL = 60  # throttles refetches triggered by unknown key ids
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(cache_control):
+    match = _MAX_AGE_RE.search(cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_MAX_AGE
+
+
+def fetch_certs():
+    """Fetch Google's signing certs. Returns (certs, max_age_seconds)."""
+    with span("google"):
+        transport = google_requests.Request(session=http.session("google"))
+        response = transport(url=GOOGLE_CERTS_URL, method="GET", timeout=None)  # the session's timeouts
+    if response.status != 200:
+        raise exceptions.TransportError(f"Could not fetch certificates at {GOOGLE_CERTS_URL}")
+    return json.loads(response.data.decode("utf-8")), _max_age(response.headers.get("cache-control"))
+
+
+class CertCache:
+    """Thread-safe holder of the current certs and their expiry."""
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._certs = {}
+        self._expires_at = 0
+        self._fetched_at = 0
+
+    def get(self, key_id=None):
+        certs = self._certs
+        if time.time() < self._expires_at and (key_id is None or key_id in certs):
+            return certs
+
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            now = time.time()
+            fresh = now < self._expires_at
+            if fresh and (key_id is None or key_id in self._certs):
+                return self._certs
+            if fresh and now - self._fetched_at < MIN_REFETCH_INTERVAL:
+                return self._certs
+
+            certs, max_age = self.fetcher()
+            logger.info(f"Fetched {len(certs)} Google signing certs (max-age {max_age}s)")
+            self._certs = certs
+            self._fetched_at = now
+            self._expires_at = now + max_age
+            return certs
+
+
+certs = CertCache(fetch_certs)
+
+
+def verify_id_token(token, audience, clock_skew_in_seconds=10):
+    """
+    Drop-in for id_token.verify_oauth2_token(). Raises ValueError for any
+    invalid, expired or foreign token.
+    """
+    key_id = google_jwt.decode_header(token).get("kid")
+    info = google_jwt.decode(
+        token,
+        certs=certs.get(key_id),
+        audience=audience,
+        clock_skew_in_seconds=clock_skew_in_seconds,
+    )
+    if info.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {info.get('iss')}")
+    return info
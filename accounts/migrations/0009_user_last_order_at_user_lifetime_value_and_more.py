@@ -0,0 +1,81 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:48
+
+import core.db
+from django.db import migrations, models
+
+
+# Trigram indexes make the admin list's icontains search (UPPER(col) LIKE
+# UPPER('%term%')) index-backed on PostgreSQL. Other backends skip them.
+TRIGRAM_INDEXES = {
+    "user_email_trgm_idx": "email",
+    "user_first_name_trgm_idx": "first_name",
+    "user_last_name_trgm_idx": "last_name",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON accounts_user '
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def backfill_order_stats(apps, schema_editor):
+    from orders.events import rebuild_user_order_stats
+
+    rebuild_user_order_stats(
+        user_model=apps.get_model("accounts", "User"),
+        order_model=apps.get_model("orders", "Order"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_user_email_upper_idx'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('orders', '0010_orderstatushistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='last_order_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='lifetime_value',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-order_count', '-id'], name='user_order_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-lifetime_value', '-id'], name='user_lifetime_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=core.db.PortableIndex(models.OrderBy(models.F('last_order_at'), descending=True, nulls_last=True), models.OrderBy(models.F('id'), descending=True), name='user_last_order_idx'),
+        ),
+        migrations.RunPython(backfill_order_stats, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import F
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
+from core.db import PortableIndex
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -38,10 +42,63 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Embedded in issued JWTs; bumping it revokes every earlier token
+    token_version = models.PositiveIntegerField(default=0)
+
+    # Denormalized order stats, maintained by orders.events
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # paid orders
+    last_order_at = models.DateTimeField(null=True, blank=True)
+
     objects = UserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # Serves case-insensitive (iexact) email lookups
+            models.Index(Upper("email"), name="user_email_upper_idx"),
+            # Admin user list sort keys (keyset pagination tie-breaks on id)
+            models.Index(fields=["-order_count", "-id"], name="user_order_count_idx"),
+            models.Index(fields=["-lifetime_value", "-id"], name="user_lifetime_value_idx"),
+            # Nullable: matches the keyset ORDER BY (core.pagination puts NULLs last)
+            PortableIndex(F("last_order_at").desc(nulls_last=True), F("id").desc(), name="user_last_order_idx"),
+        ]
+
     def __str__(self):
         return self.email
+
+
+class ClaimsUser(User):
+    """
+    User built from access-token claims instead of a database row.
+
+    Only the claim fields (and the revocation state the authentication
+    class checked) are loaded; every other field is deferred. Touching a
+    deferred field loads the rest of the row in one query, so code that
+    needs more than the claims still works, it just pays for it.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, claims, state):
+        values = {field: claims.get(field) for field in ("email", "first_name", "last_name", "picture")}
+        values.update(
+            id=user_id,
+            is_staff=state.is_staff,
+            is_active=state.is_active,
+            is_block=state.is_block,
+            token_version=state.token_version,
+        )
+        # from_db() expects values in concrete field order
+        names = [f.attname for f in cls._meta.concrete_fields if f.attname in values]
+        return cls.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
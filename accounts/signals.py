@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import user_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # After commit, so other workers cannot re-cache the old row. Read pk
+    # now: delete() clears it before the transaction commits.
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_cache.invalidate_user(user_id))
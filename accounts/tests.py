@@ -1,3 +1,238 @@
+import time
+from unittest import mock
+
+import rsa
+from google.auth import crypt
+from google.auth import jwt as google_jwt
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts import google_auth, user_cache
+from core import ratelimit
+from accounts.models import ClaimsUser
+from accounts.tokens import CLAIMS_VERSION, ClaimsRefreshToken
+
+User = get_user_model()
+
+
+class CachedAuthenticationTests(TestCase):
+    """Test the per-worker user cache behind CookieJWTAuthentication"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='user@test.com', password='testpass123')
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def get_me(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/me/')
+        return response, len(queries)
+
+    def test_repeat_requests_skip_user_query(self):
+        response, first = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(first, 1)
+
+        response, second = self.get_me()
+        self.assertEqual(response.data['email'], 'user@test.com')
+        self.assertEqual(second, 0)
+
+    def test_blocking_invalidates_cached_user(self):
+        self.get_me()
+
+        admin = User.objects.create_user(email='admin@test.com', password='testpass123', is_staff=True)
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            admin_client.post(f'/api/panel/users/{self.user.id}/toggle-block/')
+
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidation_survives_shared_cache_eviction(self):
+        self.get_me()
+        # Another worker blocks the user; this one still has the old entry
+        User.objects.filter(pk=self.user.pk).update(is_block=True)
+        entries = dict(user_cache._users.items())
+        user_cache.invalidate_user(self.user.pk)
+        user_cache._users.update(entries)
+
+        caches['shared'].clear()  # culled, or flushed by the tiered cache
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.get_me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        response, _ = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ClaimsTokenTests(TestCase):
+    """Test access tokens that carry profile and role claims"""
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.store.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='user@test.com', password='testpass123', first_name='Ann', last_name='Lee'
+        )
+
+    def login(self):
+        response = self.client.post('/api/login/', {'email': 'user@test.com', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_me(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/me/')
+        return response, len(queries)
+
+    def test_login_issues_claims(self):
+        access = ClaimsRefreshToken(self.login()['refresh']).access_token
+        self.assertEqual(access['cv'], CLAIMS_VERSION)
+        self.assertEqual(access['email'], 'user@test.com')
+        self.assertEqual(access['first_name'], 'Ann')
+        self.assertFalse(access['is_staff'])
+        self.assertEqual(access['tv'], 0)
+
+    def test_me_is_served_from_claims(self):
+        access = self.login()['access']
+
+        response, first = self.get_me(access)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['first_name'], 'Ann')
+        self.assertEqual(first, 1)  # revocation state only
+
+        response, second = self.get_me(access)
+        self.assertEqual(response.data['email'], 'user@test.com')
+        self.assertEqual(second, 0)
+
+    def test_claims_user_loads_row_lazily(self):
+        token = ClaimsRefreshToken.for_user(self.user).access_token
+        user = ClaimsUser.from_claims(self.user.id, token, user_cache.get_auth_state(self.user.id))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user.last_name, 'Lee')
+            self.assertFalse(user.is_staff)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('testpass123'))
+            self.assertIsNotNone(user.created_at)
+            self.assertEqual(user.order_count, 0)
+
+    def test_blocking_revokes_issued_tokens(self):
+        tokens = self.login()
+
+        admin = User.objects.create_user(email='admin@test.com', password='testpass123', is_staff=True)
+        admin_client = APIClient()
+        admin_client.force_authenticate(user=admin)
+        for _ in range(2):  # block, then unblock
+            with self.captureOnCommitCallbacks(execute=True):
+                admin_client.post(f'/api/panel/users/{self.user.id}/toggle-block/')
+
+        response, _ = self.get_me(tokens['access'])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post('/api/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reissues_current_claims(self):
+        tokens = self.login()
+        User.objects.filter(pk=self.user.pk).update(first_name='Anne')
+
+        response = self.client.post('/api/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response, _ = self.get_me(response.data['access'])
+        self.assertEqual(response.data['first_name'], 'Anne')
+
+    def test_staff_claim_follows_current_role(self):
+        access = self.login()['access']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_staff = True
+            self.user.save()
+
+        response, _ = self.get_me(access)
+        self.assertTrue(response.data['is_staff'])
+
+
+@mock.patch('accounts.views.GOOGLE_CLIENT_ID', 'client-id')
+class GoogleLoginTests(TestCase):
+    """Test Google login against locally signed tokens and stubbed certs"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        public_key, private_key = rsa.newkeys(1024)
+        cls.signer = crypt.RSASigner.from_string(private_key.save_pkcs1(), key_id='key-1')
+        cls.public_pem = public_key.save_pkcs1().decode()
+
+    def setUp(self):
+        cache.clear()
+        ratelimit.store.clear()
+        self.fetches = 0
+        google_auth.certs.clear()
+        patcher = mock.patch.object(google_auth.certs, 'fetcher', self.fetch_certs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(google_auth.certs.clear)
+        self.client = APIClient()
+
+    def fetch_certs(self):
+        self.fetches += 1
+        return {'key-1': self.public_pem}, 3600
+
+    def id_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com',
+            'aud': 'client-id',
+            'iat': now,
+            'exp': now + 300,
+            'email': 'g@test.com',
+            'given_name': 'Gia',
+        }
+        payload.update(claims)
+        return google_jwt.encode(self.signer, payload).decode()
+
+    def login(self, token):
+        return self.client.post('/api/google/', {'id_token': token})
+
+    def test_certs_are_fetched_once(self):
+        for _ in range(3):
+            response = self.login(self.id_token())
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['first_name'], 'Gia')
+        self.assertEqual(self.fetches, 1)
+
+    def test_wrong_audience_is_rejected(self):
+        response = self.login(self.id_token(aud='someone-else'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_wrong_issuer_is_rejected(self):
+        response = self.login(self.id_token(iss='https://evil.example.com'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_certs_are_refetched(self):
+        self.login(self.id_token())
+        google_auth.certs._expires_at = 0
+        self.login(self.id_token())
+        self.assertEqual(self.fetches, 2)
 
-# Create your tests here.
+    def test_max_age_parsing(self):
+        self.assertEqual(google_auth._max_age('public, max-age=19845, must-revalidate'), 19845)
+        self.assertEqual(google_auth._max_age(None), google_auth.DEFAULT_MAX_AGE)
@@ -0,0 +1,42 @@
+"""
+JWTs that carry the user's profile and role claims.
+
+Access tokens minted here embed everything MeView and the usual
+permission checks read (id, email, name, picture, is_staff), so
+CookieJWTAuthentication can build a ClaimsUser without loading the row.
+
+Claims are versioned: "cv" is the claim-set layout (bump CLAIMS_VERSION
+when fields are added or renamed; older tokens then take the full-row
+path) and "tv" is the user's token_version at issue time. Bumping
+User.token_version (e.g. when an account is blocked) revokes every token
+issued before it.
+"""
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CLAIMS_VERSION = 1
+
+PROFILE_CLAIMS = ("email", "first_name", "last_name", "picture")
+
+
+def user_claims(user):
+    claims = {field: getattr(user, field) for field in PROFILE_CLAIMS}
+    claims.update({
+        "is_staff": user.is_staff,
+        "cv": CLAIMS_VERSION,
+        "tv": user.token_version,
+    })
+    return claims
+
+
+def set_user_claims(token, user):
+    for claim, value in user_claims(user).items():
+        token[claim] = value
+    return token
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """RefreshToken whose access tokens carry user_claims()."""
+
+    @classmethod
+    def for_user(cls, user):
+        return set_user_claims(super().for_user(user), user)
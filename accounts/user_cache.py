@@ -0,0 +1,92 @@
+"""
+Per-worker cache of authenticated users.
+
+CookieJWTAuthentication resolves the token's user id through get_user()
+(full row) or get_auth_state() (just the revocation / role columns, for
+claims-bearing tokens) instead of querying accounts_user on every
+request. Entries live in a bounded TTL/LRU cache inside each worker
+process.
+
+Cross-worker invalidation: every entry remembers the user's invalidation
+token from the "auth" cache (a file-based cache all workers on the host
+can see, which never culls). invalidate_user() drops the local entry and
+writes a new random token, so every other worker misses on its next
+lookup; any mismatch just means one extra query, never a stale user. A
+missing token is "0". Tokens expire after twice the local TTL, by when
+every entry cached before the invalidation has expired too, so reading
+"0" again cannot revive one. The TTL bounds staleness if the cache is
+unavailable.
+"""
+import copy
+import threading
+import uuid
+from collections import namedtuple
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+TOKEN_CACHE_ALIAS = "auth"
+
+AuthState = namedtuple("AuthState", ["token_version", "is_active", "is_block", "is_staff"])
+
+TTL = getattr(settings, "AUTH_USER_CACHE_TTL", 300)
+
+_users = TTLCache(maxsize=getattr(settings, "AUTH_USER_CACHE_MAXSIZE", 1024), ttl=TTL)
+_lock = threading.Lock()  # cachetools caches are not thread-safe
+
+
+def _token_key(user_id):
+    return f"auth:user-token:{user_id}"
+
+
+def _shared_token(user_id):
+    return caches[TOKEN_CACHE_ALIAS].get(_token_key(user_id), "0")
+
+
+def _cached(kind, user_id, load):
+    token = _shared_token(user_id)
+    with _lock:
+        entry = _users.get((kind, user_id))
+    if entry is not None and entry[1] == token:
+        return entry[0]
+
+    value = load()
+    with _lock:
+        _users[(kind, user_id)] = (value, token)
+    return value
+
+
+def get_user(user_id):
+    """
+    Return the User with ``user_id`` (a private copy, safe to mutate).
+    Raises User.DoesNotExist like a normal lookup.
+    """
+    user = _cached("user", user_id, lambda: get_user_model().objects.get(pk=user_id))
+    return copy.copy(user)
+
+
+def get_auth_state(user_id):
+    """
+    Return the user's AuthState (token version, active / blocked / staff
+    flags). Raises User.DoesNotExist like a normal lookup.
+    """
+    def load():
+        return AuthState(*get_user_model().objects.values_list(*AuthState._fields).get(pk=user_id))
+
+    return _cached("state", user_id, load)
+
+
+def invalidate_user(user_id):
+    """Forget ``user_id`` in this worker and tell every other worker to."""
+    with _lock:
+        _users.pop(("user", user_id), None)
+        _users.pop(("state", user_id), None)
+    caches[TOKEN_CACHE_ALIAS].set(_token_key(user_id), uuid.uuid4().hex, timeout=2 * TTL)
+
+
+def clear():
+    """Drop every locally cached user (tests)."""
+    with _lock:
+        _users.clear()
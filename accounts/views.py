@@ -5,17 +5,18 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django_ratelimit.decorators import ratelimit
-
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
 
+from google.auth.exceptions import TransportError
 from rest_framework import permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from core.ratelimit import ratelimit
+
+from . import google_auth
 from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
+from .tokens import ClaimsRefreshToken, set_user_claims
 
 User = get_user_model()
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
@@ -36,7 +37,7 @@ class RegisterView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         user = serializer.save()
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
 
         return Response(
             {
@@ -62,7 +63,7 @@ class LoginView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         user = serializer.validated_data["user"]
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
 
         return Response(
             {
@@ -91,9 +92,8 @@ class GoogleLoginView(APIView):
             )
 
         try:
-            info = id_token.verify_oauth2_token(
+            info = google_auth.verify_id_token(
                 token,
-                google_requests.Request(),
                 GOOGLE_CLIENT_ID,
                 clock_skew_in_seconds=10,
             )
@@ -120,7 +120,7 @@ class GoogleLoginView(APIView):
                     status=status.HTTP_403_FORBIDDEN,
                 )
 
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
 
             return Response(
                 {
@@ -138,6 +138,14 @@ class GoogleLoginView(APIView):
                 {"detail": "Invalid Google token"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except TransportError as e:
+            # Google certs unreachable (or its circuit is open): nothing the client did wrong
+            logger.error(f"Could not reach Google to verify token: {e}")
+            return Response(
+                {"detail": "Google sign-in is temporarily unavailable. Please try again."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "30"},
+            )
         except Exception as e:
             logger.exception(f"Unexpected error during Google login: {e}")
             return Response(
@@ -182,8 +190,13 @@ class RefreshView(APIView):
                     )
             except User.DoesNotExist:
                 return Response({"detail": "User not found"}, status=401)
-            
-            new_access = str(refresh.access_token)
+
+            # Refresh tokens minted before the last token_version bump are revoked
+            if refresh.get("tv", 0) != user.token_version:
+                return Response({"detail": "Refresh token revoked"}, status=401)
+
+            # Re-issue claims from the current row so profile edits show up
+            new_access = str(set_user_claims(refresh.access_token, user))
 
             return Response(
                 {"access": new_access},
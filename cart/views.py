@@ -1,6 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
 
 from .models import Cart, CartItem, Wishlist, WishlistItem
@@ -29,6 +30,7 @@ class CartDetailView(APIView):
 
     def get(self, request):
         cart = get_user_cart(request.user)
+        prefetch_related_objects([cart], "items__product")
         return Response(CartSerializer(cart).data)
 
 
@@ -134,6 +136,7 @@ class WishlistDetailView(APIView):
 
     def get(self, request):
         wishlist = get_user_wishlist(request.user)
+        prefetch_related_objects([wishlist], "items__product")
         return Response(WishlistSerializer(wishlist).data)
 
 
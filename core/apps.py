@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from . import http
+        from .instrumentation import install_serializer_timing
+
+        install_serializer_timing()
+        http.install()
@@ -0,0 +1,252 @@
+"""
+In-process endpoint benchmarks.
+
+Drives the key API endpoints through django.test.Client (full middleware
+and URL stack, no network) against whatever database is configured,
+normally one filled by ``manage.py seed_store``. Each scenario is timed
+per request and its DB queries counted through connection.execute_wrapper;
+results are plain dicts so ``manage.py bench_endpoints`` can write them to
+JSON and compare against an earlier run.
+
+Mutating scenarios (cart add, order create) really write: run them
+against a benchmark database, not production.
+"""
+import math
+import platform
+import random
+import subprocess
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.tokens import ClaimsRefreshToken
+from orders.models import Address, Order
+from products.models import Product
+
+from .cache import tiered
+
+BENCH_ADMIN_EMAIL = "bench-admin@seed.souled.test"
+SEARCH_TERMS = ["hoodie", "marvel", "oversized", "joggers", "naruto"]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Fixture:
+    """Users, tokens and product ids the scenarios need, taken from the seeded data."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        address = (
+            Address.objects.filter(user__is_active=True, user__is_block=False, user__is_staff=False)
+            .select_related("user").order_by("id").first()
+        )
+        if address is None:
+            raise BenchmarkError("No customer with an address; run `manage.py seed_store` first")
+        self.customer = address.user
+        self.address_id = address.pk
+
+        self.prices = dict(Product.objects.filter(stock__gte=50).order_by("id").values_list("id", "price")[:1000])
+        self.product_ids = list(self.prices)
+        if not self.product_ids:
+            raise BenchmarkError("No products in stock; run `manage.py seed_store` first")
+
+        admin, created = get_user_model().objects.get_or_create(
+            email=BENCH_ADMIN_EMAIL, defaults={"is_staff": True}
+        )
+        self.customer_client = self._client(self.customer)
+        self.admin_client = self._client(admin)
+
+    def _client(self, user):
+        token = ClaimsRefreshToken.for_user(user).access_token
+        return Client(SERVER_NAME="localhost", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def product_id(self):
+        return self.rng.choice(self.product_ids)
+
+
+# ----------------------------------------------------------------
+# Scenarios: name -> fn(fixture) returning a response
+# ----------------------------------------------------------------
+def catalog_list(fx):
+    return fx.customer_client.get("/api/products/", {"category": fx.rng.choice(("men", "women"))})
+
+
+def catalog_search(fx):
+    return fx.customer_client.get("/api/products/", {"search": fx.rng.choice(SEARCH_TERMS)})
+
+
+def cart_read(fx):
+    return fx.customer_client.get("/api/cart/")
+
+
+def cart_add(fx):
+    return fx.customer_client.post(
+        "/api/cart/add/", {"product_id": fx.product_id(), "quantity": 1}, content_type="application/json"
+    )
+
+
+def order_create(fx):
+    product_id = fx.product_id()
+    return fx.customer_client.post(
+        "/api/orders/create/",
+        {
+            "cart": [{"id": product_id, "name": "bench", "price": str(fx.prices[product_id]), "quantity": 1}],
+            "address_id": fx.address_id,
+            "payment_method": "cod",
+        },
+        content_type="application/json",
+    )
+
+
+def order_history(fx):
+    return fx.customer_client.get("/api/orders/my/")
+
+
+def panel_dashboard(fx):
+    return fx.admin_client.get("/api/panel/dashboard/")
+
+
+def panel_reports(fx):
+    return fx.admin_client.get("/api/panel/reports/", {"granularity": fx.rng.choice(("day", "week", "month"))})
+
+
+SCENARIOS = {
+    "catalog_list": catalog_list,
+    "catalog_search": catalog_search,
+    "cart_read": cart_read,
+    "cart_add": cart_add,
+    "order_create": order_create,
+    "order_history": order_history,
+    "panel_dashboard": panel_dashboard,
+    "panel_reports": panel_reports,
+}
+
+
+# ----------------------------------------------------------------
+# Running and reporting
+# ----------------------------------------------------------------
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _clear_caches():
+    tiered.clear()
+    cache.clear()
+
+
+def run_scenario(fn, fixture, iterations, warmup=3, cold=False):
+    """Run ``fn`` warmup + iterations times; returns the summary dict for the timed runs."""
+    latencies, queries, statuses = [], [], {}
+    for n in range(warmup + iterations):
+        if cold:
+            _clear_caches()
+        counter = _QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            start = time.perf_counter()
+            response = fn(fixture)
+            elapsed = time.perf_counter() - start
+        if n < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(counter.count)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    latencies.sort()
+    return {
+        "requests": iterations,
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else 0.0,
+        "max_queries": max(queries, default=0),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(names=None, iterations=50, warmup=3, cold=False, seed=0):
+    """Run the named scenarios (default: all) and return the full report."""
+    names = names or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise BenchmarkError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    dataset = {
+        "users": get_user_model().objects.count(),
+        "products": Product.objects.count(),
+        "orders": Order.objects.count(),
+    }
+    # Benchmarks measure, they do not enforce budgets or rate limits
+    with override_settings(QUERY_BUDGET_ACTION="log", RATELIMIT_ENABLE=False):
+        fixture = Fixture(seed)
+        results = {
+            name: run_scenario(SCENARIOS[name], fixture, iterations, warmup, cold)
+            for name in names
+        }
+
+    return {
+        "meta": {
+            "timestamp": timezone.now().isoformat(),
+            "commit": _git_commit(),
+            "database": connections["default"].vendor,
+            "python": platform.python_version(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "cold_cache": cold,
+            "dataset": dataset,
+        },
+        "scenarios": results,
+    }
+
+
+def compare(baseline, current, metrics=("p50_ms", "p95_ms", "p99_ms", "queries_per_request")):
+    """
+    Per-scenario change from ``baseline`` to ``current`` (two run() reports):
+    {scenario: {metric: (before, after, percent_change)}}.
+    """
+    diff = {}
+    for name, after in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        diff[name] = {}
+        for metric in metrics:
+            old, new = before.get(metric, 0), after.get(metric, 0)
+            change = (new - old) / old * 100 if old else 0.0
+            diff[name][metric] = (old, new, round(change, 1))
+    return diff
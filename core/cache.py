@@ -0,0 +1,234 @@
+"""
+Caching helpers built on Django's cache framework.
+
+TieredCache (the module-level ``tiered``) is the project cache layer:
+
+- L1: a bounded LRU with per-entry TTL inside each worker process.
+- L2: the "shared" Django cache (file-based), visible to every worker.
+- Keys are namespaced and versioned: invalidate("catalog") bumps the
+  namespace version in L2, orphaning every key in it at once. Other
+  workers notice within CACHE_VERSION_TTL seconds (their L1 copy of the
+  version), so L1 entries can never outlive an invalidation by more.
+- Concurrent misses for one key compute once across threads and worker
+  processes (core.singleflight); with ``stale_for`` the others are served
+  the previous value instead of waiting, even across a namespace bump.
+- Hit/miss counters per namespace, see stats().
+
+cached_view() and cached_queryset() wrap views and query functions.
+"""
+import hashlib
+import threading
+from collections import Counter, defaultdict
+from functools import wraps
+
+from cachetools import TLRUCache, TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from . import metrics, singleflight
+
+MISSING = object()
+
+
+# ----------------------------------------------------------------
+# Tiered cache
+# ----------------------------------------------------------------
+class TieredCache:
+    def __init__(self, l2_alias="shared", l1_maxsize=None, l1_ttl=None, version_ttl=None, wait_timeout=None):
+        self.l2_alias = l2_alias
+        self.l1_ttl = l1_ttl if l1_ttl is not None else getattr(settings, "CACHE_L1_TTL", 30)
+        self._l1 = TLRUCache(
+            maxsize=l1_maxsize or getattr(settings, "CACHE_L1_MAXSIZE", 2048),
+            ttu=lambda key, entry, now: now + entry[1],
+        )
+        self._versions = TTLCache(
+            maxsize=256,
+            ttl=version_ttl if version_ttl is not None else getattr(settings, "CACHE_VERSION_TTL", 2),
+        )
+        # How long a caller waits for another's computation before doing its own
+        self.wait_timeout = wait_timeout if wait_timeout is not None else getattr(settings, "CACHE_WAIT_TIMEOUT", 5)
+        self._lock = threading.Lock()  # guards L1, versions and metrics
+        self._metrics = defaultdict(Counter)
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    # Keys ------------------------------------------------------------
+    def _version_key(self, namespace):
+        return f"cache-ns:{namespace}"
+
+    def version(self, namespace):
+        with self._lock:
+            version = self._versions.get(namespace)
+        if version is None:
+            key = self._version_key(namespace)
+            self.l2.add(key, 1, timeout=None)
+            version = self.l2.get(key, 1)
+            with self._lock:
+                self._versions[namespace] = version
+        return version
+
+    def _digest(self, key):
+        return hashlib.sha1(str(key).encode()).hexdigest()
+
+    def make_key(self, namespace, key):
+        return f"{namespace}:v{self.version(namespace)}:{self._digest(key)}"
+
+    def _stale_key(self, namespace, key):
+        # Unversioned, so it survives invalidate() as the fallback value
+        return f"{namespace}:stale:{self._digest(key)}"
+
+    def invalidate(self, namespace):
+        """Orphan every key in ``namespace`` (all workers, within CACHE_VERSION_TTL)."""
+        key = self._version_key(namespace)
+        self.l2.add(key, 1, timeout=None)
+        try:
+            version = self.l2.incr(key)
+        except ValueError:  # culled between add and incr
+            version = 2
+            self.l2.set(key, version, timeout=None)
+        with self._lock:
+            self._versions[namespace] = version
+        self._count(namespace, "invalidations")
+
+    # Reads / writes --------------------------------------------------
+    def _count(self, namespace, metric):
+        with self._lock:
+            self._metrics[namespace][metric] += 1
+        metrics.CACHE_EVENTS.labels(namespace, metric).inc()
+
+    def _lookup(self, namespace, full_key):
+        with self._lock:
+            entry = self._l1.get(full_key)
+        if entry is not None:
+            self._count(namespace, "l1_hits")
+            return entry[0]
+
+        value = self.l2.get(full_key, MISSING)
+        if value is not MISSING:
+            self._count(namespace, "l2_hits")
+            with self._lock:
+                self._l1[full_key] = (value, self.l1_ttl)
+        return value
+
+    def _store(self, full_key, value, timeout):
+        self.l2.set(full_key, value, timeout=timeout)
+        with self._lock:
+            self._l1[full_key] = (value, self.l1_ttl if timeout is None else min(self.l1_ttl, timeout))
+
+    def get(self, namespace, key, default=None):
+        value = self._lookup(namespace, self.make_key(namespace, key))
+        if value is MISSING:
+            self._count(namespace, "misses")
+            return default
+        return value
+
+    def set(self, namespace, key, value, timeout=60):
+        self._store(self.make_key(namespace, key), value, timeout)
+
+    def get_or_set(self, namespace, key, compute, timeout=60, cacheable=None, stale_for=0):
+        """
+        Return the cached value, or compute and store it.
+
+        Concurrent misses for the same key (any thread or worker on the
+        host) share one computation. With ``stale_for`` > 0 the value is
+        also kept that much longer as a stale copy, which callers that
+        lose the race get immediately instead of waiting. A caller that
+        waits longer than wait_timeout computes on its own.
+        ``cacheable(value)`` may veto storing a result (e.g. error responses).
+        """
+        full_key = self.make_key(namespace, key)
+        value = self._lookup(namespace, full_key)
+        if value is not MISSING:
+            return value
+
+        stale_key = self._stale_key(namespace, key)
+        if stale_for:
+            with singleflight.acquire(full_key, timeout=0) as leader:
+                if leader:
+                    return self._compute(namespace, full_key, compute, timeout, cacheable, stale_key, stale_for)
+            stale = self.l2.get(stale_key, MISSING)
+            if stale is not MISSING:
+                self._count(namespace, "stale_hits")
+                return stale
+
+        with singleflight.acquire(full_key, timeout=self.wait_timeout) as leader:
+            if not leader:
+                self._count(namespace, "wait_timeouts")
+            return self._compute(namespace, full_key, compute, timeout, cacheable, stale_key, stale_for)
+
+    def _compute(self, namespace, full_key, compute, timeout, cacheable, stale_key, stale_for):
+        # Someone else may have filled it while we waited
+        value = self._lookup(namespace, full_key)
+        if value is not MISSING:
+            return value
+
+        self._count(namespace, "misses")
+        value = compute()
+        if cacheable is None or cacheable(value):
+            self._store(full_key, value, timeout)
+            if stale_for:
+                self.l2.set(stale_key, value, timeout=None if timeout is None else timeout + stale_for)
+        return value
+
+    # Introspection ---------------------------------------------------
+    def stats(self):
+        """
+        {namespace: {"l1_hits", "l2_hits", "stale_hits", "misses",
+        "wait_timeouts", "invalidations"}} for this process.
+        """
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._metrics.items()}
+
+    def clear(self):
+        """Drop L1, versions and metrics here, and the whole L2 (tests)."""
+        with self._lock:
+            self._l1.clear()
+            self._versions.clear()
+            self._metrics.clear()
+        self.l2.clear()
+
+
+tiered = TieredCache()
+
+
+def cached_view(namespace, timeout=60, per_user=False, stale_for=0):
+    """
+    Cache a DRF view method's successful response data in ``tiered``,
+    keyed on the full request path (and the user when ``per_user``).
+    See TieredCache.get_or_set for ``stale_for``.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapped(view, request, *args, **kwargs):
+            key = request.get_full_path()
+            if per_user:
+                key = f"{request.user.pk}:{key}"
+
+            def compute():
+                response = method(view, request, *args, **kwargs)
+                return response.status_code, response.data
+
+            status_code, data = tiered.get_or_set(
+                namespace, key, compute, timeout=timeout, stale_for=stale_for,
+                cacheable=lambda result: result[0] == 200,
+            )
+            return Response(data, status=status_code)
+        return wrapped
+    return decorator
+
+
+def cached_queryset(namespace, timeout=60):
+    """
+    Cache the evaluated result (a list) of a function returning a queryset,
+    keyed on the function and its arguments.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            key = f"{fn.__module__}.{fn.__qualname__}:{args!r}:{sorted(kwargs.items())!r}"
+            return tiered.get_or_set(namespace, key, lambda: list(fn(*args, **kwargs)), timeout=timeout)
+        return wrapped
+    return decorator
@@ -0,0 +1,116 @@
+"""
+Database connection helpers.
+
+observe_pools() copies the psycopg pool counters (see settings.DB_POOL)
+into the Prometheus metrics in core.metrics. InstrumentationMiddleware
+calls it after each request, at most every DB_POOL_METRICS_INTERVAL
+seconds per worker, and the /metrics view before rendering.
+
+PortableIndex is a models.Index whose NULLS LAST orderings SQLite can
+build too.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models import OrderBy
+
+from . import metrics
+
+# alias -> the cumulative pool counters already added to the metrics
+_reported = {}
+_observed_at = float("-inf")
+_lock = threading.Lock()
+
+
+def pool_stats(alias=DEFAULT_DB_ALIAS):
+    """
+    Counters from the psycopg connection pool behind ``alias`` (see
+    settings.DB_POOL), or None when the alias is not pooled.
+
+    Counters are cumulative for the worker process. Besides psycopg's own
+    keys (pool_size, pool_available, requests_waiting, requests_num,
+    requests_wait_ms, connections_ms, ...) this adds requests_wait_ms_avg,
+    the mean time a request waited for a free connection.
+    """
+    pool = getattr(connections[alias], "pool", None)
+    if pool is None:
+        return None
+    return summarize_pool(pool)
+
+
+def summarize_pool(pool):
+    stats = pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    stats["requests_wait_ms_avg"] = stats.get("requests_wait_ms", 0) / requests if requests else 0.0
+    return stats
+
+
+def observe_pools(force=False):
+    """Update the db_pool_* metrics from every pooled alias (throttled unless ``force``)."""
+    global _observed_at
+    interval = getattr(settings, "DB_POOL_METRICS_INTERVAL", 5)
+    now = time.monotonic()
+    if not force and now - _observed_at < interval:
+        return
+    if not _lock.acquire(blocking=False):
+        return  # another thread is on it
+    try:
+        _observed_at = now
+        for alias in connections:
+            stats = pool_stats(alias)
+            if stats is not None:
+                record_pool(alias, stats)
+    finally:
+        _lock.release()
+
+
+def record_pool(alias, stats):
+    size, idle = stats.get("pool_size", 0), stats.get("pool_available", 0)
+    metrics.DB_POOL_CONNECTIONS.labels(alias, "idle").set(idle)
+    metrics.DB_POOL_CONNECTIONS.labels(alias, "in_use").set(max(size - idle, 0))
+    metrics.DB_POOL_WAITING.labels(alias).set(stats.get("requests_waiting", 0))
+
+    # psycopg only reports cumulative counters: add what is new since last time
+    counters = {key: stats.get(key, 0) for key in ("requests_num", "requests_queued", "requests_errors",
+                                                   "requests_wait_ms")}
+    previous = _reported.get(alias, {})
+    delta = {key: value - previous.get(key, 0) for key, value in counters.items()}
+    if any(value < 0 for value in delta.values()):  # a new pool started counting from zero
+        delta = counters
+    _reported[alias] = counters
+
+    waited = delta["requests_queued"] - delta["requests_errors"]
+    for outcome, count in (("immediate", delta["requests_num"] - delta["requests_queued"]),
+                           ("waited", waited), ("timeout", delta["requests_errors"])):
+        if count > 0:
+            metrics.DB_POOL_REQUESTS.labels(alias, outcome).inc(count)
+    if delta["requests_wait_ms"] > 0:
+        metrics.DB_POOL_WAIT.labels(alias).inc(delta["requests_wait_ms"] / 1000)
+
+
+def _sqlite_ordering(expression):
+    if isinstance(expression, OrderBy) and (
+        (expression.nulls_last and expression.descending) or (expression.nulls_first and not expression.descending)
+    ):
+        expression = expression.copy()
+        expression.nulls_first = expression.nulls_last = None
+    return expression
+
+
+class PortableIndex(models.Index):
+    """
+    Index whose NULLS FIRST/LAST orderings (e.g. the keyset paginator's
+    ``DESC NULLS LAST``, see core.pagination) SQLite can build too. SQLite
+    rejects the modifier in CREATE INDEX but already sorts NULLs first
+    ascending and last descending, so there it is dropped when it says the
+    same thing.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        index = self
+        if schema_editor.connection.vendor == "sqlite" and self.expressions:
+            index = self.clone()
+            index.expressions = tuple(_sqlite_ordering(expression) for expression in self.expressions)
+        return models.Index.create_sql(index, model, schema_editor, using=using, **kwargs)
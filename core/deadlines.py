@@ -0,0 +1,150 @@
+"""
+Per-request deadlines and load shedding.
+
+Every view belongs to a request class (settings.REQUEST_CLASSES):
+"critical" (checkout and payments), "default", "low" (panel analytics)
+or "export" (streaming exports). A view declares ``request_class = "low"``;
+settings.REQUEST_CLASS_ROUTES ({view name: class}) overrides it.
+
+nginx stamps each request with ``X-Request-Start: t=<epoch seconds>``, so
+by the time a worker picks a request up we know how long it queued. A
+request whose class has ``shed_after`` set and that waited longer than
+that gets an immediate 503 with Retry-After instead of running: under a
+spike, low-priority work goes first (after a short wait), everything but
+checkout goes once its client has likely given up (after its deadline),
+and critical requests are never shed. Without the header (local runs,
+tests) nothing is shed.
+
+On Postgres each request also runs under a statement_timeout: its class's
+limit, or what is left of its deadline after queueing if that is less.
+A class without a limit (exports, whose server-side cursor is one
+statement for the whole stream) runs with none. The SET is only sent
+when a connection's current value differs, so steady traffic of one
+class costs no extra round trips. A streaming response's body is read
+after the view returns, so its queries are kept under the request's
+setting too. A statement cancelled by the timeout becomes a 503 as well.
+"""
+import logging
+import math
+import time
+import weakref
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import JsonResponse
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASS = "default"
+
+# raw DB connection -> statement_timeout (ms) it currently has
+_applied_timeouts = weakref.WeakKeyDictionary()
+
+
+def queue_wait(request, now=None):
+    """Seconds since nginx received ``request`` (X-Request-Start), or None."""
+    header = request.META.get("HTTP_X_REQUEST_START", "")
+    try:
+        started = float(header.removeprefix("t="))
+    except ValueError:
+        return None
+    # nginx's $msec is seconds; some proxies send milli- or microseconds
+    while started > 1e11:
+        started /= 1000
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+
+def request_class(request, view_class):
+    view_name = request.resolver_match.view_name if request.resolver_match else None
+    routes = getattr(settings, "REQUEST_CLASS_ROUTES", {})
+    if view_name in routes:
+        return routes[view_name]
+    return getattr(view_class, "request_class", DEFAULT_CLASS)
+
+
+class StatementTimeout:
+    """execute_wrapper that sets statement_timeout on Postgres before the first query."""
+
+    def __init__(self):
+        self.timeout_ms = None
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context["connection"]
+        if self.timeout_ms is not None and connection.vendor == "postgresql":
+            raw = connection.connection
+            if _applied_timeouts.get(raw) != self.timeout_ms:
+                with raw.cursor() as cursor:
+                    cursor.execute("SELECT set_config('statement_timeout', %s, false)", [str(self.timeout_ms)])
+                # A rolled-back transaction would undo the SET, so only remember it in autocommit
+                if not connection.in_atomic_block:
+                    _applied_timeouts[raw] = self.timeout_ms
+                else:
+                    _applied_timeouts.pop(raw, None)
+        return execute(sql, params, many, context)
+
+
+class DeadlineMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "DEADLINES_ENABLED", True):
+            return self.get_response(request)
+        request.statement_timeout = StatementTimeout()
+        with self.timed(request):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(request, response.streaming_content)
+        return response
+
+    def timed(self, request):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(request.statement_timeout))
+        return stack
+
+    def stream(self, request, content):
+        with self.timed(request):
+            yield from content
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not hasattr(request, "statement_timeout"):
+            return None
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        name = request_class(request, view_class)
+        conf = settings.REQUEST_CLASSES[name]
+        wait = queue_wait(request)
+
+        if wait is not None:
+            metrics.REQUEST_QUEUE_WAIT.labels(name).observe(wait)
+            if conf.get("shed_after") is not None and wait > conf["shed_after"]:
+                metrics.REQUESTS_SHED.labels(name).inc()
+                logger.warning(f"Shed {request.method} {request.path} ({name}) after {wait:.1f}s in queue")
+                return self.unavailable("Server busy, please retry shortly", retry_after=wait)
+
+        timeout = conf["statement_timeout"]
+        if timeout is None:
+            request.statement_timeout.timeout_ms = 0  # Postgres: no limit
+            return None
+        if wait is not None and conf.get("shed_after") is not None:
+            timeout = min(timeout, max(conf["deadline"] - wait, 1))
+        request.statement_timeout.timeout_ms = int(timeout * 1000)
+        return None
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, OperationalError) and "statement timeout" in str(exception):
+            logger.error(f"{request.method} {request.path} hit its statement_timeout")
+            return self.unavailable("Request took too long, please retry shortly")
+        return None
+
+    def unavailable(self, message, retry_after=None):
+        seconds = getattr(settings, "LOAD_SHED_RETRY_AFTER", 5)
+        if retry_after:
+            seconds = min(max(seconds, math.ceil(retry_after)), 60)
+        response = JsonResponse({"error": message}, status=503)
+        response["Retry-After"] = str(seconds)
+        return response
@@ -0,0 +1,180 @@
+"""
+In-process stand-in for the parts of the stripe library the checkout uses.
+
+Used instead of ``stripe`` when settings.STRIPE_FAKE is on (the local
+profile without Stripe keys), so checkout can be run, load tested and
+profiled with no network:
+
+- checkout.Session.create()/retrieve() sleep STRIPE_FAKE_LATENCY_MS to
+  stand in for the API round trip. Sessions live in the "shared" cache so
+  every gunicorn worker sees them.
+- STRIPE_FAKE_PAY_AFTER seconds after a session is created, the fake
+  customer pays: the session turns "paid" and a signed
+  checkout.session.completed event is posted to the webhook view in
+  process, through the full middleware stack. A negative value turns this
+  off; complete_session() does the same thing on demand.
+- Webhook.construct_event() checks the signature the same way Stripe does
+  (HMAC-SHA256 of "<timestamp>.<payload>" with STRIPE_WEBHOOK_SECRET).
+"""
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+api_key = None  # assigned by callers, like stripe.api_key
+
+SESSION_TTL = 86400
+SIGNATURE_TOLERANCE = 300  # seconds, as in stripe.Webhook
+
+
+class StripeObject(dict):
+    """dict with attribute access, like stripe.StripeObject."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class error:
+    class StripeError(Exception):
+        pass
+
+    class InvalidRequestError(StripeError):
+        pass
+
+    class APIConnectionError(StripeError):
+        pass
+
+    class SignatureVerificationError(StripeError):
+        pass
+
+
+def _cache():
+    return caches["shared"]
+
+
+def _session_key(session_id):
+    return f"fake-stripe:session:{session_id}"
+
+
+def _latency():
+    delay = getattr(settings, "STRIPE_FAKE_LATENCY_MS", 0)
+    if delay > 0:
+        time.sleep(delay / 1000)
+
+
+class checkout:
+    class Session:
+        @staticmethod
+        def create(**params):
+            _latency()
+            session_id = f"cs_fake_{uuid.uuid4().hex}"
+            session = {
+                "id": session_id,
+                "object": "checkout.session",
+                "created": int(time.time()),
+                "metadata": {key: str(value) for key, value in params.get("metadata", {}).items()},
+                "payment_status": "unpaid",
+                "status": "open",
+                "amount_total": sum(
+                    item["price_data"]["unit_amount"] * item.get("quantity", 1)
+                    for item in params.get("line_items", [])
+                ),
+                # Checkout "completes" straight away: send the browser to the success page
+                "url": params.get("success_url", "").replace("{CHECKOUT_SESSION_ID}", session_id),
+            }
+            _cache().set(_session_key(session_id), session, SESSION_TTL)
+
+            pay_after = getattr(settings, "STRIPE_FAKE_PAY_AFTER", -1)
+            if pay_after >= 0:
+                timer = threading.Timer(pay_after, _complete_in_background, [session_id])
+                timer.daemon = True
+                timer.start()
+            return StripeObject(session)
+
+        @staticmethod
+        def retrieve(session_id):
+            _latency()
+            session = _cache().get(_session_key(session_id))
+            if session is None:
+                raise error.InvalidRequestError(f"No such checkout.session: '{session_id}'")
+            return StripeObject(session)
+
+
+def sign(payload, secret, timestamp=None):
+    """Return a Stripe-Signature header value for ``payload`` (bytes)."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Webhook:
+    @staticmethod
+    def construct_event(payload, sig_header, secret, tolerance=SIGNATURE_TOLERANCE):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        try:
+            parts = dict(item.split("=", 1) for item in (sig_header or "").split(","))
+            timestamp = int(parts["t"])
+        except (KeyError, ValueError):
+            raise error.SignatureVerificationError("Unable to extract timestamp and signatures from header")
+
+        expected = sign(payload, secret, timestamp).split("v1=", 1)[1]
+        if not hmac.compare_digest(expected, parts.get("v1", "")):
+            raise error.SignatureVerificationError("No signatures found matching the expected signature")
+        if tolerance and timestamp < time.time() - tolerance:
+            raise error.SignatureVerificationError("Timestamp outside the tolerance zone")
+        return json.loads(payload)
+
+
+def complete_session(session_id):
+    """
+    Pay ``session_id`` and deliver its checkout.session.completed webhook.
+    Returns the webhook response.
+    """
+    from django.test import Client
+    from django.urls import reverse
+
+    key = _session_key(session_id)
+    session = _cache().get(key)
+    if session is None:
+        raise error.InvalidRequestError(f"No such checkout.session: '{session_id}'")
+    session.update(payment_status="paid", status="complete")
+    _cache().set(key, session, SESSION_TTL)
+
+    event = {
+        "id": f"evt_fake_{uuid.uuid4().hex}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "created": int(time.time()),
+        "data": {"object": session},
+    }
+    payload = json.dumps(event).encode()
+    return Client(SERVER_NAME="localhost").post(
+        reverse("stripe-webhook"),
+        payload,
+        content_type="application/json",
+        HTTP_STRIPE_SIGNATURE=sign(payload, settings.STRIPE_WEBHOOK_SECRET),
+    )
+
+
+def _complete_in_background(session_id):
+    try:
+        response = complete_session(session_id)
+        logger.info(f"Fake Stripe webhook for {session_id}: {response.status_code}")
+    except Exception:
+        logger.exception(f"Fake Stripe webhook for {session_id} failed")
+    finally:
+        connections.close_all()
@@ -0,0 +1,39 @@
+"""
+Query-parameter helpers shared by the admin list and export filters.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def parse_day(params, name):
+    """Return ``params[name]`` (YYYY-MM-DD) as a date, or None when absent."""
+    value = str(params.get(name) or "").strip()
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValidationError({name: "Use YYYY-MM-DD format."})
+    return day
+
+
+def filter_date_range(queryset, params, field="created_at"):
+    """
+    Apply inclusive ``from`` / ``to`` day filters to a datetime field.
+
+    Half-open ranges on aware datetimes keep the field's index usable
+    (no __date cast).
+    """
+    start = parse_day(params, "from")
+    end = parse_day(params, "to")
+    if start:
+        queryset = queryset.filter(**{
+            f"{field}__gte": timezone.make_aware(datetime.combine(start, time.min))
+        })
+    if end:
+        queryset = queryset.filter(**{
+            f"{field}__lt": timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+        })
+    return queryset
@@ -0,0 +1,272 @@
+"""
+Shared outbound HTTP for third-party services.
+
+Every external service (settings.OUTBOUND_HTTP: stripe, google,
+cloudinary, default) gets, per process:
+
+- one keep-alive connection pool, so a call to a service we talked to
+  recently skips the TCP and TLS handshakes;
+- its own (connect, read) timeouts, applied whenever the caller passes
+  none;
+- bounded retries with backoff: connection errors always (the request
+  never left), 502/503/504 and read errors only for idempotent methods;
+- a circuit breaker: after ``breaker_failures`` failures in a row
+  (timeouts, connection errors, 5xx) calls fail fast with CircuitOpen for
+  ``breaker_reset`` seconds, then one probe call decides whether to close
+  it again. A provider brownout then costs each request milliseconds
+  instead of pinning a gunicorn thread until its timeout;
+- Prometheus metrics: outbound_requests_total{service,outcome},
+  outbound_request_duration_seconds{service} and
+  outbound_circuit_transitions_total{service,state}.
+
+``session(service)`` is a requests.Session for direct use (the Google
+certs fetch, image downloads). install(), called from CoreConfig.ready(),
+puts Stripe's client on the "stripe" session and Cloudinary's uploader
+on a urllib3 pool with the "cloudinary" settings; Cloudinary calls go
+through guard("cloudinary") in core.storage for the breaker and metrics.
+
+Tests point a service at a local server and call reset() after changing
+settings.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+import urllib3
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "connect_timeout": 3,
+    "read_timeout": 10,
+    "retries": 2,
+    "backoff": 0.2,  # seconds, doubled per retry
+    "pool_size": 10,
+    "breaker_failures": 5,
+    "breaker_reset": 30,
+}
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """Raised instead of calling a service whose circuit breaker is open."""
+
+
+def config(service):
+    return {**DEFAULTS, **settings.OUTBOUND_HTTP.get(service, {})}
+
+
+def timeout(service):
+    conf = config(service)
+    return (conf["connect_timeout"], conf["read_timeout"])
+
+
+def retry(service):
+    conf = config(service)
+    return Retry(
+        total=conf["retries"],
+        connect=conf["retries"],
+        read=conf["retries"],
+        status=conf["retries"],
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=conf["backoff"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+# ----------------------------------------------------------------
+# Circuit breaker
+# ----------------------------------------------------------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, service, failures, reset_after):
+        self.service = service
+        self.failures = failures
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+
+    def before(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                self._set(self.HALF_OPEN)  # this caller is the probe
+                return
+        raise CircuitOpen(f"{self.service} circuit is open")
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self._consecutive >= self.failures
+            ):
+                self._opened_at = time.monotonic()
+                self._set(self.OPEN)
+
+    def _set(self, state):
+        self.state = state
+        metrics.OUTBOUND_CIRCUIT_TRANSITIONS.labels(self.service, state).inc()
+        log = logger.warning if state == self.OPEN else logger.info
+        log(f"{self.service} circuit {state}")
+
+
+_breakers = {}
+_sessions = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(service):
+    try:
+        return _breakers[service]
+    except KeyError:
+        with _registry_lock:
+            if service not in _breakers:
+                conf = config(service)
+                _breakers[service] = CircuitBreaker(service, conf["breaker_failures"], conf["breaker_reset"])
+            return _breakers[service]
+
+
+def _before(service):
+    try:
+        breaker(service).before()
+    except CircuitOpen:
+        metrics.OUTBOUND_REQUESTS.labels(service, "circuit_open").inc()
+        raise
+
+
+def _record(service, start, outcome, ok):
+    metrics.OUTBOUND_LATENCY.labels(service).observe(time.perf_counter() - start)
+    metrics.OUTBOUND_REQUESTS.labels(service, outcome).inc()
+    if ok:
+        breaker(service).success()
+    else:
+        breaker(service).failure()
+
+
+@contextmanager
+def guard(service, answered=()):
+    """
+    Run an outbound call to ``service`` behind its circuit breaker, timed
+    into the outbound metrics, for SDKs that do not use session().
+    Exceptions in ``answered`` mean the service did respond (e.g. a 404)
+    and do not count against the breaker.
+    """
+    _before(service)
+    start = time.perf_counter()
+    try:
+        yield
+    except answered:
+        _record(service, start, "client_error", ok=True)
+        raise
+    except Exception:
+        _record(service, start, "error", ok=False)
+        raise
+    _record(service, start, "ok", ok=True)
+
+
+# ----------------------------------------------------------------
+# requests sessions
+# ----------------------------------------------------------------
+class ServiceSession(requests.Session):
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+        conf = config(service)
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=conf["pool_size"], max_retries=retry(service)
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.default_timeout = timeout(service)
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.default_timeout
+        _before(self.service)
+        start = time.perf_counter()
+        try:
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # A read timeout that used up the retries comes back as ConnectionError
+                reason = getattr(e.args[0] if e.args else None, "reason", None)
+                if isinstance(reason, urllib3.exceptions.ReadTimeoutError):
+                    raise requests.exceptions.ReadTimeout(*e.args, request=e.request) from e
+                raise
+        except requests.exceptions.Timeout:
+            _record(self.service, start, "timeout", ok=False)
+            raise
+        except requests.exceptions.RequestException:
+            _record(self.service, start, "connection_error", ok=False)
+            raise
+        if response.status_code >= 500:
+            _record(self.service, start, "server_error", ok=False)
+        else:
+            _record(self.service, start, "ok", ok=True)
+        return response
+
+
+def session(service="default"):
+    """The process-wide pooled requests.Session for ``service``."""
+    try:
+        return _sessions[service]
+    except KeyError:
+        with _registry_lock:
+            if service not in _sessions:
+                _sessions[service] = ServiceSession(service)
+            return _sessions[service]
+
+
+def pool_manager(service, **kwargs):
+    """A urllib3 PoolManager with ``service``'s pool size, timeouts and retries."""
+    conf = config(service)
+    return urllib3.PoolManager(
+        maxsize=conf["pool_size"],
+        timeout=urllib3.Timeout(connect=conf["connect_timeout"], read=conf["read_timeout"]),
+        retries=retry(service),
+        **kwargs,
+    )
+
+
+def reset():
+    """Forget all sessions and breakers (they are rebuilt from settings on next use)."""
+    with _registry_lock:
+        for pooled in _sessions.values():
+            pooled.close()
+        _sessions.clear()
+        _breakers.clear()
+
+
+def install():
+    """Route the Stripe and Cloudinary SDKs through the shared pools."""
+    import cloudinary
+    import cloudinary.api_client.call_api
+    import cloudinary.uploader
+    import stripe
+
+    stripe.default_http_client = stripe.RequestsClient(session=session("stripe"), timeout=timeout("stripe"))
+    stripe.max_network_retries = 0  # the session's adapter retries
+
+    cloudinary_pool = pool_manager("cloudinary", **cloudinary.CERT_KWARGS)
+    cloudinary.uploader._http = cloudinary_pool
+    cloudinary.api_client.call_api._http = cloudinary_pool
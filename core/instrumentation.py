@@ -0,0 +1,176 @@
+"""
+Per-request performance instrumentation.
+
+InstrumentationMiddleware records, for every request:
+
+- DB query count and time, through connection.execute_wrapper() on every
+  configured database alias;
+- time spent in named spans: "serialize" (DRF serializer .data) and the
+  external calls wrapped in span("stripe"), span("google") and
+  span("cloudinary");
+- total time.
+
+The figures go out in a Server-Timing header (visible in browser dev
+tools) and in one JSON log line on the "core.requests" logger.
+
+The same figures feed the Prometheus histograms in core.metrics.
+
+Query budgets: a view may declare ``query_budget = N`` and
+settings.QUERY_BUDGETS ({url name: N}) overrides it. A request that runs
+more queries logs a warning, or raises QueryBudgetExceeded when
+settings.QUERY_BUDGET_ACTION is "raise" (use that in tests/CI).
+"""
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+from . import db
+from . import metrics as prometheus
+
+logger = logging.getLogger("core.requests")
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.spans = {}  # name -> [count, seconds]
+        self.serializing = False
+
+    def add_span(self, name, seconds):
+        entry = self.spans.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+
+def current_metrics():
+    """The RequestMetrics of the request being served, or None."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time the block into the current request's ``name`` span (no-op outside requests)."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_span(name, time.perf_counter() - start)
+
+
+def install_serializer_timing():
+    """
+    Time BaseSerializer.data as the "serialize" span. A serializer whose
+    .data is read while another one is serializing (e.g. inside a
+    SerializerMethodField) is part of the outer span, not a new one.
+    Called from CoreConfig.ready().
+    """
+    original = serializers.BaseSerializer.data
+    if getattr(original.fget, "instrumented", False):
+        return
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return original.fget(self)
+        metrics.serializing = True
+        try:
+            with span("serialize"):
+                return original.fget(self)
+        finally:
+            metrics.serializing = False
+
+    data.instrumented = True
+    serializers.BaseSerializer.data = property(data)
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - metrics.started
+        if getattr(settings, "SERVER_TIMING_ENABLED", True):
+            response["Server-Timing"] = self.server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        prometheus.observe_request(
+            self._view_name(request) or "unmatched", request.method, response.status_code, total, metrics
+        )
+        db.observe_pools()
+        self.check_budget(request, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        request.query_budget = getattr(view_class, "query_budget", None)
+
+    def server_timing(self, metrics, total):
+        parts = [f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"']
+        for name, (count, seconds) in metrics.spans.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{count}x"')
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def _view_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        return match.view_name if match else None
+
+    def log(self, request, response, metrics, total):
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": self._view_name(request),
+            "status": response.status_code,
+            "duration_ms": round(total * 1000, 1),
+            "db_queries": metrics.db_queries,
+            "db_ms": round(metrics.db_time * 1000, 1),
+            "spans": {name: round(seconds * 1000, 1) for name, (_, seconds) in metrics.spans.items()},
+        }))
+
+    def check_budget(self, request, metrics):
+        budget = getattr(settings, "QUERY_BUDGETS", {}).get(self._view_name(request))
+        if budget is None:
+            budget = getattr(request, "query_budget", None)
+        if budget is None or metrics.db_queries <= budget:
+            return
+
+        message = f"{request.method} {request.path} ran {metrics.db_queries} queries (budget {budget})"
+        if getattr(settings, "QUERY_BUDGET_ACTION", "log") == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
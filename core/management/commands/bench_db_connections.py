@@ -0,0 +1,80 @@
+import copy
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db import summarize_pool
+
+
+class Command(BaseCommand):
+    help = "Compare per-request connection setup cost with and without the psycopg pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Requests per thread")
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--pool-size", type=int, default=4)
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor != "postgresql":
+            raise CommandError("This benchmark needs PostgreSQL (set DATABASE_URL)")
+
+        base = copy.deepcopy(connection.settings_dict)
+        base["CONN_MAX_AGE"] = 0  # a fresh connection per "request", like Django without persistence
+        base["OPTIONS"] = {k: v for k, v in base.get("OPTIONS", {}).items() if k != "pool"}
+
+        pooled = copy.deepcopy(base)
+        pooled["OPTIONS"]["pool"] = {
+            "min_size": options["pool_size"],
+            "max_size": options["pool_size"],
+            "timeout": 30,
+        }
+
+        for label, settings_dict in (("direct", base), ("pooled", pooled)):
+            latencies, stats = self.run(connection.__class__, settings_dict, f"bench-{label}", options)
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f"{label}: requests={len(latencies)} "
+                f"p50={quantiles[49] * 1e3:.2f}ms p95={quantiles[94] * 1e3:.2f}ms "
+                f"p99={quantiles[98] * 1e3:.2f}ms"
+            )
+            if stats:
+                self.stdout.write(
+                    f"  pool waits={stats.get('requests_waiting', 0)} "
+                    f"wait_ms_avg={stats['requests_wait_ms_avg']:.2f} "
+                    f"connections_opened={stats.get('connections_num', 0)}"
+                )
+
+    def run(self, wrapper_class, settings_dict, alias, options):
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            # Django connections are per thread; pooled ones share one pool per alias
+            conn = wrapper_class(settings_dict, alias=alias)
+            samples = []
+            for _ in range(options["iterations"]):
+                start = time.perf_counter()
+                conn.connect()
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.close()
+                samples.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(samples)
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        probe = wrapper_class(settings_dict, alias=alias)
+        stats = None
+        if probe.pool is not None:
+            stats = summarize_pool(probe.pool)
+            probe.close_pool()
+        return latencies, stats
@@ -0,0 +1,54 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark the key API endpoints in-process and save p50/p95/p99 and queries per request as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help=f"Default: all of {', '.join(benchmarks.SCENARIOS)}")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--cold", action="store_true", help="Clear caches before every request")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="JSON file to write (default: bench-results/<timestamp>.json)")
+        parser.add_argument("--compare", help="Earlier JSON result to diff against")
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmarks.run(
+                options["scenarios"], options["iterations"], options["warmup"], options["cold"], options["seed"]
+            )
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'scenario':<16} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}  statuses")
+        for name, result in report["scenarios"].items():
+            self.stdout.write(
+                f"{name:<16} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                f"{result['queries_per_request']:>8.1f}  {result['statuses']}"
+            )
+
+        output = options["output"] or os.path.join(
+            settings.BASE_DIR, "bench-results", f"{timezone.now():%Y%m%dT%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Saved {output}"))
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            self.stdout.write(f"\nvs {options['compare']} ({baseline['meta'].get('commit')}):")
+            for name, metrics in benchmarks.compare(baseline, report).items():
+                changes = "  ".join(
+                    f"{metric} {old}->{new} ({change:+.1f}%)" for metric, (old, new, change) in metrics.items()
+                )
+                self.stdout.write(f"{name:<16} {changes}")
@@ -0,0 +1,54 @@
+import multiprocessing
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from core.ratelimit import store
+
+
+def _worker(args):
+    key, hits, period, limit = args
+    latencies = []
+    allowed = 0
+    for _ in range(hits):
+        start = time.perf_counter()
+        estimate = store.hit(key, period)
+        latencies.append(time.perf_counter() - start)
+        if estimate <= limit:
+            allowed += 1
+    return latencies, allowed
+
+
+class Command(BaseCommand):
+    help = "Benchmark the shared rate limit store under multi-process contention"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--hits", type=int, default=2000, help="Hits per process")
+        parser.add_argument("--limit", type=int, default=1000, help="Limit on the shared key")
+        parser.add_argument("--period", type=int, default=3600)
+
+    def handle(self, *args, **options):
+        processes = options["processes"]
+        hits = options["hits"]
+        limit = options["limit"]
+        # Fresh key per run so earlier runs don't count against the limit
+        key = f"bench:{uuid.uuid4().hex}"
+
+        ctx = multiprocessing.get_context("fork")
+        started = time.perf_counter()
+        with ctx.Pool(processes) as pool:
+            results = pool.map(_worker, [(key, hits, options["period"], limit)] * processes)
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(sample for result in results for sample in result[0])
+        allowed = sum(result[1] for result in results)
+        quantiles = statistics.quantiles(latencies, n=100)
+
+        self.stdout.write(f"processes={processes} hits={len(latencies)} wall={elapsed:.2f}s "
+                          f"throughput={len(latencies) / elapsed:,.0f}/s")
+        self.stdout.write(f"latency_us p50={quantiles[49] * 1e6:.1f} p95={quantiles[94] * 1e6:.1f} "
+                          f"p99={quantiles[98] * 1e6:.1f} max={latencies[-1] * 1e6:.1f}")
+        self.stdout.write(f"allowed={allowed} limit={limit}")
@@ -0,0 +1,84 @@
+import multiprocessing
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from core.cache import tiered
+
+_computes = None
+
+
+def _init(counter):
+    global _computes
+    _computes = counter
+
+
+def _compute(compute_ms):
+    with _computes.get_lock():
+        _computes.value += 1
+    time.sleep(compute_ms / 1000)
+    return "payload"
+
+
+def _worker(args):
+    namespace, threads, compute_ms, mode = args
+    latencies = []
+    lock = threading.Lock()
+
+    def request():
+        start = time.perf_counter()
+        if mode == "none":
+            _compute(compute_ms)
+        else:
+            tiered.get_or_set(
+                namespace, "hot", lambda: _compute(compute_ms),
+                timeout=60, stale_for=60 if mode == "stale" else 0,
+            )
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    pool = [threading.Thread(target=request) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent recomputation of one expired cache entry"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent requests per process")
+        parser.add_argument("--compute-ms", type=int, default=200, help="Cost of one recomputation")
+        parser.add_argument("--mode", choices=("none", "coalesce", "stale"), default="coalesce",
+                            help="none: everyone recomputes; coalesce: one computes, others wait; "
+                                 "stale: one computes, others get the previous value")
+
+    def handle(self, *args, **options):
+        namespace = f"bench-{uuid.uuid4().hex[:8]}"
+        if options["mode"] == "stale":
+            # Leave a stale copy behind, as after a catalog version bump
+            tiered.get_or_set(namespace, "hot", lambda: "old", timeout=60, stale_for=60)
+            tiered.invalidate(namespace)
+
+        ctx = multiprocessing.get_context("fork")
+        computes = ctx.Value("i", 0)
+        started = time.perf_counter()
+        with ctx.Pool(options["processes"], initializer=_init, initargs=(computes,)) as pool:
+            results = pool.map(
+                _worker,
+                [(namespace, options["threads"], options["compute_ms"], options["mode"])] * options["processes"],
+            )
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(sample for result in results for sample in result)
+        quantiles = statistics.quantiles(latencies, n=100)
+        self.stdout.write(f"mode={options['mode']} requests={len(latencies)} computes={computes.value} "
+                          f"wall={elapsed:.2f}s")
+        self.stdout.write(f"latency_ms p50={quantiles[49] * 1e3:.1f} p95={quantiles[94] * 1e3:.1f} "
+                          f"max={latencies[-1] * 1e3:.1f}")
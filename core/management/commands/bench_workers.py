@@ -0,0 +1,124 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.tokens import ClaimsRefreshToken
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare gunicorn worker classes on Stripe checkout (POST /api/orders/create/) against the "
+        "fake Stripe with STRIPE_FAKE_LATENCY_MS of injected latency. Creates real orders: run it "
+        "with STORE_PROFILE=local on a database filled by seed_store"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-class", action="append", dest="worker_classes",
+                            help="Repeatable (default: sync and gthread)")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--stripe-latency-ms", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=32)
+
+    def handle(self, *args, **options):
+        if not settings.STRIPE_FAKE:
+            raise CommandError("This benchmark checks out against the fake Stripe (STORE_PROFILE=local)")
+        try:
+            fixture = benchmarks.Fixture()
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+        token = ClaimsRefreshToken.for_user(fixture.customer).access_token
+
+        for worker_class in options["worker_classes"] or ["sync", "gthread"]:
+            port = self.free_port()
+            server = self.start(worker_class, port, options)
+            try:
+                self.wait_for(port)
+                latencies, elapsed, errors = self.load(port, fixture, token, options)
+            finally:
+                server.terminate()
+                server.wait(timeout=10)
+
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+            self.stdout.write(
+                f"{worker_class}: workers={options['workers']} "
+                f"stripe={options['stripe_latency_ms']}ms requests={len(latencies)} errors={errors} "
+                f"throughput={len(latencies) / elapsed:.1f}/s "
+                f"p50={quantiles[49] * 1e3:.0f}ms p95={quantiles[94] * 1e3:.0f}ms"
+            )
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start(self, worker_class, port, options):
+        env = dict(
+            os.environ,
+            STRIPE_FAKE_LATENCY_MS=str(options["stripe_latency_ms"]),
+            STRIPE_FAKE_PAY_AFTER="-1",  # keep webhook deliveries out of the measurement
+        )
+        # gunicorn silently turns sync into gthread when threads > 1
+        threads = options["threads"] if worker_class != "sync" else 1
+        return subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "store.wsgi:application",
+                "--config", str(settings.BASE_DIR / "gunicorn_config.py"),
+                "--bind", f"127.0.0.1:{port}",
+                "--worker-class", worker_class,
+                "--workers", str(options["workers"]),
+                "--threads", str(threads),
+                "--access-logfile", "/dev/null",
+                "--log-level", "warning",
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+
+    def wait_for(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/health/", timeout=5).read()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("gunicorn did not start")
+
+    def load(self, port, fixture, token, options):
+        url = f"http://127.0.0.1:{port}/api/orders/create/"
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        bodies = []
+        for _ in range(options["requests"]):
+            product_id = fixture.product_id()
+            bodies.append(json.dumps({
+                "cart": [{"id": product_id, "name": "bench", "price": str(fixture.prices[product_id]), "quantity": 1}],
+                "address_id": fixture.address_id,
+                "payment_method": "stripe",
+            }).encode())
+
+        def request(body):
+            start = time.perf_counter()
+            try:
+                urllib.request.urlopen(urllib.request.Request(url, body, headers), timeout=60).read()
+            except OSError:  # includes HTTPError for non-2xx responses
+                return None
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            results = list(pool.map(request, bodies))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(r for r in results if r is not None)
+        return latencies, elapsed, len(results) - len(latencies)
@@ -0,0 +1,255 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import Cart, CartItem, Wishlist, WishlistItem
+from core.cache import tiered
+from orders import events
+from orders.models import Address, Order, OrderItem
+from orders.signals import rebuilding_stats
+from panel import rollups
+from products.models import Product
+
+SEED_EMAIL_DOMAIN = "seed.souled.test"
+SEED_PASSWORD = "seed-password"
+
+ADJECTIVES = ["Classic", "Oversized", "Vintage", "Graphic", "Relaxed", "Slim", "Washed", "Printed", "Cropped", "Heavy"]
+NOUNS = ["T-Shirt", "Hoodie", "Joggers", "Shirt", "Shorts", "Sweatshirt", "Jacket", "Polo", "Cargo Pants", "Tank Top"]
+THEMES = ["Marvel", "Batman", "Naruto", "Friends", "Star Wars", "Harry Potter", "Minions", "Pokemon", "F1", "Solids"]
+CITIES = ["Mumbai", "Bengaluru", "Kochi", "Chennai", "Delhi", "Pune", "Hyderabad", "Kolkata"]
+
+# (order_status, payment_status, weight): most orders are delivered and paid
+ORDER_MIX = [
+    ("delivered", "paid", 60),
+    ("shipped", "paid", 10),
+    ("processing", "paid", 8),
+    ("processing", "unpaid", 12),
+    ("cancelled", "unpaid", 10),
+]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the created_at values we generate instead of now()."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Generate a large synthetic catalog, user base and order history for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20_000)
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--orders", type=int, default=1_000_000)
+        parser.add_argument("--max-items", type=int, default=4, help="Items per order are 1..max-items")
+        parser.add_argument("--carts", type=float, default=0.3, help="Fraction of users with a cart and wishlist")
+        parser.add_argument("--days", type=int, default=365, help="Spread orders over this many past days")
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--seed", type=int, default=42, help="Same seed, same dataset")
+        parser.add_argument("--flush", action="store_true", help="Delete previously seeded data first")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+        User = get_user_model()
+
+        if options["flush"]:
+            self.flush()
+        elif User.objects.filter(email__endswith=f"@{SEED_EMAIL_DOMAIN}").exists():
+            raise CommandError("Seed data already present; rerun with --flush to replace it")
+
+        started = time.perf_counter()
+        users = self.seed_users(options["users"], options["days"])
+        products = self.seed_products(options["products"], options["days"])
+        addresses = self.seed_addresses(users)
+        self.seed_orders(options["orders"], addresses, products, options["max_items"], options["days"])
+        self.seed_carts(users, products, options["carts"])
+
+        self.step("Rebuilding sales rollups and user order stats")
+        with transaction.atomic():
+            rollups.rebuild()
+            events.rebuild_user_order_stats()
+        tiered.clear()
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s"))
+
+    def step(self, message):
+        self.stdout.write(message)
+
+    def flush(self):
+        self.step("Removing previous seed data")
+        User = get_user_model()
+        # Orders and cart rows go with their users; seeded products are matched by slug.
+        # Stats are rebuilt at the end, so no per-order updates on the way out
+        with rebuilding_stats():
+            Order.objects.filter(user__email__endswith=f"@{SEED_EMAIL_DOMAIN}").delete()
+            User.objects.filter(email__endswith=f"@{SEED_EMAIL_DOMAIN}").delete()
+        Product.objects.filter(slug__startswith="seed-").delete()
+
+    def insert(self, model, rows):
+        """bulk_create ``rows`` (an iterable) in batches; returns the saved objects with their pks."""
+        saved, batch = [], []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                saved.extend(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            saved.extend(model.objects.bulk_create(batch))
+        return saved
+
+    def past(self, days):
+        return self.now - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    # ----------------------------------------------------------------
+    # Users, products, addresses
+    # ----------------------------------------------------------------
+    def seed_users(self, count, days):
+        self.step(f"Creating {count} users")
+        User = get_user_model()
+        # Hashing is the slow part of creating users; every seeded user shares one hash
+        password = make_password(SEED_PASSWORD)
+        rng = self.rng
+
+        def rows():
+            for n in range(count):
+                yield User(
+                    email=f"user{n}@{SEED_EMAIL_DOMAIN}",
+                    first_name=rng.choice(THEMES).split()[0],
+                    last_name=f"Seed{n}",
+                    password=password,
+                    is_block=rng.random() < 0.01,
+                    created_at=self.past(days),
+                )
+
+        with explicit_timestamps(User._meta.get_field("created_at")):
+            return self.insert(User, rows())
+
+    def seed_products(self, count, days):
+        self.step(f"Creating {count} products")
+        rng = self.rng
+
+        def rows():
+            for n in range(count):
+                name = f"{rng.choice(THEMES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+                created = self.past(days)
+                yield Product(
+                    name=name,
+                    slug=f"seed-{n}",
+                    price=Decimal(rng.randrange(299, 2999)),
+                    category=rng.choice(("men", "women")),
+                    description=f"{name}. 100% cotton, regular fit.",
+                    stock=0 if rng.random() < 0.05 else rng.randrange(1, 500),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        fields = (Product._meta.get_field("created_at"), Product._meta.get_field("updated_at"))
+        with explicit_timestamps(*fields):
+            return self.insert(Product, rows())
+
+    def seed_addresses(self, users):
+        self.step(f"Creating {len(users)} addresses")
+        rng = self.rng
+        return self.insert(Address, (
+            Address(
+                user_id=user.pk,
+                full_name=f"{user.first_name} {user.last_name}",
+                phone=f"9{rng.randrange(10**9):09d}",
+                street=f"{rng.randrange(1, 400)} Main Road",
+                city=rng.choice(CITIES),
+                pincode=f"{rng.randrange(100000, 999999)}",
+            )
+            for user in users
+        ))
+
+    # ----------------------------------------------------------------
+    # Orders
+    # ----------------------------------------------------------------
+    def seed_orders(self, count, addresses, products, max_items, days):
+        if not count:
+            return
+        if not addresses or not products:
+            raise CommandError("Orders need at least one user and one product")
+
+        self.step(f"Creating {count} orders")
+        rng = self.rng
+        mix = [(order_status, payment_status) for order_status, payment_status, _ in ORDER_MIX]
+        weights = [weight for *_, weight in ORDER_MIX]
+        created_at = Order._meta.get_field("created_at")
+
+        # Orders and their items are written one batch at a time so memory stays flat
+        done = 0
+        while done < count:
+            size = min(self.batch_size, count - done)
+            orders, lines = [], []
+            for _ in range(size):
+                address = rng.choice(addresses)
+                items = [
+                    (product.pk, rng.randint(1, 3), product.price)
+                    for product in rng.sample(products, min(rng.randint(1, max_items), len(products)))
+                ]
+                order_status, payment_status = rng.choices(mix, weights)[0]
+                orders.append(Order(
+                    user_id=address.user_id,
+                    address_id=address.pk,
+                    payment_method="stripe" if rng.random() < 0.7 else "cod",
+                    payment_status=payment_status,
+                    order_status=order_status,
+                    total_amount=sum(price * quantity for _, quantity, price in items),
+                    created_at=self.past(days),
+                ))
+                lines.append(items)
+
+            with transaction.atomic(), explicit_timestamps(created_at):
+                orders = Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity, price=price)
+                        for order, items in zip(orders, lines)
+                        for product_id, quantity, price in items
+                    ],
+                    batch_size=self.batch_size,
+                )
+            done += size
+            self.step(f"  {done}/{count}")
+
+    # ----------------------------------------------------------------
+    # Carts and wishlists
+    # ----------------------------------------------------------------
+    def seed_carts(self, users, products, fraction):
+        shoppers = [user for user in users if self.rng.random() < fraction]
+        if not shoppers or not products:
+            return
+
+        self.step(f"Creating carts and wishlists for {len(shoppers)} users")
+        rng = self.rng
+        carts = self.insert(Cart, (Cart(user_id=user.pk) for user in shoppers))
+        wishlists = self.insert(Wishlist, (Wishlist(user_id=user.pk) for user in shoppers))
+
+        # rng.sample keeps products unique per cart/wishlist (unique_together)
+        self.insert(CartItem, (
+            CartItem(cart_id=cart.pk, product_id=product.pk, quantity=rng.randint(1, 3))
+            for cart in carts
+            for product in rng.sample(products, min(rng.randint(1, 5), len(products)))
+        ))
+        self.insert(WishlistItem, (
+            WishlistItem(wishlist_id=wishlist.pk, product_id=product.pk)
+            for wishlist in wishlists
+            for product in rng.sample(products, min(rng.randint(1, 8), len(products)))
+        ))
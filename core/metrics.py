@@ -0,0 +1,147 @@
+"""
+Prometheus metrics.
+
+Everything here is a prometheus_client metric on the default registry.
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn_config.py) makes
+every worker write its samples to mmap files in that directory; the
+/metrics view then merges all workers with a MultiProcessCollector, so a
+scrape sees the whole host and not whichever worker answered it.
+
+Request metrics are fed by core.instrumentation; cache counters by
+core.cache.TieredCache; order, checkout and webhook metrics by the order
+views; outbound HTTP metrics by core.http; queue wait and shedding by
+core.deadlines; replica health by core.replica; connection pool stats by
+core.db (refreshed by each worker as it serves requests, and at scrape
+time); job metrics by jobs.queue
+(the `run_jobs` worker shares the multiprocess directory, so its samples
+show up on /metrics too).
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route, method and status", ["route", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency", ["route", "method"], buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in DB queries per request", ["route"], buckets=LATENCY_BUCKETS
+)
+REQUEST_DB_QUERIES = Counter("http_request_db_queries_total", "DB queries run by requests", ["route"])
+SPAN_LATENCY = Histogram(
+    "http_request_span_seconds",
+    "Time per request in instrumented spans (serialize, stripe, google, cloudinary)",
+    ["span"],
+    buckets=LATENCY_BUCKETS,
+)
+
+CACHE_EVENTS = Counter(
+    "cache_events_total",
+    "Tiered cache events by namespace (l1_hits, l2_hits, stale_hits, misses, wait_timeouts, invalidations)",
+    ["namespace", "event"],
+)
+
+ORDERS_CREATED = Counter("orders_created_total", "Orders placed", ["payment_method"])
+CHECKOUT_SESSIONS = Counter("checkout_sessions_total", "Stripe checkout sessions", ["result"])
+ORDERS_PAID = Counter("orders_paid_total", "Orders marked paid", ["payment_method"])
+WEBHOOK_LAG = Histogram(
+    "stripe_webhook_lag_seconds",
+    "Delay between a Stripe event being created and us receiving it",
+    ["event_type"],
+    buckets=(0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+JOBS_ENQUEUED = Counter("jobs_enqueued_total", "Background jobs queued", ["name"])
+JOBS_PROCESSED = Counter(
+    "jobs_processed_total", "Background job runs by outcome (done, retry, failed)", ["name", "result"]
+)
+JOB_DURATION = Histogram("job_duration_seconds", "Background job run time", ["name"], buckets=LATENCY_BUCKETS)
+JOB_QUEUE_LAG = Histogram(
+    "job_queue_lag_seconds",
+    "Delay between a job becoming due and a worker starting it",
+    ["queue"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+OUTBOUND_REQUESTS = Counter(
+    "outbound_requests_total",
+    "Calls to external services by outcome (ok, client_error, server_error, timeout, connection_error, "
+    "error, circuit_open)",
+    ["service", "outcome"],
+)
+OUTBOUND_LATENCY = Histogram(
+    "outbound_request_duration_seconds", "External call latency, retries included", ["service"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_CIRCUIT_TRANSITIONS = Counter(
+    "outbound_circuit_transitions_total", "Circuit breaker state changes", ["service", "state"]
+)
+
+REQUEST_QUEUE_WAIT = Histogram(
+    "http_request_queue_wait_seconds",
+    "Time between nginx receiving a request and a worker starting it (X-Request-Start)",
+    ["request_class"],
+    buckets=LATENCY_BUCKETS + (30, 60),
+)
+REQUESTS_SHED = Counter("http_requests_shed_total", "Requests answered 503 unrun because they queued too long",
+                        ["request_class"])
+
+DB_REPLICA_LAG = Histogram(
+    "db_replica_lag_seconds", "Replica replay lag seen by the periodic health check",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+DB_REPLICA_STATE_CHANGES = Counter(
+    "db_replica_state_changes_total", "Replica became ok, lagging or down (reads fall back to the primary)",
+    ["state"],
+)
+
+# Per worker; "livesum" adds up the live workers' values on a multiprocess scrape
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections in the DB pool by state (idle, in_use)", ["alias", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_requests_waiting", "Threads waiting for a pooled DB connection", ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_REQUESTS = Counter(
+    "db_pool_requests_total", "Connection checkouts from the DB pool by outcome (immediate, waited, timeout)",
+    ["alias", "outcome"],
+)
+DB_POOL_WAIT = Counter(
+    "db_pool_wait_seconds_total", "Time threads spent waiting for a pooled DB connection", ["alias"]
+)
+
+
+def observe_request(route, method, status, total, metrics):
+    """Record one request (``metrics`` is a core.instrumentation.RequestMetrics)."""
+    REQUESTS.labels(route, method, status).inc()
+    REQUEST_LATENCY.labels(route, method).observe(total)
+    REQUEST_DB_TIME.labels(route).observe(metrics.db_time)
+    if metrics.db_queries:
+        REQUEST_DB_QUERIES.labels(route).inc(metrics.db_queries)
+    for name, (_, seconds) in metrics.spans.items():
+        SPAN_LATENCY.labels(name).observe(seconds)
+
+
+def render():
+    """Return (body, content_type) for a scrape."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
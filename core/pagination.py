@@ -0,0 +1,200 @@
+"""
+Shared pagination for admin list endpoints.
+
+KeysetPagination pages on (ordering field, id) instead of OFFSET, so the
+hundredth page costs the same as the first. Counts come from
+approximate_count(), which asks the PostgreSQL planner instead of running
+COUNT(*) over the whole table.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Below this many estimated rows an exact COUNT(*) is cheap enough to run.
+EXACT_COUNT_THRESHOLD = 1000
+
+
+def approximate_count(queryset):
+    """
+    Return the number of rows in ``queryset``.
+
+    On PostgreSQL the planner's row estimate is used (EXPLAIN, nothing is
+    executed). Small estimates and other backends fall back to COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate < EXACT_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset (seek) pagination.
+
+    Views choose the default ordering with ``keyset_ordering`` (e.g.
+    "-created_at") and may allow others through ``keyset_ordering_fields``;
+    clients pick one with ``?ordering=``. Rows are always tie-broken on pk
+    and NULLs sort last, so every ordering is total and stable.
+
+    Response: {"count": <approximate>, "next": <url or null>, "results": [...]}
+
+    Subclass and override the query parameter names to page a nested
+    collection inside another response.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    default_ordering = "-created_at"
+    include_count = True
+    invalid_cursor_message = "Invalid cursor"
+
+    # ----------------------------------------------------------------
+    # Request parsing
+    # ----------------------------------------------------------------
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size < 1:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, view):
+        default = getattr(view, "keyset_ordering", self.default_ordering)
+        allowed = getattr(view, "keyset_ordering_fields", [default.lstrip("-")])
+
+        requested = request.query_params.get(self.ordering_query_param, "").strip()
+        if requested and requested.lstrip("-") in allowed:
+            ordering = requested
+        else:
+            ordering = default
+        return ordering.lstrip("-"), ordering.startswith("-")
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if value is not None:
+                value = field.to_python(value)
+            return value, int(pk)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, value, pk):
+        raw = json.dumps([_encode_value(value), pk]).encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    # ----------------------------------------------------------------
+    # Paging
+    # ----------------------------------------------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        name, descending = self.get_ordering(request, view)
+        field = queryset.model._meta.get_field(name)
+
+        self.count = approximate_count(queryset) if self.include_count else None
+
+        if descending:
+            queryset = queryset.order_by(F(name).desc(nulls_last=True), "-pk")
+        else:
+            queryset = queryset.order_by(F(name).asc(nulls_last=True), "pk")
+
+        cursor = self.decode_cursor(request, field)
+        if cursor is not None:
+            queryset = queryset.filter(self._after(name, descending, field.null, *cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.page = rows[:self.page_size]
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            last = self.page[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, name), last.pk)
+        return self.page
+
+    def _after(self, name, descending, nullable, value, pk):
+        """Filter selecting rows that sort strictly after (value, pk)."""
+        op = "lt" if descending else "gt"
+        if value is None:
+            # NULLs sort last, so only other NULL rows can follow.
+            return Q(**{f"{name}__isnull": True, f"pk__{op}": pk})
+
+        after = Q(**{f"{name}__{op}": value}) | Q(**{name: value, f"pk__{op}": pk})
+        if nullable:
+            after |= Q(**{f"{name}__isnull": True})
+        return after
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "nullable": True},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,265 @@
+"""
+Sliding-window rate limiting shared by every worker on the host.
+
+django_ratelimit counts in the default cache, which is per-process
+LocMem here, so each gunicorn worker enforced its own copy of every
+limit. ratelimit() below is a drop-in for django_ratelimit's decorator
+(same key/rate/method arguments, same Ratelimited exception) whose
+counters live in a small SQLite file (settings.RATELIMIT_DB_PATH). WAL
+mode plus one short write transaction per check keeps a hit in the tens
+of microseconds without any external service.
+
+Sliding window: hits are counted per fixed window, and a check weighs
+the previous window by how much of it still overlaps the last ``period``
+seconds:
+
+    estimate = previous * (1 - elapsed / period) + current
+
+which avoids the burst of 2x the limit a fixed window allows at its edge.
+
+Behind nginx every request comes from 127.0.0.1, so the "ip" key reads
+the client address from settings.RATELIMIT_IP_META_KEY (X-Real-IP, which
+nginx overwrites) and only falls back to REMOTE_ADDR without it. Only
+django_ratelimit's public API (ALL, UNSAFE, Ratelimited) is used.
+"""
+import ipaddress
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from django_ratelimit import ALL, UNSAFE
+from django_ratelimit.exceptions import Ratelimited
+
+logger = logging.getLogger(__name__)
+
+# Fraction of hits that also purge expired rows
+PURGE_PROBABILITY = 0.001
+
+# UPDATE ... RETURNING needs SQLite 3.35; older libraries take two statements
+SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+RATE_RE = re.compile(r"^(\d+)/(\d*)([smhd])?$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratelimit_hits (
+    key TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (key, window)
+) WITHOUT ROWID
+"""
+
+
+class SQLiteCounterStore:
+    """
+    Sliding-window hit counters in a SQLite file.
+
+    Connections are per thread and reopened after fork, so one store can
+    be shared by threads, gunicorn workers and benchmark processes.
+    """
+
+    def __init__(self, path, returning=SQLITE_RETURNING):
+        self.path = path
+        self.returning = returning
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Counters are disposable; losing the last hits in a crash is fine
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, period, increment=True, now=None):
+        """Record a hit (unless ``increment`` is False) and return the window estimate."""
+        now = time.time() if now is None else now
+        window = int(now // period)
+        elapsed = (now % period) / period
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if increment and self.returning:
+                current = conn.execute(
+                    "INSERT INTO ratelimit_hits (key, window, count, expires) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (key, window) DO UPDATE SET count = count + 1 RETURNING count",
+                    (key, window, (window + 2) * period),
+                ).fetchone()[0]
+            elif increment:
+                conn.execute(
+                    "INSERT OR IGNORE INTO ratelimit_hits (key, window, count, expires) VALUES (?, ?, 0, ?)",
+                    (key, window, (window + 2) * period),
+                )
+                conn.execute(
+                    "UPDATE ratelimit_hits SET count = count + 1 WHERE key = ? AND window = ?", (key, window)
+                )
+                current = self._count(conn, key, window)
+            else:
+                current = self._count(conn, key, window)
+            previous = self._count(conn, key, window - 1)
+            if random.random() < PURGE_PROBABILITY:
+                conn.execute("DELETE FROM ratelimit_hits WHERE expires < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return previous * (1 - elapsed) + current
+
+    def _count(self, conn, key, window):
+        row = conn.execute(
+            "SELECT count FROM ratelimit_hits WHERE key = ? AND window = ?", (key, window)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def clear(self):
+        self._connection().execute("DELETE FROM ratelimit_hits")
+
+
+store = SQLiteCounterStore(getattr(settings, "RATELIMIT_DB_PATH", "/tmp/souled-cache/ratelimit.sqlite3"))
+
+
+def _group_for(fn):
+    # method_decorator hands us a partial of the bound dispatch; name the group after the view class
+    if isinstance(fn, partial):
+        fn = fn.func
+    parts = [fn.__module__]
+    if hasattr(fn, "__self__"):
+        parts.append(fn.__self__.__class__.__name__)
+    parts.append(fn.__qualname__)
+    return ".".join(parts)
+
+
+def split_rate(rate):
+    """"5/15m" -> (5, 900). A (limit, seconds) tuple passes through."""
+    if isinstance(rate, tuple):
+        return rate
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ImproperlyConfigured(f"Invalid rate: {rate}")
+    count, multiplier, unit = match.groups()
+    return int(count), PERIODS[unit or "s"] * int(multiplier or 1)
+
+
+def _network(ip):
+    ip = ip.split(",")[0].strip()  # X-Forwarded-For: the first hop is the client
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    mask = 64 if address.version == 6 else 32
+    return str(ipaddress.ip_network(f"{address}/{mask}", strict=False).network_address)
+
+
+def client_ip(request):
+    """
+    The client's address (IPv6 reduced to its /64), as nginx saw it. A
+    missing or malformed header falls back to REMOTE_ADDR.
+    """
+    meta_key = getattr(settings, "RATELIMIT_IP_META_KEY", None)
+    for ip in (request.META.get(meta_key) if meta_key else None, request.META.get("REMOTE_ADDR")):
+        network = _network(ip) if ip else None
+        if network:
+            return network
+    raise ImproperlyConfigured("No client address in RATELIMIT_IP_META_KEY or REMOTE_ADDR")
+
+
+def _user_or_ip(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return str(user.pk)
+    return client_ip(request)
+
+
+SIMPLE_KEYS = {
+    "ip": client_ip,
+    "user": lambda request: str(request.user.pk),
+    "user_or_ip": _user_or_ip,
+}
+
+ACCESSOR_KEYS = {
+    "get": lambda request, name: request.GET.get(name, ""),
+    "post": lambda request, name: request.POST.get(name, ""),
+    "header": lambda request, name: request.META.get("HTTP_" + name.upper().replace("-", "_"), ""),
+}
+
+
+def _key_value(group, request, key):
+    # Same key syntax as django_ratelimit ("ip", "user_or_ip", "header:x-foo", dotted path, callable)
+    if callable(key):
+        return key(group, request)
+    if key in SIMPLE_KEYS:
+        return SIMPLE_KEYS[key](request)
+    if ":" in key:
+        accessor, name = key.split(":", 1)
+        if accessor not in ACCESSOR_KEYS:
+            raise ImproperlyConfigured(f"Unknown ratelimit key: {key}")
+        return ACCESSOR_KEYS[accessor](request, name)
+    if "." in key:
+        return import_string(key)(group, request)
+    raise ImproperlyConfigured(f"Could not understand ratelimit key: {key}")
+
+
+def _method_match(request, method):
+    if method == ALL:
+        return True
+    methods = method if isinstance(method, (list, tuple)) else [method]
+    return request.method in [m.upper() for m in methods]
+
+
+def is_ratelimited(request, group, key, rate, method=ALL, increment=False):
+    if not getattr(settings, "RATELIMIT_ENABLE", True):
+        return False
+    if not _method_match(request, method):
+        return False
+
+    limit, period = split_rate(rate)
+    value = _key_value(group, request, key)
+    try:
+        estimate = store.hit(f"{group}:{rate}:{value}", period, increment=increment)
+    except sqlite3.Error as e:
+        logger.error(f"Rate limit store unavailable: {e}")
+        return not getattr(settings, "RATELIMIT_FAIL_OPEN", False)
+    return estimate > limit
+
+
+def ratelimit(group=None, key=None, rate=None, method=ALL, block=True):
+    """Drop-in for django_ratelimit.decorators.ratelimit backed by ``store``."""
+    if not key or not rate:
+        raise ImproperlyConfigured("ratelimit needs both key and rate")
+
+    def decorator(fn):
+        fn_group = group or _group_for(fn)
+
+        @wraps(fn)
+        def _wrapped(request, *args, **kwargs):
+            limited = is_ratelimited(request, fn_group, key, rate, method, increment=True)
+            request.limited = limited or getattr(request, "limited", False)
+            if limited and block:
+                raise Ratelimited()
+            return fn(request, *args, **kwargs)
+        return _wrapped
+    return decorator
+
+
+ratelimit.ALL = ALL
+ratelimit.UNSAFE = UNSAFE
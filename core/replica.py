@@ -0,0 +1,211 @@
+"""
+Read replica routing.
+
+When settings.DATABASE_REPLICA_URL configures a "replica" alias,
+ReplicaRoutingMiddleware and ReplicaRouter send the reads of safe (GET,
+HEAD, OPTIONS) requests to it: the catalog, carts and order history, and
+the heavy panel dashboard and reports. Everything else stays on
+"default":
+
+- all writes, and every read of a request after its first write
+  (including select_for_update and get_or_create, which Django runs on
+  the write database);
+- unsafe requests, and views that set ``use_replica = False`` (payment
+  verification, which must see the webhook's update);
+- for REPLICA_PIN_SECONDS after a client wrote anything, so it reads
+  its own writes. The writer's browser gets a short-lived pin cookie, and
+  a logged-in user is also pinned by id in the shared cache (their other
+  devices). Never by IP: behind nginx every client is 127.0.0.1;
+- while the replica is down or more than REPLICA_MAX_LAG seconds
+  behind. Each process checks at most every REPLICA_CHECK_INTERVAL
+  seconds;
+- outside requests (jobs, management commands, shell).
+
+Without a replica alias the router stays out of the way.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+REPLICA = "replica"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_CACHE_ALIAS = "shared"
+PIN_COOKIE = "db_pin"
+
+# Caught up: nothing received is waiting to be replayed. Otherwise: age of
+# the last replayed transaction.
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+_routing = ContextVar("db_routing", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f"db-pin:user:{user_id}"
+
+
+def _user_id(request):
+    # Only once something has authenticated the request: evaluating
+    # Django's lazy session user here would itself query the database
+    user = request.__dict__.get("user")
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def pin(request, response):
+    """Send the client behind ``request`` to the primary for REPLICA_PIN_SECONDS."""
+    seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+    response.set_cookie(
+        PIN_COOKIE, "1", max_age=seconds, httponly=True,
+        secure=settings.COOKIE_SECURE, samesite=settings.COOKIE_SAMESITE,
+    )
+    user_id = _user_id(request)
+    if user_id:
+        caches[PIN_CACHE_ALIAS].set(_pin_key(user_id), 1, seconds)
+
+
+class RequestRouting:
+    def __init__(self, request, use_replica):
+        self.request = request
+        self.use_replica = use_replica
+        self.wrote = False
+        self._pinned = PIN_COOKIE in request.COOKIES
+        self._user_id = None
+
+    def reads_from_replica(self):
+        if not self.use_replica or self.wrote or self._pinned:
+            return False
+        user_id = _user_id(self.request)
+        if user_id and user_id != self._user_id:  # the user has just been authenticated
+            self._user_id = user_id
+            self._pinned = caches[PIN_CACHE_ALIAS].get(_pin_key(user_id)) is not None
+        return not self._pinned and replica_health.usable()
+
+
+class ReplicaHealth:
+    """Per-process view of whether the replica may serve reads, refreshed every REPLICA_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state = None  # unknown until the first check
+        self.lag = None
+        self.checked_at = float("-inf")
+
+    def usable(self):
+        interval = getattr(settings, "REPLICA_CHECK_INTERVAL", 5)
+        if time.monotonic() - self.checked_at >= interval and self._lock.acquire(blocking=False):
+            # One thread checks; the others keep using the last answer meanwhile
+            try:
+                self.checked_at = time.monotonic()
+                self._set(self.check())
+            finally:
+                self._lock.release()
+        return self.state == "ok"
+
+    def check(self):
+        connection = connections[REPLICA]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute(LAG_SQL)
+                    self.lag = float(cursor.fetchone()[0])
+                else:
+                    cursor.execute("SELECT 1")
+                    self.lag = 0.0
+        except DatabaseError as e:
+            logger.warning(f"Replica check failed: {e}")
+            connection.close()
+            return "down"
+        metrics.DB_REPLICA_LAG.observe(self.lag)
+        return "lagging" if self.lag > getattr(settings, "REPLICA_MAX_LAG", 5) else "ok"
+
+    def _set(self, state):
+        if state != self.state:
+            log = logger.info if state == "ok" else logger.warning
+            log(f"Replica is {state}" + (f" ({self.lag:.1f}s behind)" if state == "lagging" else ""))
+            metrics.DB_REPLICA_STATE_CHANGES.labels(state).inc()
+        self.state = state
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not replica_configured():
+            return None
+        routing = _routing.get()
+        if routing is not None and routing.reads_from_replica():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if not replica_configured():
+            return None
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        # Explicitly: left to Django, an instance read from the replica
+        # would be saved back to it
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # same data on both aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return False if db == REPLICA else None
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        routing = RequestRouting(request, use_replica=request.method in SAFE_METHODS)
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _routing.reset(token)
+            raise
+        # A streamed export is read after this returns: it keeps the routing
+        # until the thread's next request replaces it
+        if not getattr(response, "streaming", False):
+            _routing.reset(token)
+        if routing.wrote:
+            pin(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        view_class = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        if routing is not None and not getattr(view_class, "use_replica", True):
+            routing.use_replica = False
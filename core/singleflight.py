@@ -0,0 +1,57 @@
+"""
+Single-flight locks shared by threads and processes on one host.
+
+When a hot cache entry expires, every concurrent request would otherwise
+recompute it. acquire() lets exactly one caller (the leader) through per
+key; the rest wait up to ``timeout`` seconds for it to finish, then re-check
+the cache, or give up and serve a stale copy.
+
+Locks are flock()s on a fixed set of files under settings.SINGLEFLIGHT_DIR
+(keys are hashed onto LOCK_STRIPES of them, so the directory stays
+bounded). flock() conflicts between separate open() calls even in the same
+process, so the same lock covers gthread threads and gunicorn workers, and
+the kernel drops it if the holder dies.
+"""
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LOCK_STRIPES = 256
+POLL_INTERVAL = 0.005  # seconds
+
+
+def _lock_path(key):
+    directory = getattr(settings, "SINGLEFLIGHT_DIR", "/tmp/souled-cache/singleflight")
+    os.makedirs(directory, exist_ok=True)
+    stripe = int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) % LOCK_STRIPES
+    return os.path.join(directory, f"{stripe}.lock")
+
+
+@contextmanager
+def acquire(key, timeout=5.0):
+    """
+    Yield True once this caller holds the lock for ``key``, or False if
+    ``timeout`` passed while someone else held it.
+    """
+    fd = os.open(_lock_path(key), os.O_RDWR | os.O_CREAT, 0o644)
+    deadline = time.monotonic() + timeout
+    leader = False
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                leader = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(POLL_INTERVAL)
+        yield leader
+    finally:
+        if leader:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
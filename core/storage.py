@@ -0,0 +1,78 @@
+"""
+Media storage with its Cloudinary API calls timed as the "cloudinary"
+span (see core.instrumentation) and sent through the "cloudinary"
+outbound pool and circuit breaker (see core.http).
+"""
+from contextlib import contextmanager
+
+import cloudinary
+from cloudinary import exceptions as cloudinary_errors
+from cloudinary_storage.storage import MediaCloudinaryStorage
+from django.core.files.base import ContentFile
+
+from . import http
+from .instrumentation import span
+
+# Cloudinary answered, just not with a success: not a reason to trip the breaker
+ANSWERED = (
+    cloudinary_errors.BadRequest,
+    cloudinary_errors.AuthorizationRequired,
+    cloudinary_errors.NotAllowed,
+    cloudinary_errors.NotFound,
+    cloudinary_errors.AlreadyExists,
+    cloudinary_errors.RateLimited,
+)
+
+
+@contextmanager
+def cloudinary_call():
+    with span("cloudinary"), http.guard("cloudinary", answered=ANSWERED):
+        yield
+
+
+class InstrumentedMediaCloudinaryStorage(MediaCloudinaryStorage):
+    # The parent fetches and HEADs delivery URLs with bare requests calls
+    # (no pool, no timeout); these go through the pooled session instead
+    def _open(self, name, mode="rb"):
+        with span("cloudinary"):
+            response = http.session("cloudinary").get(self._get_url(name))
+        if response.status_code == 404:
+            raise IOError
+        response.raise_for_status()
+        file = ContentFile(response.content)
+        file.name = name
+        file.mode = mode
+        return file
+
+    def _save(self, name, content):
+        with cloudinary_call():
+            return super()._save(name, content)
+
+    def delete(self, name):
+        with cloudinary_call():
+            return super().delete(name)
+
+    def exists(self, name):
+        with span("cloudinary"):
+            response = http.session("cloudinary").head(self._get_url(name))
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def size(self, name):
+        with span("cloudinary"):
+            response = http.session("cloudinary").head(self._get_url(name))
+        if response.status_code == 200:
+            return int(response.headers["content-length"])
+        return None
+
+    def variant_url(self, name, width):
+        """
+        URL of ``name`` scaled down to at most ``width`` pixels wide, in the
+        best format and quality for the browser. Cloudinary derives it on the
+        first request, so this is a string build with no API call.
+        """
+        name = self._prepend_prefix(name)
+        resource = cloudinary.CloudinaryResource(name, default_resource_type=self._get_resource_type(name))
+        return resource.build_url(width=width, crop="limit", fetch_format="auto", quality="auto", secure=True)
@@ -0,0 +1,371 @@
+"""
+Query-count regression tests for every API endpoint.
+
+Each endpoint in ENDPOINTS is called against a small and a large fixture
+(FIXTURE_SIZES) and must run the same number of queries on both - a
+serializer that starts touching a relation per row breaks that - and no
+more than its budget. A failure prints a diff of the SQL of the two runs
+(literals normalised) so the repeated query stands out.
+
+Every URL in store/urls.py must have an entry (or be listed in EXEMPT),
+so new endpoints get a budget when they are added.
+
+Caches are cleared before each request, so the counts are the cold-cache
+worst case. Write endpoints send a fixed-size payload; only the data
+already in the database grows.
+"""
+import difflib
+import re
+import time
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+
+from accounts import user_cache
+from accounts.models import User
+from accounts.tokens import ClaimsRefreshToken
+from cart.models import Cart, CartItem, Wishlist, WishlistItem
+from orders.models import Address, Order, OrderItem
+from panel import rollups
+from products.models import Product
+
+from .cache import tiered
+
+FIXTURE_SIZES = (2, 6)
+
+# Routes not measured here, with the reason
+EXEMPT = {
+    "admin/": "Django admin",
+    "schema/": "static OpenAPI schema, no database access",
+    "docs/": "static page",
+    "redoc/": "static page",
+    "^media/": "local-profile media files",
+}
+
+
+class Fixture:
+    """
+    A store whose row counts scale with ``n``: n products, n other users
+    with one order each, and a customer with n addresses, n orders of n
+    items, and n cart and wishlist items.
+
+    Objects the endpoints act on (the order to cancel, the cart item to
+    remove, ...) are the same shape at every size.
+    """
+
+    PASSWORD = "Budget123"
+
+    def __init__(self, n):
+        self.admin = User.objects.create_user(email="admin@budget.test", password=self.PASSWORD, is_staff=True)
+        self.customer = User.objects.create_user(email="customer@budget.test", password=self.PASSWORD)
+        other_users = User.objects.bulk_create(
+            [User(email=f"user{i}@budget.test") for i in range(n)]
+        )
+        # The user the panel endpoints look at, and the one they delete
+        self.other_user = other_users[0]
+        self.doomed_user = other_users[-1]
+
+        self.products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal("100.00"), stock=100,
+                    category=("men", "women")[i % 2], description="A budget test product.")
+            for i in range(n)
+        ])
+        self.product = self.products[0]
+
+        self.addresses = Address.objects.bulk_create([
+            Address(user=self.customer, full_name="Customer", phone="9999999999",
+                    street=f"{i} Road", city="Kochi", pincode="682001")
+            for i in range(n)
+        ])
+        self.address = self.addresses[0]
+
+        self.orders = self._orders(self.customer, self.address, n, n)
+        for user in other_users:
+            self._orders(user, None, 1, n)
+
+        # Same shape at every size: one processing COD order with one item,
+        # one unpaid Stripe order
+        self.open_order = self._orders(self.customer, self.address, 1, 1)[0]
+        self.stripe_order = self._orders(self.customer, self.address, 1, 1, payment_method="stripe")[0]
+
+        cart = Cart.objects.create(user=self.customer)
+        self.cart_items = CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product=product, quantity=1) for product in self.products]
+        )
+        wishlist = Wishlist.objects.create(user=self.customer)
+        self.wishlist_items = WishlistItem.objects.bulk_create(
+            [WishlistItem(wishlist=wishlist, product=product) for product in self.products]
+        )
+
+        rollups.rebuild()
+
+    def _orders(self, user, address, count, items, payment_method="cod"):
+        orders = Order.objects.bulk_create([
+            Order(user=user, address=address, payment_method=payment_method,
+                  total_amount=Decimal("100.00") * items)
+            for _ in range(count)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.products[i % len(self.products)], quantity=1,
+                      price=Decimal("100.00"))
+            for order in orders
+            for i in range(items)
+        ])
+        return orders
+
+    def client(self, who):
+        client = APIClient(SERVER_NAME="localhost")
+        user = {"customer": self.customer, "admin": self.admin}.get(who)
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {ClaimsRefreshToken.for_user(user).access_token}")
+        return client
+
+
+class Endpoint:
+    """
+    One method on one route.
+
+    ``path``, ``data`` and ``query`` are callables taking the Fixture;
+    ``patches`` builds the mock.patch context managers for external
+    services (Stripe, Google) from the Fixture.
+    """
+
+    def __init__(self, method, route, budget, user=None, path=None, data=None, query=None,
+                 patches=None, status=200):
+        self.method = method
+        self.route = route
+        self.budget = budget
+        self.user = user
+        self.path = path or (lambda fx: "/" + route)
+        self.data = data
+        self.query = query
+        self.patches = patches
+        self.status = status
+
+    def __str__(self):
+        return f"{self.method.upper()} /{self.route}"
+
+    def call(self, fx):
+        client = fx.client(self.user)
+        kwargs = {"format": "json"}
+        if self.data:
+            kwargs["data"] = self.data(fx)
+        elif self.query:
+            kwargs = {"data": self.query(fx)}
+        with ExitStack() as stack:
+            for patch in (self.patches(fx) if self.patches else ()):
+                stack.enter_context(patch)
+            response = getattr(client, self.method)(self.path(fx), **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        return response
+
+
+def _order_data(fx):
+    return {
+        "cart": [{"id": fx.product.id, "name": fx.product.name, "price": "100.00", "quantity": 1}],
+        "address_id": fx.address.id,
+        "payment_method": "cod",
+    }
+
+
+def _stripe_session(fx):
+    session = {"metadata": {"order_id": str(fx.stripe_order.id)}, "payment_status": "paid"}
+    return [mock.patch("orders.views.stripe.checkout.Session.retrieve", return_value=session)]
+
+
+def _stripe_event(fx):
+    event = {
+        "type": "checkout.session.completed",
+        "created": time.time(),
+        "data": {"object": {"metadata": {"order_id": str(fx.stripe_order.id)}}},
+    }
+    return [mock.patch("orders.views.stripe.Webhook.construct_event", return_value=event)]
+
+
+def _google_token(fx):
+    info = {"email": fx.customer.email, "given_name": "Customer", "family_name": "", "picture": ""}
+    return [
+        mock.patch("accounts.views.GOOGLE_CLIENT_ID", "client-id"),
+        mock.patch("accounts.views.google_auth.verify_id_token", return_value=info),
+    ]
+
+
+_product_data = {
+    "name": "Budget Tee", "price": "499.00", "stock": 10, "category": "men",
+    "description": "A brand new budget test product.",
+}
+
+
+ENDPOINTS = [
+    # accounts
+    Endpoint("post", "api/register/", 2, data=lambda fx: {
+        "email": "new@budget.test", "password": "Budget123", "confirm_password": "Budget123",
+        "first_name": "New", "last_name": "User",
+    }, status=201),
+    Endpoint("post", "api/login/", 1, data=lambda fx: {"email": fx.customer.email, "password": Fixture.PASSWORD}),
+    Endpoint("post", "api/refresh/", 1,
+             data=lambda fx: {"refresh": str(ClaimsRefreshToken.for_user(fx.customer))}),
+    Endpoint("post", "api/google/", 1, data=lambda fx: {"id_token": "token"}, patches=_google_token),
+    Endpoint("post", "api/logout/", 0),
+    Endpoint("get", "api/me/", 1, user="customer"),
+
+    # products
+    Endpoint("get", "api/products/", 1, query=lambda fx: {"category": "men"}),
+    Endpoint("post", "api/products/create/", 3, user="admin", data=lambda fx: _product_data, status=201),
+    Endpoint("get", "api/products/export/", 2, user="admin"),
+    Endpoint("get", "api/products/<int:pk>/", 1, path=lambda fx: f"/api/products/{fx.product.id}/"),
+    Endpoint("put", "api/products/<int:pk>/", 3, user="admin",
+             path=lambda fx: f"/api/products/{fx.product.id}/", data=lambda fx: _product_data),
+    Endpoint("patch", "api/products/<int:pk>/", 3, user="admin",
+             path=lambda fx: f"/api/products/{fx.product.id}/", data=lambda fx: {"stock": 50}),
+    Endpoint("delete", "api/products/<int:pk>/", 6, user="admin",
+             path=lambda fx: f"/api/products/{fx.product.id}/", status=204),
+
+    # cart and wishlist
+    Endpoint("get", "api/cart/", 4, user="customer"),
+    Endpoint("post", "api/cart/add/", 5, user="customer",
+             data=lambda fx: {"product_id": fx.products[-1].id, "quantity": 1}),
+    Endpoint("delete", "api/cart/remove/<int:item_id>/", 4, user="customer",
+             path=lambda fx: f"/api/cart/remove/{fx.cart_items[0].id}/"),
+    Endpoint("patch", "api/cart/update/<int:item_id>/", 5, user="customer",
+             path=lambda fx: f"/api/cart/update/{fx.cart_items[0].id}/", data=lambda fx: {"quantity": 2}),
+    Endpoint("delete", "api/cart/clear/", 3, user="customer"),
+    Endpoint("get", "api/cart/wishlist/", 4, user="customer"),
+    Endpoint("post", "api/cart/wishlist/add/", 4, user="customer",
+             data=lambda fx: {"product_id": fx.products[-1].id}),
+    Endpoint("delete", "api/cart/wishlist/remove/<int:item_id>/", 4, user="customer",
+             path=lambda fx: f"/api/cart/wishlist/remove/{fx.wishlist_items[0].id}/"),
+
+    # orders
+    Endpoint("post", "api/orders/create/", 12, user="customer", data=_order_data),
+    Endpoint("post", "api/orders/webhook/", 3, patches=_stripe_event),
+    Endpoint("get", "api/orders/verify-payment/", 4, user="customer",
+             query=lambda fx: {"session_id": "cs_test"}, patches=_stripe_session),
+    Endpoint("get", "api/orders/my/", 4, user="customer"),
+    Endpoint("get", "api/orders/admin/all/", 5, user="admin"),
+    Endpoint("get", "api/orders/admin/export/", 2, user="admin"),
+    Endpoint("post", "api/orders/admin/bulk-status/", 6, user="admin",
+             data=lambda fx: {"order_status": "shipped", "order_ids": [order.id for order in fx.orders]}),
+    Endpoint("patch", "api/orders/<int:order_id>/status/", 9, user="admin",
+             path=lambda fx: f"/api/orders/{fx.open_order.id}/status/", data=lambda fx: {"order_status": "shipped"}),
+    # + re-reading the status under the row lock
+    Endpoint("post", "api/orders/<int:order_id>/cancel/", 11, user="customer",
+             path=lambda fx: f"/api/orders/{fx.open_order.id}/cancel/"),
+    Endpoint("get", "api/orders/addresses/", 2, user="customer"),
+    Endpoint("post", "api/orders/addresses/", 2, user="customer", data=lambda fx: {
+        "full_name": "Customer", "phone": "9999999999", "street": "1 Road", "city": "Kochi", "pincode": "682001",
+    }, status=201),
+    Endpoint("patch", "api/orders/addresses/<int:address_id>/", 3, user="customer",
+             path=lambda fx: f"/api/orders/addresses/{fx.address.id}/", data=lambda fx: {"city": "Kannur"}),
+    Endpoint("delete", "api/orders/addresses/<int:address_id>/", 4, user="customer",
+             path=lambda fx: f"/api/orders/addresses/{fx.address.id}/"),
+
+    # panel
+    Endpoint("get", "api/panel/users/", 3, user="admin"),
+    Endpoint("get", "api/panel/users/<int:id>/", 5, user="admin",
+             path=lambda fx: f"/api/panel/users/{fx.other_user.id}/"),
+    Endpoint("post", "api/panel/users/<int:id>/toggle-block/", 3, user="admin",
+             path=lambda fx: f"/api/panel/users/{fx.other_user.id}/toggle-block/"),
+    # + the rebuild of the rollup days the deleted user's orders were on
+    Endpoint("delete", "api/panel/users/<int:id>/delete/", 22, user="admin",
+             path=lambda fx: f"/api/panel/users/{fx.doomed_user.id}/delete/"),
+    Endpoint("get", "api/panel/dashboard/", 7, user="admin"),
+    Endpoint("get", "api/panel/reports/", 3, user="admin"),
+
+    # operations
+    Endpoint("get", "health/", 0),
+    Endpoint("get", "ready/", 1),
+    Endpoint("get", "metrics", 0),
+]
+
+
+def _routes(patterns, prefix=""):
+    """Yield (route, methods) for every URL pattern under ``patterns``."""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from _routes(pattern.url_patterns, route)
+            continue
+        view_class = getattr(pattern.callback, "view_class", None) or getattr(pattern.callback, "cls", None)
+        if view_class is None:
+            yield route, {"get"}
+        else:
+            yield route, {m for m in ("get", "post", "put", "patch", "delete") if hasattr(view_class, m)}
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _normalise(sql):
+    return _LITERALS.sub("?", sql)
+
+
+def sql_diff(small, large, sizes):
+    """Unified diff of two runs' SQL with literals replaced by ``?``."""
+    return "\n".join(difflib.unified_diff(
+        [_normalise(q["sql"]) for q in small],
+        [_normalise(q["sql"]) for q in large],
+        fromfile=f"n={sizes[0]}", tofile=f"n={sizes[1]}", lineterm="",
+    ))
+
+
+@override_settings(RATELIMIT_ENABLE=False, QUERY_BUDGET_ACTION="log")
+class QueryBudgetTests(TestCase):
+    """Every endpoint runs a constant, budgeted number of queries as the data grows"""
+
+    def test_every_url_has_a_budget(self):
+        covered = {(endpoint.route, endpoint.method) for endpoint in ENDPOINTS}
+        missing = [
+            f"{method.upper()} /{route}"
+            for route, methods in _routes(get_resolver().url_patterns)
+            if not any(route.startswith(prefix) for prefix in EXEMPT)
+            for method in sorted(methods)
+            if (route, method) not in covered
+        ]
+        self.assertEqual(missing, [], "Add these endpoints to ENDPOINTS (or EXEMPT)")
+
+    def measure(self, endpoint, fx):
+        """Call ``endpoint`` in a savepoint that is rolled back afterwards; returns its queries."""
+        sid = transaction.savepoint()
+        tiered.clear()
+        cache.clear()
+        user_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = endpoint.call(fx)
+        transaction.savepoint_rollback(sid)
+        if response.status_code != endpoint.status:
+            body = getattr(response, "data", None) or b"".join(response.streaming_content)[:200]
+            self.fail(f"{endpoint} at n={len(fx.products)} returned {response.status_code}: {body}")
+        return queries.captured_queries
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        runs = {}  # endpoint -> [queries at each size]
+        for size in FIXTURE_SIZES:
+            sid = transaction.savepoint()
+            fx = Fixture(size)
+            for endpoint in ENDPOINTS:
+                with self.subTest(endpoint=str(endpoint), n=size):
+                    runs.setdefault(endpoint, []).append(self.measure(endpoint, fx))
+            transaction.savepoint_rollback(sid)
+
+        for endpoint, measured in runs.items():
+            if len(measured) != len(FIXTURE_SIZES):
+                continue  # failed with an unexpected status above
+            with self.subTest(endpoint=str(endpoint)):
+                small, large = measured
+                if len(small) != len(large):
+                    self.fail(
+                        f"{endpoint} ran {len(small)} queries at n={FIXTURE_SIZES[0]} but {len(large)} "
+                        f"at n={FIXTURE_SIZES[1]}:\n{sql_diff(small, large, FIXTURE_SIZES)}"
+                    )
+                if len(large) > endpoint.budget:
+                    listing = "\n".join(_normalise(q["sql"]) for q in large)
+                    self.fail(f"{endpoint} ran {len(large)} queries (budget {endpoint.budget}):\n{listing}")
@@ -0,0 +1,729 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+import requests
+import stripe
+from prometheus_client import REGISTRY
+
+from core import deadlines, fake_stripe, http, metrics, ratelimit, replica, singleflight
+from core.cache import TieredCache, tiered
+from core.db import pool_stats, record_pool, summarize_pool
+from core.instrumentation import QueryBudgetExceeded, current_metrics, span
+from orders.models import Order
+from products.models import Product
+from products.signals import CATALOG_NAMESPACE
+
+
+class SlidingWindowTests(TestCase):
+    """Test the SQLite-backed sliding-window counters"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.store = ratelimit.SQLiteCounterStore(os.path.join(self.dir.name, 'rl.sqlite3'))
+
+    def test_counts_within_window(self):
+        for expected in (1, 2, 3):
+            self.assertEqual(self.store.hit('k', 60, now=120.0), expected)
+        self.assertEqual(self.store.hit('other', 60, now=120.0), 1)
+        self.assertEqual(self.store.hit('k', 60, increment=False, now=120.0), 3)
+
+    def test_previous_window_decays(self):
+        for _ in range(10):
+            self.store.hit('k', 60, now=100.0)  # window [60, 120)
+        # A quarter into the next window, 3/4 of the previous one still counts
+        self.assertEqual(self.store.hit('k', 60, now=135.0), 10 * 0.75 + 1)
+        # Two windows later nothing is left
+        self.assertEqual(self.store.hit('k', 60, now=240.0), 1)
+
+    def test_counts_without_returning(self):
+        # SQLite before 3.35
+        old = ratelimit.SQLiteCounterStore(self.store.path, returning=False)
+        for expected in (1, 2, 3):
+            self.assertEqual(old.hit('k', 60, now=120.0), expected)
+        self.assertEqual(self.store.hit('k', 60, now=120.0), 4)
+
+    def test_rate_parsing(self):
+        self.assertEqual(ratelimit.split_rate('5/15m'), (5, 900))
+        self.assertEqual(ratelimit.split_rate('3/h'), (3, 3600))
+        self.assertEqual(ratelimit.split_rate('10/s'), (10, 1))
+
+    def test_stores_share_the_file(self):
+        other = ratelimit.SQLiteCounterStore(self.store.path)
+        self.store.hit('k', 60, now=120.0)
+        self.assertEqual(other.hit('k', 60, now=120.0), 2)
+
+
+class RateLimitDecoratorTests(TestCase):
+    """Test the shared limiter on the login endpoint"""
+
+    def setUp(self):
+        ratelimit.store.clear()
+        self.addCleanup(ratelimit.store.clear)
+        self.client = APIClient()
+
+    def test_login_is_limited(self):
+        payload = {'email': 'nobody@test.com', 'password': 'wrong-password'}
+        for _ in range(5):
+            response = self.client.post('/api/login/', payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post('/api/login/', payload)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Other views have their own counters
+        response = self.client.post('/api/google/', {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clients_behind_the_proxy_are_counted_apart(self):
+        payload = {'email': 'nobody@test.com', 'password': 'wrong-password'}
+        for _ in range(5):
+            self.client.post('/api/login/', payload, HTTP_X_REAL_IP='203.0.113.7')
+        response = self.client.post('/api/login/', payload, HTTP_X_REAL_IP='203.0.113.7')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Same REMOTE_ADDR (nginx), different client
+        response = self.client.post('/api/login/', payload, HTTP_X_REAL_IP='198.51.100.2')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_client_header_falls_back_to_remote_addr(self):
+        payload = {'email': 'nobody@test.com', 'password': 'wrong-password'}
+        for junk in ('foo', '', '1.2.3.4.5', '::g'):
+            response = self.client.post('/api/login/', payload, HTTP_X_REAL_IP=junk)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # All counted against REMOTE_ADDR, with the plain requests
+        self.client.post('/api/login/', payload)
+        response = self.client.post('/api/login/', payload, HTTP_X_REAL_IP='bar')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_limit_holds_across_processes(self):
+        out = StringIO()
+        call_command('bench_ratelimit', processes=2, hits=50, limit=60, stdout=out)
+        self.assertIn('allowed=60 limit=60', out.getvalue())
+
+
+class TieredCacheTests(TestCase):
+    """Test the L1/L2 tiered cache"""
+
+    def setUp(self):
+        self.cache = TieredCache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_l1_then_l2_hits(self):
+        calls = []
+        compute = lambda: calls.append(1) or 'value'
+        self.assertEqual(self.cache.get_or_set('ns', 'k', compute), 'value')
+        self.assertEqual(self.cache.get_or_set('ns', 'k', compute), 'value')
+
+        # Another process sees it in L2
+        other = TieredCache()
+        self.assertEqual(other.get_or_set('ns', 'k', compute), 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.stats()['ns'], {'misses': 1, 'l1_hits': 1})
+        self.assertEqual(other.stats()['ns'], {'l2_hits': 1})
+
+    def test_invalidate_namespace(self):
+        self.cache.set('ns', 'k', 'old')
+        self.cache.set('other', 'k', 'kept')
+        self.cache.invalidate('ns')
+        self.assertIsNone(self.cache.get('ns', 'k'))
+        self.assertEqual(self.cache.get('other', 'k'), 'kept')
+
+    def test_invalidation_reaches_other_processes(self):
+        other = TieredCache(version_ttl=0)
+        other.set('ns', 'k', 'old')
+        self.cache.invalidate('ns')
+        self.assertIsNone(other.get('ns', 'k'))
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        threads = [
+            threading.Thread(target=self.cache.get_or_set, args=('ns', 'k', compute))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_cacheable_veto(self):
+        self.cache.get_or_set('ns', 'k', lambda: 'error', cacheable=lambda value: False)
+        self.assertIsNone(self.cache.get('ns', 'k'))
+
+
+class SingleFlightTests(TestCase):
+    """Test cross-thread/process coalescing of cache recomputations"""
+
+    def setUp(self):
+        self.cache = TieredCache(wait_timeout=0.05)
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_stale_value_served_while_another_computes(self):
+        self.cache.get_or_set('ns', 'k', lambda: 'old', stale_for=60)
+        self.cache.invalidate('ns')
+
+        with singleflight.acquire(self.cache.make_key('ns', 'k')) as leader:
+            self.assertTrue(leader)
+            value = self.cache.get_or_set('ns', 'k', lambda: self.fail('should not compute'), stale_for=60)
+        self.assertEqual(value, 'old')
+        self.assertEqual(self.cache.stats()['ns']['stale_hits'], 1)
+
+        self.assertEqual(self.cache.get_or_set('ns', 'k', lambda: 'new', stale_for=60), 'new')
+
+    def test_waiter_computes_after_timeout(self):
+        with singleflight.acquire(self.cache.make_key('ns', 'k')):
+            value = self.cache.get_or_set('ns', 'k', lambda: 'mine')
+        self.assertEqual(value, 'mine')
+        self.assertEqual(self.cache.stats()['ns']['wait_timeouts'], 1)
+
+    def test_processes_compute_once(self):
+        out = StringIO()
+        call_command('bench_singleflight', processes=3, threads=4, compute_ms=100, stdout=out)
+        self.assertIn('computes=1 ', out.getvalue())
+
+
+class PoolStatsTests(TestCase):
+    """Test connection pool metrics"""
+
+    def test_unpooled_alias(self):
+        self.assertIsNone(pool_stats())
+
+    def test_wait_average(self):
+        class FakePool:
+            def get_stats(self):
+                return {'requests_num': 4, 'requests_wait_ms': 10}
+
+        self.assertEqual(summarize_pool(FakePool())['requests_wait_ms_avg'], 2.5)
+
+    def test_pool_stats_reach_prometheus(self):
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(name, {'alias': 'pool-test', **labels}) or 0
+
+        stats = {'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2, 'requests_num': 10,
+                 'requests_queued': 3, 'requests_errors': 1, 'requests_wait_ms': 1500}
+        before = sample('db_pool_requests_total', outcome='waited')
+        record_pool('pool-test', stats)
+        self.assertEqual(sample('db_pool_connections', state='in_use'), 3)
+        self.assertEqual(sample('db_pool_requests_waiting'), 2)
+        self.assertEqual(sample('db_pool_requests_total', outcome='waited') - before, 2)
+
+        # Counters only grow by what is new since the last look
+        wait = sample('db_pool_wait_seconds_total')
+        record_pool('pool-test', {**stats, 'requests_num': 12, 'requests_wait_ms': 2500})
+        self.assertEqual(sample('db_pool_requests_total', outcome='immediate'), 9)
+        self.assertEqual(sample('db_pool_wait_seconds_total') - wait, 1)
+
+
+class InstrumentationTests(TestCase):
+    """Test per-request query/latency instrumentation"""
+
+    def setUp(self):
+        tiered.clear()
+        Product.objects.create(name='Timed Product', price=10, category='men', description='Timed description', stock=1)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/products/')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_structured_log_line(self):
+        with self.assertLogs('core.requests', level='INFO') as logs:
+            self.client.get('/api/products/')
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['view'], 'product-list')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], 1)
+        self.assertIn('serialize', record['spans'])
+
+    @override_settings(QUERY_BUDGETS={'product-list': 0}, QUERY_BUDGET_ACTION='raise')
+    def test_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/products/')
+
+    @override_settings(QUERY_BUDGETS={'product-list': 0}, QUERY_BUDGET_ACTION='log')
+    def test_budget_logs(self):
+        with self.assertLogs('core.requests', level='WARNING') as logs:
+            self.client.get('/api/products/')
+        self.assertIn('ran 1 queries (budget 0)', logs.output[-1])
+
+    def test_span_outside_request_is_noop(self):
+        self.assertIsNone(current_metrics())
+        with span('stripe'):
+            pass
+
+
+class MetricsEndpointTests(TestCase):
+    """Test /health/, /ready/ and the Prometheus /metrics endpoint"""
+
+    def test_health_and_ready(self):
+        self.assertEqual(self.client.get('/health/').json(), {'status': 'ok'})
+        response = self.client.get('/ready/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['databases'], {'default': 'ok'})
+
+    def test_request_metrics_are_exported(self):
+        tiered.clear()
+        self.client.get('/api/products/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{method="GET",route="product-list",status="200"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.005",method="GET",route="product-list"}', body)
+        self.assertIn('cache_events_total{event="misses",namespace="catalog"}', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_workers_are_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+            script = "from core import metrics; metrics.ORDERS_CREATED.labels('cod').inc()"
+            for _ in range(2):  # two "workers"
+                subprocess.run([sys.executable, '-c', script], env=env, check=True, cwd=settings.BASE_DIR)
+
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                body, _ = metrics.render()
+        self.assertIn(b'orders_created_total{payment_method="cod"} 2.0', body)
+
+
+class SeedAndBenchmarkTests(TestCase):
+    """Test the seed_store generator and the in-process endpoint benchmarks"""
+
+    def setUp(self):
+        tiered.clear()
+        call_command(
+            'seed_store', users=20, products=30, orders=50, max_items=3, carts=0.5, batch_size=16,
+            stdout=StringIO(),
+        )
+
+    def test_seed_store(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models import DecimalField, F, Sum
+        from orders.models import Order, OrderItem
+        from panel.models import DailySalesRollup
+
+        self.assertEqual(get_user_model().objects.count(), 20)
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertTrue(OrderItem.objects.exists())
+        # Orders are spread over past days, not all stamped "now"
+        self.assertGreater(Order.objects.dates('created_at', 'day').count(), 1)
+
+        order = Order.objects.first()
+        items_total = order.items.aggregate(
+            total=Sum(F('price') * F('quantity'), output_field=DecimalField())
+        )['total']
+        self.assertEqual(order.total_amount, items_total)
+        self.assertEqual(sum(DailySalesRollup.objects.values_list('orders_count', flat=True)), 50)
+
+    def test_seed_refuses_to_duplicate(self):
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('seed_store', users=1, products=1, orders=0, stdout=StringIO())
+        call_command('seed_store', users=5, products=5, orders=5, flush=True, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 5)
+
+    def test_bench_endpoints_writes_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            call_command('bench_endpoints', iterations=3, warmup=1, output=output, stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+
+            out = StringIO()
+            call_command(
+                'bench_endpoints', 'catalog_list', iterations=2, warmup=0,
+                output=os.path.join(directory, 'again.json'), compare=output, stdout=out,
+            )
+
+        self.assertEqual(report['meta']['dataset']['orders'], 50)
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(set(result['statuses']), {'200'}, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(report['scenarios']['order_history']['queries_per_request'], 0)
+        self.assertIn('p95_ms', out.getvalue().split('vs ')[1])
+
+
+@override_settings(STRIPE_FAKE_LATENCY_MS=0, STRIPE_FAKE_PAY_AFTER=-1)
+class FakeStripeTests(TestCase):
+    """Test the in-process Stripe stand-in used by the local profile"""
+
+    def test_session_round_trip(self):
+        session = fake_stripe.checkout.Session.create(
+            metadata={'order_id': 7},
+            line_items=[{'price_data': {'unit_amount': 500}, 'quantity': 2}],
+            success_url='http://shop.test/ok?session_id={CHECKOUT_SESSION_ID}',
+        )
+        self.assertEqual(session.url, f'http://shop.test/ok?session_id={session.id}')
+        fetched = fake_stripe.checkout.Session.retrieve(session.id)
+        self.assertEqual(fetched.get('metadata'), {'order_id': '7'})
+        self.assertEqual(fetched['amount_total'], 1000)
+        with self.assertRaises(fake_stripe.error.StripeError):
+            fake_stripe.checkout.Session.retrieve('cs_missing')
+
+    def test_webhook_signature(self):
+        payload = json.dumps({'type': 'ping'}).encode()
+        header = fake_stripe.sign(payload, 'whsec_test')
+        self.assertEqual(fake_stripe.Webhook.construct_event(payload, header, 'whsec_test'), {'type': 'ping'})
+        with self.assertRaises(fake_stripe.error.SignatureVerificationError):
+            fake_stripe.Webhook.construct_event(payload, header, 'whsec_other')
+        with self.assertRaises(fake_stripe.error.SignatureVerificationError):
+            fake_stripe.Webhook.construct_event(payload, fake_stripe.sign(payload, 'whsec_test', 1), 'whsec_test')
+
+
+class FakeService:
+    """
+    Local HTTP server for outbound-call tests. ``responses`` maps a path to a
+    list of (status, delay_seconds); each request pops the next one (the
+    last one repeats).
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.hits = []  # (method, path, client port)
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def handle_one(self):
+                service.hits.append((self.command, self.path, self.client_address[1]))
+                queue = service.responses[self.path.split('?')[0]]
+                status_code, delay = queue.pop(0) if len(queue) > 1 else queue[0]
+                time.sleep(delay)
+                body = json.dumps({'id': 'cs_local', 'object': 'checkout.session', 'url': 'http://pay'}).encode()
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = handle_one
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+FAST = {'connect_timeout': 1, 'read_timeout': 1, 'retries': 2, 'backoff': 0, 'breaker_failures': 3,
+        'breaker_reset': 0.2}
+
+
+@override_settings(OUTBOUND_HTTP={'default': FAST, 'stripe': FAST})
+class OutboundHTTPTests(TestCase):
+    """Test the pooled outbound sessions: timeouts, retries, circuit breaker, metrics"""
+
+    def setUp(self):
+        http.reset()
+        http.install()
+        self.addCleanup(http.install)
+        self.addCleanup(http.reset)
+
+    def serve(self, responses):
+        service = FakeService(responses)
+        self.addCleanup(service.close)
+        return service
+
+    def outcome_count(self, service, outcome):
+        return REGISTRY.get_sample_value('outbound_requests_total', {'service': service, 'outcome': outcome}) or 0
+
+    def test_connections_are_reused(self):
+        service = self.serve({'/ok': [(200, 0)]})
+        for _ in range(3):
+            self.assertEqual(http.session().get(f'{service.url}/ok').status_code, 200)
+        self.assertEqual(len({port for _, _, port in service.hits}), 1)
+
+    def test_idempotent_requests_are_retried(self):
+        service = self.serve({'/flaky': [(503, 0), (503, 0), (200, 0)]})
+        self.assertEqual(http.session().get(f'{service.url}/flaky').status_code, 200)
+        self.assertEqual(len(service.hits), 3)
+
+        service = self.serve({'/flaky': [(503, 0), (200, 0)]})
+        self.assertEqual(http.session().post(f'{service.url}/flaky').status_code, 503)
+        self.assertEqual(len(service.hits), 1)
+
+    @override_settings(OUTBOUND_HTTP={'default': {**FAST, 'read_timeout': 0.1, 'retries': 0}})
+    def test_default_timeout_applies(self):
+        http.reset()
+        service = self.serve({'/slow': [(200, 1)]})
+        before = self.outcome_count('default', 'timeout')
+        started = time.monotonic()
+        with self.assertRaises(requests.exceptions.Timeout):
+            http.session().get(f'{service.url}/slow')
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assertEqual(self.outcome_count('default', 'timeout'), before + 1)
+
+    def test_circuit_opens_fails_fast_and_recovers(self):
+        service = self.serve({'/down': [(500, 0), (500, 0), (500, 0), (200, 0)]})
+        for _ in range(3):
+            self.assertEqual(http.session().get(f'{service.url}/down').status_code, 500)
+        self.assertEqual(http.breaker('default').state, 'open')
+
+        with self.assertRaises(http.CircuitOpen):
+            http.session().get(f'{service.url}/down')
+        self.assertEqual(len(service.hits), 3)  # the open circuit never called out
+
+        time.sleep(0.25)
+        self.assertEqual(http.session().get(f'{service.url}/down').status_code, 200)  # the probe
+        self.assertEqual(http.breaker('default').state, 'closed')
+
+    def test_guard_ignores_answered_errors(self):
+        for _ in range(5):
+            with self.assertRaises(KeyError), http.guard('default', answered=(KeyError,)):
+                raise KeyError('not found')
+        self.assertEqual(http.breaker('default').state, 'closed')
+        for _ in range(3):
+            with self.assertRaises(OSError), http.guard('default'):
+                raise OSError('socket error')
+        self.assertEqual(http.breaker('default').state, 'open')
+
+    def test_stripe_uses_the_stripe_session(self):
+        service = self.serve({'/v1/checkout/sessions': [(200, 0)]})
+        before = self.outcome_count('stripe', 'ok')
+        with mock.patch.object(stripe, 'api_base', service.url):
+            session = stripe.checkout.Session.create(api_key='sk_test_local', mode='payment')
+            self.assertEqual(session.id, 'cs_local')
+            self.assertEqual(self.outcome_count('stripe', 'ok'), before + 1)
+
+            for _ in range(3):
+                http.breaker('stripe').failure()
+            with self.assertRaises(stripe.error.APIConnectionError):
+                stripe.checkout.Session.create(api_key='sk_test_local', mode='payment')
+        self.assertEqual(len(service.hits), 1)
+
+
+class DeadlineMiddlewareTests(TestCase):
+    """Test queue-wait load shedding and per-class statement timeouts"""
+
+    def setUp(self):
+        tiered.clear()
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(email='staff@test.com', password='pass12345', is_staff=True)
+
+    def get(self, path, waited=None, **params):
+        headers = {} if waited is None else {'HTTP_X_REQUEST_START': f't={time.time() - waited:.3f}'}
+        return self.client.get(path, params, **headers)
+
+    def test_low_priority_is_shed_first(self):
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.get('/api/panel/reports/', waited=0.5).status_code, 200)
+
+        response = self.get('/api/panel/reports/', waited=7)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(response['Retry-After'], ('7', '8'))  # the queue wait, rounded up
+        # Normal traffic that waited as long still runs
+        self.assertEqual(self.get('/api/products/', waited=7).status_code, 200)
+
+    def test_default_is_shed_past_its_deadline_but_checkout_never(self):
+        self.assertEqual(self.get('/api/products/', waited=45).status_code, 503)
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.get('/api/orders/verify-payment/', waited=300).status_code, 400)  # ran: no session_id
+
+    def test_nothing_is_shed_without_the_header(self):
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.get('/api/panel/reports/').status_code, 200)
+
+    @override_settings(REQUEST_CLASS_ROUTES={'product-list': 'low'})
+    def test_routes_setting_overrides_views(self):
+        self.assertEqual(self.get('/api/products/', waited=7).status_code, 503)
+
+    def test_queue_wait_units(self):
+        request = mock.Mock(META={'HTTP_X_REQUEST_START': 't=1000000000123'})  # milliseconds
+        self.assertAlmostEqual(deadlines.queue_wait(request, now=1000000001.123), 1.0)
+        request.META = {'HTTP_X_REQUEST_START': 'garbage'}
+        self.assertIsNone(deadlines.queue_wait(request))
+
+    def test_statement_timeout_is_set_only_when_it_changes(self):
+        raw = mock.MagicMock()
+        cursor = raw.cursor.return_value.__enter__.return_value
+        connection = mock.Mock(vendor='postgresql', connection=raw, in_atomic_block=False)
+        execute = mock.Mock()
+        wrapper = deadlines.StatementTimeout()
+        wrapper.timeout_ms = 10000
+        for _ in range(2):
+            wrapper(execute, 'SELECT 1', None, False, {'connection': connection})
+        cursor.execute.assert_called_once_with("SELECT set_config('statement_timeout', %s, false)", ['10000'])
+
+        wrapper.timeout_ms = 30000
+        wrapper(execute, 'SELECT 1', None, False, {'connection': connection})
+        self.assertEqual(cursor.execute.call_count, 2)
+        self.assertEqual(execute.call_count, 3)
+
+    def test_streaming_export_runs_without_a_statement_timeout(self):
+        Order.objects.create(user=self.staff, payment_method='cod', total_amount=10)
+        seen = []
+        original = deadlines.StatementTimeout.__call__
+
+        def spy(wrapper, execute, sql, params, many, context):
+            seen.append((wrapper.timeout_ms, sql))
+            return original(wrapper, execute, sql, params, many, context)
+
+        self.client.force_authenticate(user=self.staff)
+        with mock.patch.object(deadlines.StatementTimeout, '__call__', spy):
+            response = self.get('/api/orders/admin/export/', waited=0.5)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            reports = self.get('/api/panel/reports/', waited=0.5)
+        self.assertEqual((len(lines), reports.status_code), (2, 200))
+
+        # The rows are read after the view returns, still under the wrapper, with no limit
+        export_timeouts = {ms for ms, sql in seen if '"item_count"' in sql}
+        self.assertEqual(export_timeouts, {0})
+        self.assertIn(30000, {ms for ms, _ in seen})  # analytics keep theirs
+
+    def test_statement_timeout_error_is_503(self):
+        middleware = deadlines.DeadlineMiddleware(lambda request: None)
+        error = OperationalError('canceling statement due to statement timeout')
+        response = middleware.process_exception(mock.Mock(method='GET', path='/api/panel/reports/'), error)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Test read routing against a second SQLite database standing in for the
+    replica: a snapshot of the primary that then falls behind it
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        if 'replica' in settings.DATABASES:
+            raise unittest.SkipTest('A real replica is configured (mirrored onto the test database)')
+        super().setUpClass()
+        # Added after the test runner set up the test databases: this one is not a test copy
+        cls.replica_path = tempfile.mktemp(suffix='.sqlite3')
+        connections.databases['replica'] = {**connections.databases['default'], 'NAME': cls.replica_path}
+        cls.databases = {*cls.databases, 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        cls.databases = {'default'}
+        super().tearDownClass()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(cls.replica_path + suffix):
+                os.remove(cls.replica_path + suffix)
+
+    def setUp(self):
+        tiered.clear()
+        replica.caches[replica.PIN_CACHE_ALIAS].clear()
+        replica.replica_health.reset()
+        self.addCleanup(replica.replica_health.reset)
+        self.staff = get_user_model().objects.create_user(email='staff@test.com', password='pass12345', is_staff=True)
+        self.product = Product.objects.create(
+            name='Replicated', price=10, category='men', description='On both databases', stock=3
+        )
+        self.snapshot()
+        Product.objects.filter(id=self.product.id).update(stock=99)  # the replica has not caught up
+        self.client = APIClient()
+
+    def snapshot(self):
+        connections['replica'].close()
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(self.replica_path)
+        primary.connection.backup(target)
+        target.close()
+
+    def stock_seen(self, **extra):
+        tiered.invalidate(CATALOG_NAMESPACE)  # not clear(): the pins share its cache
+        response = self.client.get(f'/api/products/{self.product.id}/', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.data['stock']
+
+    def test_safe_requests_read_the_replica(self):
+        self.assertEqual(self.stock_seen(), 3)
+        self.assertEqual(replica.replica_health.state, 'ok')
+
+    def test_writers_are_pinned_to_the_primary(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.patch(f'/api/products/{self.product.id}/', {'description': 'Edited on the primary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(replica.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.stock_seen(), 99)
+
+        # The writer's browser is pinned even logged out (the cookie), and
+        # the user on another device (by id)
+        self.client = APIClient()
+        self.client.cookies[replica.PIN_COOKIE] = response.cookies[replica.PIN_COOKIE].value
+        self.assertEqual(self.stock_seen(), 99)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.stock_seen(), 99)
+
+        # Anyone else, even from the same (proxy) address, still reads the replica
+        self.client = APIClient()
+        self.assertEqual(self.stock_seen(), 3)
+
+    def test_instances_read_from_the_replica_are_saved_to_the_primary(self):
+        product = Product.objects.using('replica').get(id=self.product.id)
+        product.description = 'Saved'
+        product.save(update_fields=['description'])
+        self.assertEqual(Product.objects.using('default').get(id=self.product.id).description, 'Saved')
+        self.assertEqual(Product.objects.using('replica').get(id=self.product.id).description, 'On both databases')
+
+    def test_opted_out_views_read_the_primary(self):
+        # Written by the webhook after the replica's snapshot
+        order = Order.objects.create(user=self.staff, payment_method='stripe', payment_status='paid', total_amount=10)
+        self.client.force_authenticate(user=self.staff)
+        with mock.patch('orders.views.stripe.checkout.Session.retrieve') as retrieve:
+            retrieve.return_value = {'metadata': {'order_id': str(order.id)}, 'payment_status': 'paid'}
+            response = self.client.get('/api/orders/verify-payment/', {'session_id': 'cs_1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['payment_status'], 'paid')
+
+    def test_falls_back_when_down_or_lagging(self):
+        with mock.patch.object(replica.ReplicaHealth, 'check', return_value='down'):
+            self.assertEqual(self.stock_seen(), 99)
+        self.assertEqual(replica.replica_health.state, 'down')
+
+        replica.replica_health.reset()
+        with override_settings(REPLICA_MAX_LAG=-1):  # any lag is too much
+            self.assertEqual(self.stock_seen(), 99)
+        self.assertEqual(replica.replica_health.state, 'lagging')
+
+        response = self.client.get('/ready/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_outside_requests_everything_uses_the_primary(self):
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 99)
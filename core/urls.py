@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import health, prometheus_metrics, ready
+
+urlpatterns = [
+    path("health/", health, name="health"),
+    path("ready/", ready, name="ready"),
+    path("metrics", prometheus_metrics, name="metrics"),
+]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.http import HttpResponse, JsonResponse
+
+from . import db, metrics
+from .replica import REPLICA
+
+
+# ================================
+# LIVENESS
+# The process is up and serving; no dependencies checked
+# ================================
+def health(request):
+    return JsonResponse({"status": "ok"})
+
+
+# ================================
+# READINESS
+# Pings every configured database; a down
+# replica is reported but not fatal (reads
+# fall back to the primary)
+# ================================
+def ready(request):
+    checks = {}
+    for alias in settings.DATABASES:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT 1")
+            checks[alias] = "ok"
+        except DatabaseError as e:
+            checks[alias] = f"error: {e}"
+
+    healthy = all(result == "ok" for alias, result in checks.items() if alias != REPLICA)
+    return JsonResponse(
+        {"status": "ok" if healthy else "unavailable", "databases": checks},
+        status=200 if healthy else 503,
+    )
+
+
+# ================================
+# PROMETHEUS METRICS
+# Optional bearer token: METRICS_TOKEN
+# ================================
+def prometheus_metrics(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+
+    db.observe_pools(force=True)
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
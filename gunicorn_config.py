@@ -1,15 +1,27 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
+import shutil
 
 # Server socket
-bind = "0.0.0.0:8000"
+# Loopback only: nginx proxies to it and sets X-Real-IP, which the rate
+# limiter trusts (RATELIMIT_IP_META_KEY); a client reaching gunicorn
+# directly could set it to anything
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
 backlog = 2048
 
 # Worker processes
-workers = 2  # For t2.micro with 1GB RAM, keep it low
-worker_class = "sync"
+# gthread: each worker serves `threads` requests at once, so a view blocked
+# on Stripe, Google or Cloudinary holds one thread instead of a whole
+# worker. Threads share the worker's memory, so this scales concurrency
+# without more RAM. Pair it with DB_POOL=True (DB_POOL_MAX_SIZE >= threads)
+# so threads share a few Postgres connections instead of one each.
+# GUNICORN_WORKER_CLASS=sync restores one-request-per-worker.
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))  # For t2.micro with 1GB RAM, keep it low
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
 worker_connections = 1000
-timeout = 120
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 keepalive = 5
 
 # Logging
@@ -32,3 +44,20 @@ tmp_upload_dir = None
 # SSL (handled by Nginx)
 # keyfile = None
 # certfile = None
+
+# Prometheus multiprocess mode: every worker writes its samples under this
+# directory and /metrics merges them (core.metrics). Wiped at startup so
+# a restart doesn't resurrect dead workers' counters.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/souled-metrics")
+
+
+def on_starting(server):
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
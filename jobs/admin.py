@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "queue", "priority", "status", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "queue", "name")
+    search_fields = ("name", "last_error")
+    ordering = ("-id",)
+    actions = ["retry_now"]
+
+    @admin.action(description="Queue selected jobs to run now")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0, last_error=""
+        )
+        self.message_user(request, f"{updated} job(s) queued")
@@ -0,0 +1,126 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from jobs import queue
+
+logger = logging.getLogger("jobs.worker")
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the jobs table until stopped (SIGTERM finishes the current jobs first)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", action="append", dest="queues", help="Repeatable (default: default)")
+        parser.add_argument("--threads", type=int, default=getattr(settings, "JOBS_WORKER_THREADS", 2))
+        parser.add_argument("--batch", type=int, default=1, help="Jobs claimed per round trip, per thread")
+        parser.add_argument("--interval", type=float, default=getattr(settings, "JOBS_POLL_INTERVAL", 1.0),
+                            help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--report-every", type=float, default=60, help="Seconds between throughput reports")
+        parser.add_argument("--burst", action="store_true", help="Exit once no jobs are due")
+
+    def handle(self, *args, **options):
+        multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+
+        self.queues = tuple(options["queues"] or ["default"])
+        self.stop = threading.Event()
+        self.results = Counter()
+        self.crashed = 0
+        self.lock = threading.Lock()
+        previous_handlers = {
+            sig: signal.signal(sig, lambda *_: self.stop.set()) for sig in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        threads = [
+            threading.Thread(target=self.loop, args=(f"{worker}:{n}", options), daemon=True)
+            for n in range(options["threads"])
+        ]
+        logger.info(f"Worker {worker} started: queues={','.join(self.queues)} threads={len(threads)}")
+        for thread in threads:
+            thread.start()
+
+        last_report, last_results = time.monotonic(), Counter()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+            if time.monotonic() - last_report >= options["report_every"] and not self.stop.is_set():
+                close_old_connections()
+                try:
+                    last_report, last_results = self.report(last_report, last_results)
+                    queue.requeue_stale()
+                    queue.prune()
+                except DatabaseError as e:
+                    logger.warning(f"Housekeeping failed: {e}")
+                    last_report = time.monotonic()
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+        try:
+            self.report(last_report, last_results)
+        except DatabaseError as e:
+            logger.warning(f"Final report failed: {e}")
+        connection.close()
+        if self.crashed:
+            # Non-zero, so systemd (Restart=on-failure) brings the worker back
+            raise CommandError(f"{self.crashed} worker thread(s) died")
+
+    def loop(self, worker_id, options):
+        try:
+            while not self.stop.is_set():
+                # Drop a connection that broke (database restart, network blip)
+                # or outlived CONN_MAX_AGE, as Django does around each request
+                close_old_connections()
+                try:
+                    jobs = queue.claim(worker_id, self.queues, options["batch"])
+                except DatabaseError as e:
+                    logger.warning(f"Could not claim jobs: {e}")
+                    self.stop.wait(options["interval"])
+                    continue
+                if not jobs:
+                    if options["burst"]:
+                        return
+                    self.stop.wait(options["interval"])
+                    continue
+                for job in jobs:
+                    try:
+                        result = queue.run(job)
+                    except DatabaseError as e:
+                        # Recording the outcome failed; the job stays running
+                        # until requeue_stale() picks it up again
+                        logger.warning(f"Could not record job {job.id} {job.name}: {e}")
+                        result = "error"
+                    with self.lock:
+                        self.results[result] += 1
+        except Exception:
+            logger.exception(f"Worker thread {worker_id} died")
+            with self.lock:
+                self.crashed += 1
+            self.stop.set()  # the others finish their jobs, then the command exits non-zero
+        finally:
+            connection.close()
+
+    def report(self, since, previous):
+        now = time.monotonic()
+        with self.lock:
+            current = self.results.copy()
+        delta = current - previous
+        elapsed = max(now - since, 1e-9)
+        stats = queue.stats()
+        logger.info(
+            f"jobs: {delta['done']} done, {delta['retry']} retried, {delta['failed']} failed, "
+            f"{delta['error']} unrecorded "
+            f"in {elapsed:.0f}s ({sum(delta.values()) / elapsed:.1f}/s); "
+            f"queued={stats['counts']['queued']} oldest_due={stats['oldest_due_seconds']}s"
+        )
+        return now, current
@@ -0,0 +1,55 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    One unit of background work, run by `manage.py run_jobs`.
+
+    Workers claim queued rows whose run_at has passed, highest priority
+    first, with SELECT ... FOR UPDATE SKIP LOCKED (see jobs.queue).
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=200)  # registered task name
+    payload = models.JSONField(default=dict, blank=True)  # keyword arguments
+    queue = models.CharField(max_length=50, default="default")
+    priority = models.SmallIntegerField(default=0)  # higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    run_at = models.DateTimeField(default=timezone.now)  # not before
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The claim query; only queued rows are indexed, so the index stays small
+            models.Index(
+                fields=["queue", "-priority", "run_at", "id"],
+                name="job_claim_idx",
+                condition=Q(status="queued"),
+            ),
+            # Stale-lock recovery and pruning
+            models.Index(fields=["status", "locked_at"], name="job_status_locked_idx"),
+            models.Index(fields=["status", "finished_at"], name="job_status_finished_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.name} ({self.status})"
@@ -0,0 +1,242 @@
+"""
+Database-backed job queue.
+
+Slow side effects are written as rows of jobs.models.Job in the caller's
+transaction (so a job exists exactly when the data it refers to does)
+and run later by `manage.py run_jobs`. No broker: the jobs table is the
+queue.
+
+Declaring and enqueueing work::
+
+    @task(max_attempts=10)
+    def mark_order_paid(order_id):
+        ...
+
+    mark_order_paid.enqueue(order_id=order.id)              # as soon as possible
+    mark_order_paid.enqueue(order_id=order.id, delay=60)    # not before a minute
+    mark_order_paid(order_id=order.id)                      # inline, no queue
+
+Tasks live in each app's tasks.py (imported by JobsConfig.ready()) and
+take JSON-serialisable keyword arguments. A task may run more than once
+(a worker can die after the work but before marking it done), so tasks
+must be idempotent.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED on Postgres, so any
+number of workers pull different jobs without blocking each other.
+SQLite has no row locks; there the conditional UPDATE that marks jobs
+running is what keeps two workers from taking the same job.
+
+A failed job is retried with exponential backoff until max_attempts,
+then left as "failed" for inspection (admin: "Queue selected jobs to run
+now"). A job whose worker died is requeued after JOBS_STALE_AFTER seconds.
+"""
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from core import metrics
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+class Task:
+    def __init__(self, fn, name, queue, priority, max_attempts, on_failure=None):
+        self.fn = fn
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+        self.__doc__ = fn.__doc__
+
+    def __call__(self, **kwargs):
+        return self.fn(**kwargs)
+
+    def enqueue(self, delay=None, run_at=None, priority=None, queue=None, **kwargs):
+        """Queue a run with ``kwargs``; returns the Job."""
+        return enqueue(
+            self.name,
+            kwargs,
+            queue=queue or self.queue,
+            priority=self.priority if priority is None else priority,
+            run_at=run_at,
+            delay=delay,
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(name=None, queue="default", priority=0, max_attempts=5, on_failure=None):
+    """
+    Register a function as a task (named ``module.function`` by default).
+    ``on_failure`` is called with the same kwargs once the last attempt fails.
+    """
+    def decorator(fn):
+        registered = Task(
+            fn, name or f"{fn.__module__}.{fn.__name__}", queue, priority, max_attempts, on_failure
+        )
+        REGISTRY[registered.name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(name, payload=None, queue="default", priority=0, run_at=None, delay=None, max_attempts=5):
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown task: {name}")
+    if run_at is None:
+        run_at = timezone.now()
+    if delay:
+        run_at += timedelta(seconds=delay)
+
+    job = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        queue=queue,
+        priority=priority,
+        run_at=run_at,
+        max_attempts=max_attempts,
+    )
+    transaction.on_commit(lambda: metrics.JOBS_ENQUEUED.labels(name).inc())
+    return job
+
+
+# ----------------------------------------------------------------
+# Claiming and running
+# ----------------------------------------------------------------
+def claim(worker_id, queues=("default",), limit=1):
+    """Mark up to ``limit`` due jobs as running by ``worker_id`` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.filter(status=Job.QUEUED, queue__in=queues, run_at__lte=now)
+            .order_by("-priority", "run_at", "id")
+            .select_for_update(skip_locked=True)
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F("attempts") + 1
+        )
+    return list(
+        Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker_id, locked_at=now)
+        .order_by("-priority", "run_at", "id")
+    )
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number ``attempt`` (1-based), with +-25% jitter."""
+    base = getattr(settings, "JOBS_BACKOFF_BASE", 5)
+    cap = getattr(settings, "JOBS_BACKOFF_MAX", 3600)
+    return min(base * 2 ** (attempt - 1), cap) * random.uniform(0.75, 1.25)
+
+
+def run(job):
+    """Run a claimed job and record the outcome. Returns "done", "retry" or "failed"."""
+    started = timezone.now()
+    metrics.JOB_QUEUE_LAG.labels(job.queue).observe(max(0, (started - job.run_at).total_seconds()))
+    clock = time.perf_counter()
+    mine = Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+
+    registered = REGISTRY.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task: {job.name}")
+        registered.fn(**job.payload)
+    except Exception as e:
+        error = traceback.format_exc()[-5000:]
+        if job.attempts >= job.max_attempts:
+            result = "failed"
+            mine.update(status=Job.FAILED, finished_at=timezone.now(), locked_by="", last_error=error)
+            logger.error(f"Job {job.id} {job.name} failed for good after {job.attempts} attempts: {e}")
+            _on_failure(job)
+        else:
+            result = "retry"
+            delay = backoff(job.attempts)
+            mine.update(
+                status=Job.QUEUED, run_at=timezone.now() + timedelta(seconds=delay), locked_by="",
+                locked_at=None, last_error=error,
+            )
+            logger.warning(f"Job {job.id} {job.name} attempt {job.attempts} failed, retrying in {delay:.0f}s: {e}")
+    else:
+        result = "done"
+        mine.update(status=Job.DONE, finished_at=timezone.now(), locked_by="")
+
+    metrics.JOBS_PROCESSED.labels(job.name, result).inc()
+    metrics.JOB_DURATION.labels(job.name).observe(time.perf_counter() - clock)
+    return result
+
+
+def _on_failure(job):
+    registered = REGISTRY.get(job.name)
+    if registered is not None and registered.on_failure is not None:
+        try:
+            registered.on_failure(**job.payload)
+        except Exception:
+            logger.exception(f"on_failure of job {job.id} {job.name} raised")
+
+
+def run_pending(worker_id="inline", queues=("default",), limit=None):
+    """Run due jobs in this process until none are left (or ``limit`` ran). Returns the count."""
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim(worker_id, queues, 1)
+        if not jobs:
+            break
+        run(jobs[0])
+        count += 1
+    return count
+
+
+# ----------------------------------------------------------------
+# Housekeeping
+# ----------------------------------------------------------------
+def requeue_stale(older_than=None):
+    """Requeue (or fail, if out of attempts) jobs whose worker stopped reporting. Returns the count."""
+    if older_than is None:
+        older_than = getattr(settings, "JOBS_STALE_AFTER", 600)
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=older_than))
+    now = timezone.now()
+    failed = 0
+    for job in stale.filter(attempts__gte=F("max_attempts")).only("id", "name", "payload", "locked_by"):
+        # Unless its worker came back and finished it meanwhile
+        if stale.filter(pk=job.pk, locked_by=job.locked_by).update(
+            status=Job.FAILED, finished_at=now, locked_by="", last_error="Worker lost"
+        ):
+            failed += 1
+            _on_failure(job)
+    requeued = stale.update(status=Job.QUEUED, run_at=now, locked_by="", locked_at=None, last_error="Worker lost")
+    if failed or requeued:
+        logger.warning(f"Recovered stale jobs: {requeued} requeued, {failed} failed")
+    return failed + requeued
+
+
+def prune(older_than_days=None):
+    """Delete done jobs finished more than ``older_than_days`` ago. Returns the count."""
+    if older_than_days is None:
+        older_than_days = getattr(settings, "JOBS_KEEP_DONE_DAYS", 7)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def stats():
+    """Job counts by status, and the age in seconds of the oldest job that is due but not started."""
+    counts = dict(Job.objects.order_by().values_list("status").annotate(n=Count("id")))
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).aggregate(oldest=Min("run_at"))
+    return {
+        "counts": {status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+        "oldest_due_seconds": (
+            round((timezone.now() - oldest["oldest"]).total_seconds(), 1) if oldest["oldest"] else 0
+        ),
+    }
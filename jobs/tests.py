@@ -0,0 +1,160 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.task()
+def record(value):
+    calls.append(value)
+
+
+@queue.task(max_attempts=2)
+def explode():
+    raise RuntimeError("boom")
+
+
+def record_failure(value):
+    calls.append(f"gave up on {value}")
+
+
+@queue.task(max_attempts=1, on_failure=record_failure)
+def record_once(value):
+    calls.append(value)
+
+
+class JobQueueTests(TestCase):
+    """Test enqueueing, claiming, retries and housekeeping"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        job = record.enqueue(value="a")
+        self.assertEqual(job.name, "jobs.tests.record")
+        self.assertEqual(job.payload, {"value": "a"})
+
+        self.assertEqual(queue.run_pending(), 1)
+        self.assertEqual(calls, ["a"])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue("no.such.task")
+
+    def test_priority_then_due_time(self):
+        record.enqueue(value="low")
+        record.enqueue(value="high", priority=5)
+        record.enqueue(value="later", priority=9, delay=60)
+
+        queue.run_pending()
+        self.assertEqual(calls, ["high", "low"])  # "later" is not due yet
+
+        Job.objects.filter(status=Job.QUEUED).update(run_at=timezone.now())
+        queue.run_pending()
+        self.assertEqual(calls, ["high", "low", "later"])
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        first, second = record.enqueue(value=1), record.enqueue(value=2)
+        claimed = queue.claim("worker-a", limit=1)
+        self.assertEqual([job.id for job in claimed], [first.id])
+        self.assertEqual([job.id for job in queue.claim("worker-b", limit=5)], [second.id])
+        self.assertEqual(queue.claim("worker-c"), [])
+
+    def test_retry_with_backoff_then_fail(self):
+        job = explode.enqueue()
+        with mock.patch("jobs.queue.backoff", return_value=30):
+            self.assertEqual(queue.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        queue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOBS_BACKOFF_BASE=5, JOBS_BACKOFF_MAX=60)
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch("jobs.queue.random.uniform", return_value=1):
+            self.assertEqual([queue.backoff(n) for n in (1, 2, 3, 10)], [5, 10, 20, 60])
+
+    def test_stale_jobs_are_recovered(self):
+        job = record.enqueue(value="x")
+        queue.claim("dead-worker")
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(queue.requeue_stale(older_than=600), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.QUEUED, ""))
+        self.assertEqual(queue.stats()["counts"]["queued"], 1)
+
+    def test_stale_jobs_out_of_attempts_fail_with_their_hook(self):
+        job = record_once.enqueue(value="x")
+        queue.claim("dead-worker")
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(queue.requeue_stale(older_than=600), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(calls, ["gave up on x"])
+
+    def test_prune_keeps_recent_and_failed_jobs(self):
+        old = record.enqueue(value=1)
+        recent = record.enqueue(value=2)
+        failed = explode.enqueue()
+        queue.run_pending()
+        long_ago = timezone.now() - timedelta(days=30)
+        Job.objects.filter(pk__in=[old.pk, failed.pk]).update(status=Job.DONE, finished_at=long_ago)
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED)
+
+        self.assertEqual(queue.prune(older_than_days=7), 1)
+        self.assertEqual(set(Job.objects.values_list("id", flat=True)), {recent.id, failed.id})
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    """Test the worker command (its threads need committed jobs)"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_runs_everything_due(self):
+        for n in range(5):
+            record.enqueue(value=n)
+        call_command("run_jobs", "--burst", "--threads", "1", stdout=StringIO())
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+
+    def test_database_errors_while_recording_do_not_kill_the_worker(self):
+        first, second = record.enqueue(value=1), record.enqueue(value=2)
+        real_run = queue.run
+
+        def flaky_run(job):
+            if job.id == first.id:
+                raise OperationalError("server closed the connection unexpectedly")
+            return real_run(job)
+
+        with mock.patch("jobs.queue.run", side_effect=flaky_run):
+            call_command("run_jobs", "--burst", "--threads", "1", stdout=StringIO())
+        self.assertEqual(calls, [2])
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.RUNNING)  # left for requeue_stale()
+        self.assertEqual(Job.objects.get(pk=second.pk).status, Job.DONE)
+
+    def test_exits_non_zero_when_a_worker_thread_dies(self):
+        with mock.patch("jobs.queue.claim", side_effect=RuntimeError("bug")):
+            with self.assertRaises(CommandError):
+                call_command("run_jobs", "--burst", "--threads", "2", stdout=StringIO())
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Address, Order, OrderItem
+from .models import Address, Order, OrderItem, OrderStatusHistory
 
 
 @admin.register(Address)
@@ -15,13 +15,25 @@ class OrderItemInline(admin.TabularInline):
     can_delete = False
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    extra = 0
+    readonly_fields = ("from_status", "to_status", "changed_by", "changed_at")
+    can_delete = False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "payment_status", "order_status", "payment_method", "total_amount", "created_at")
     list_filter = ("payment_status", "order_status", "payment_method", "created_at")
     search_fields = ("id", "user__email", "user__username")
-    inlines = [OrderItemInline]
-    readonly_fields = ("total_amount", "stripe_session_id", "created_at")
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
+    # Status and payment changes go through the API views, which keep the
+    # sales rollups, user order stats and status history (orders.events) in step
+    readonly_fields = (
+        "order_status", "payment_status", "payment_method",
+        "total_amount", "stripe_session_id", "created_at",
+    )
     ordering = ("-created_at",)
 
     # Disable add and delete for safety
@@ -0,0 +1,94 @@
+"""
+Order lifecycle hooks.
+
+Views call these right after they change an order (orders.signals calls
+order_deleted for every delete, cascades included) so every derived
+table stays in step: the daily sales rollup (panel.rollups) and the
+per-user order stats denormalized on User (order_count, lifetime_value,
+last_order_at). lifetime_value counts paid orders only, matching revenue.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce, Greatest
+
+from core import metrics
+from panel import rollups
+
+from .models import Order
+
+
+def order_created(order):
+    rollups.record_order_created(order)
+    transaction.on_commit(lambda: metrics.ORDERS_CREATED.labels(order.payment_method).inc())
+
+    updates = {"order_count": F("order_count") + 1, "last_order_at": order.created_at}
+    if order.payment_status == "paid":
+        updates["lifetime_value"] = F("lifetime_value") + Decimal(str(order.total_amount))
+    get_user_model().objects.filter(pk=order.user_id).update(**updates)
+
+
+def order_deleted(order):
+    rollups.record_order_deleted(order)
+
+    # The row is already gone, so the subquery finds the user's latest remaining order
+    remaining = Order.objects.filter(user=OuterRef("pk")).order_by("-created_at").values("created_at")[:1]
+    updates = {"order_count": Greatest(F("order_count") - 1, 0), "last_order_at": Subquery(remaining)}
+    if order.payment_status == "paid":
+        updates["lifetime_value"] = F("lifetime_value") - Decimal(str(order.total_amount))
+    get_user_model().objects.filter(pk=order.user_id).update(**updates)
+
+
+def order_status_changed(order, old_status, new_status):
+    rollups.record_status_change(order, old_status, new_status)
+
+
+def order_payment_changed(order, old_status, new_status):
+    rollups.record_payment_change(order, old_status, new_status)
+
+    if old_status == new_status or "paid" not in (old_status, new_status):
+        return
+    if new_status == "paid":
+        transaction.on_commit(lambda: metrics.ORDERS_PAID.labels(order.payment_method).inc())
+    amount = Decimal(str(order.total_amount))
+    if new_status != "paid":
+        amount = -amount
+    get_user_model().objects.filter(pk=order.user_id).update(
+        lifetime_value=F("lifetime_value") + amount
+    )
+
+
+def orders_status_changed(changes, new_status):
+    """Bulk variant: ``changes`` is a list of (created_at, old_status)."""
+    rollups.record_bulk_status_change(changes, new_status)
+
+
+def rebuild_user_order_stats(user_model=None, order_model=None):
+    """
+    Recompute every user's order stats with one UPDATE. Models are
+    parameters so migrations can pass historical versions.
+    """
+    if user_model is None:
+        user_model = get_user_model()
+    if order_model is None:
+        order_model = Order
+
+    per_user = order_model.objects.filter(user=OuterRef("pk")).order_by().values("user")
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    return user_model.objects.update(
+        order_count=Coalesce(Subquery(per_user.annotate(n=Count("id")).values("n")), 0),
+        lifetime_value=Coalesce(
+            Subquery(
+                per_user.annotate(
+                    total=Sum(Case(When(payment_status="paid", then="total_amount"), default=0, output_field=money))
+                ).values("total"),
+                output_field=money,
+            ),
+            Decimal("0"),
+            output_field=money,
+        ),
+        last_order_at=Subquery(per_user.annotate(last=Max("created_at")).values("last")),
+    )
@@ -0,0 +1,52 @@
+"""
+Row sources for order exports (see core.exports).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.exports import CHUNK_SIZE
+from .filters import filter_orders
+from .models import Order, OrderItem
+
+ORDER_EXPORT_COLUMNS = [
+    "id",
+    "created_at",
+    "user_email",
+    "full_name",
+    "city",
+    "pincode",
+    "payment_method",
+    "payment_status",
+    "order_status",
+    "total_amount",
+    "item_count",
+]
+
+
+def order_export_rows(params, chunk_size=CHUNK_SIZE):
+    """Yield one flat dict per order matching the admin filters in ``params``."""
+    item_count = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    queryset = filter_orders(Order.objects.all(), params)
+    return (
+        queryset.order_by("id")
+        .values(
+            "id",
+            "created_at",
+            "payment_method",
+            "payment_status",
+            "order_status",
+            "total_amount",
+            user_email=F("user__email"),
+            full_name=F("address__full_name"),
+            city=F("address__city"),
+            pincode=F("address__pincode"),
+            item_count=Coalesce(Subquery(item_count, output_field=IntegerField()), 0),
+        )
+        .iterator(chunk_size=chunk_size)
+    )
@@ -0,0 +1,48 @@
+"""
+Query-parameter filters for admin order listings.
+
+Kept separate from the views so list, export and bulk endpoints all
+accept the same filter vocabulary.
+"""
+from rest_framework.exceptions import ValidationError
+
+from core.filters import filter_date_range
+from .models import Order
+
+
+def _choice(params, name, choices):
+    value = str(params.get(name) or "").strip().lower()
+    if not value:
+        return None
+    valid = [choice[0] for choice in choices]
+    if value not in valid:
+        raise ValidationError({name: f"Must be one of: {', '.join(valid)}"})
+    return value
+
+
+def filter_orders(queryset, params):
+    """
+    Narrow an Order queryset using admin filter parameters.
+
+    Supported keys: order_status, payment_status, payment_method,
+    from / to (inclusive dates, YYYY-MM-DD) and email (case-insensitive
+    exact match on the customer's email).
+    """
+    order_status = _choice(params, "order_status", Order.ORDER_STATUS_CHOICES)
+    payment_status = _choice(params, "payment_status", Order.PAYMENT_STATUS_CHOICES)
+    payment_method = _choice(params, "payment_method", Order.PAYMENT_CHOICES)
+    email = str(params.get("email") or "").strip()
+
+    if order_status:
+        queryset = queryset.filter(order_status=order_status)
+    if payment_status:
+        queryset = queryset.filter(payment_status=payment_status)
+    if payment_method:
+        queryset = queryset.filter(payment_method=payment_method)
+
+    queryset = filter_date_range(queryset, params, "created_at")
+
+    if email:
+        queryset = queryset.filter(user__email__iexact=email)
+
+    return queryset
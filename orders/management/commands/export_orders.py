@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from core.exports import EXPORT_FORMATS, write_export
+from orders.exports import ORDER_EXPORT_COLUMNS, order_export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream orders to CSV or NDJSON with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output", help="File path (default: stdout)")
+        parser.add_argument("--from", dest="from", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="to", help="Last day, YYYY-MM-DD")
+        parser.add_argument("--order-status", dest="order_status")
+        parser.add_argument("--payment-status", dest="payment_status")
+        parser.add_argument("--payment-method", dest="payment_method")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key]
+            for key in ("from", "to", "order_status", "payment_status", "payment_method")
+            if options[key]
+        }
+        try:
+            rows = order_export_rows(params, chunk_size=options["chunk_size"])
+        except ValidationError as e:
+            raise CommandError(e.detail)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as stream:
+                count = write_export(stream, options["format"], ORDER_EXPORT_COLUMNS, rows)
+            self.stderr.write(f"Exported {count} orders to {options['output']}")
+        else:
+            write_export(self.stdout, options["format"], ORDER_EXPORT_COLUMNS, rows)
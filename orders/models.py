@@ -33,6 +33,14 @@ class Order(models.Model):
         ("cancelled", "Cancelled"),
     )
 
+    # Allowed order_status moves for fulfilment (enforced by bulk updates)
+    ORDER_STATUS_TRANSITIONS = {
+        "processing": ("shipped", "delivered", "cancelled"),
+        "shipped": ("delivered",),
+        "delivered": (),
+        "cancelled": (),
+    }
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=True)
     address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES)
@@ -42,8 +50,26 @@ class Order(models.Model):
     stripe_session_id = models.CharField(max_length=200, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    class Meta:
+        indexes = [
+            # Admin list: keyset pagination plus the common filters
+            models.Index(fields=["-created_at", "-id"], name="order_created_id_idx"),
+            models.Index(fields=["order_status", "-created_at"], name="order_status_created_idx"),
+            models.Index(fields=["payment_status", "-created_at"], name="order_payment_created_idx"),
+            models.Index(fields=["payment_method", "-created_at"], name="order_method_created_idx"),
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.id}"
+
+    @classmethod
+    def statuses_allowing(cls, target):
+        """Return the order statuses that may move to ``target``."""
+        return [
+            source for source, targets in cls.ORDER_STATUS_TRANSITIONS.items()
+            if target in targets
+        ]
     
 
 class OrderItem(models.Model):
@@ -54,3 +80,19 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product} × {self.quantity}"
+
+
+class OrderStatusHistory(models.Model):
+    order = models.ForeignKey(Order, related_name="status_history", on_delete=models.CASCADE, db_index=True)
+    from_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.ORDER_STATUS_CHOICES)
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "order status history"
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} → {self.to_status}"
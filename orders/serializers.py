@@ -81,9 +81,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return obj.product.name if obj.product else "Product Unavailable"
 
     def get_image(self, obj):
-        if obj.product and obj.product.image:
-            return obj.product.image.url
-        return None
+        return obj.product.image_url("thumbnail") if obj.product else None
 
     def get_category(self, obj):
         return obj.product.category if obj.product else "N/A"
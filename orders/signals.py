@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import events
+from .models import Order
+
+_rebuilding = ContextVar("orders_rebuilding", default=False)
+
+
+@contextmanager
+def rebuilding_stats():
+    """Skip per-order rollup and user stat updates; the caller rebuilds them after."""
+    token = _rebuilding.set(True)
+    try:
+        yield
+    finally:
+        _rebuilding.reset(token)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    # Admin deletes and the cascade from deleting a user bypass the views
+    if not _rebuilding.get():
+        events.order_deleted(instance)
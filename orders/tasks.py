@@ -0,0 +1,18 @@
+"""Background jobs for orders (run by `manage.py run_jobs`)."""
+import logging
+
+from jobs.queue import task
+
+from . import events
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+@task(priority=10, max_attempts=10)
+def mark_order_paid(order_id):
+    """Apply a Stripe checkout.session.completed. Safe to run twice."""
+    order = Order.objects.filter(id=order_id).first()
+    if order and Order.objects.filter(id=order.id, payment_status="unpaid").update(payment_status="paid"):
+        events.order_payment_changed(order, "unpaid", "paid")
+        logger.info(f"Order {order_id} payment marked as paid")
@@ -1,10 +1,19 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from products.models import Product
-from orders.models import Order, Address
+from orders.models import Order, OrderItem, Address
 from cart.models import Cart, CartItem
+from core import fake_stripe
+from jobs.queue import run_pending
 
 User = get_user_model()
 
@@ -63,6 +72,66 @@ class OrderCreationTests(TestCase):
         self.assertEqual(response.data['payment_status'], 'unpaid')
         self.assertEqual(response.data['order_status'], 'processing')
     
+    def test_stripe_session_is_created_outside_the_transaction(self):
+        """Test that the Stripe round trip holds no row locks or transaction"""
+        depth = len(connection.atomic_blocks)  # the test case's own atomics
+        seen = {}
+
+        def create_session(**kwargs):
+            seen['depth'] = len(connection.atomic_blocks)
+            return SimpleNamespace(id='cs_test_1', url='https://checkout.stripe.test/cs_test_1')
+
+        data = {
+            'cart': [{'id': self.product.id, 'name': self.product.name, 'price': '99.99', 'quantity': 1}],
+            'address_id': self.address.id,
+            'payment_method': 'stripe'
+        }
+        with mock.patch('orders.views.stripe.checkout.Session.create', side_effect=create_session):
+            response = self.client.post('/api/orders/create/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(seen['depth'], depth)
+        self.assertEqual(Order.objects.get().stripe_session_id, 'cs_test_1')
+
+    def test_stripe_outage_returns_503(self):
+        """Test that an unreachable Stripe (or open circuit) is reported as retryable"""
+        data = {
+            'cart': [{'id': self.product.id, 'name': self.product.name, 'price': '99.99', 'quantity': 1}],
+            'address_id': self.address.id,
+            'payment_method': 'stripe'
+        }
+        outage = fake_stripe.error.APIConnectionError('stripe circuit is open')
+        with mock.patch('orders.views.stripe', fake_stripe), \
+                mock.patch.object(fake_stripe.checkout.Session, 'create', side_effect=outage):
+            response = self.client.post('/api/orders/create/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @override_settings(STRIPE_FAKE_LATENCY_MS=0, STRIPE_FAKE_PAY_AFTER=-1)
+    def test_checkout_with_fake_stripe(self):
+        """Test the whole Stripe checkout against the local-profile fake"""
+        data = {
+            'cart': [{'id': self.product.id, 'name': self.product.name, 'price': '99.99', 'quantity': 1}],
+            'address_id': self.address.id,
+            'payment_method': 'stripe'
+        }
+        with mock.patch('orders.views.stripe', fake_stripe):
+            response = self.client.post('/api/orders/create/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            order = Order.objects.get()
+            self.assertIn(f'session_id={order.stripe_session_id}', response.data['checkout_url'])
+
+            # Customer pays; the fake posts the signed webhook in-process
+            webhook = fake_stripe.complete_session(order.stripe_session_id)
+            self.assertEqual(webhook.status_code, status.HTTP_200_OK)
+            self.assertEqual(run_pending(), 1)
+            order.refresh_from_db()
+            self.assertEqual(order.payment_status, 'paid')
+
+            response = self.client.get('/api/orders/verify-payment/', {'session_id': order.stripe_session_id})
+            self.assertTrue(response.data['payment_verified'])
+
     def test_create_order_with_insufficient_stock(self):
         """Test that order creation fails with insufficient stock"""
         data = {
@@ -112,3 +181,177 @@ class OrderCreationTests(TestCase):
         response = self.client.get('/api/orders/my/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+    def test_cancel_checks_status_under_the_lock(self):
+        """A cancel that read the order before a staff status update does not undo it"""
+        order = Order.objects.create(user=self.user, address=self.address, payment_method='cod', total_amount=99.99)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, price=99.99)
+        stale = Order.objects.get(id=order.id)
+        Order.objects.filter(id=order.id).update(order_status='shipped')
+
+        with mock.patch.object(Order.objects, 'select_related') as select_related:
+            select_related.return_value.prefetch_related.return_value.get.return_value = stale
+            response = self.client.post(f'/api/orders/{order.id}/cancel/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((order.order_status, self.product.stock), ('shipped', 10))
+        self.assertFalse(order.status_history.exists())
+
+
+class AdminOrderListTests(TestCase):
+    """Test keyset pagination and filters on the admin order list"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.customer = User.objects.create_user(
+            email='Customer@Test.com',
+            password='testpass123'
+        )
+
+        for i in range(5):
+            Order.objects.create(
+                user=self.customer,
+                payment_method='cod',
+                total_amount=10 + i,
+            )
+        Order.objects.create(
+            user=self.staff_user,
+            payment_method='stripe',
+            payment_status='paid',
+            order_status='shipped',
+            total_amount=50
+        )
+
+        self.client.force_authenticate(user=self.staff_user)
+
+    def test_pages_cover_every_order_once(self):
+        """Following next links returns each order exactly once, newest first"""
+        seen = []
+        url = '/api/orders/admin/all/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 6)
+            seen.extend(order['id'] for order in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filters(self):
+        """Status, method and email filters narrow the result set"""
+        response = self.client.get('/api/orders/admin/all/?order_status=shipped')
+        self.assertEqual([o['order_status'] for o in response.data['results']], ['shipped'])
+
+        response = self.client.get('/api/orders/admin/all/?payment_method=cod&email=customer@test.com')
+        self.assertEqual(response.data['count'], 5)
+
+    def test_invalid_filter_value(self):
+        """Unknown choices and malformed dates are rejected"""
+        response = self.client.get('/api/orders/admin/all/?order_status=lost')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/orders/admin/all/?from=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkOrderStatusTests(TestCase):
+    """Test the admin bulk order status endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.processing = Order.objects.create(
+            user=self.staff_user, payment_method='cod', total_amount=10
+        )
+        self.delivered = Order.objects.create(
+            user=self.staff_user, payment_method='cod', total_amount=20, order_status='delivered'
+        )
+        self.shipped = Order.objects.create(
+            user=self.staff_user, payment_method='cod', total_amount=30, order_status='shipped'
+        )
+        self.client.force_authenticate(user=self.staff_user)
+
+    def test_per_order_outcomes(self):
+        """Only valid transitions are applied and each id gets an outcome"""
+        data = {
+            'order_status': 'shipped',
+            'order_ids': [self.processing.id, self.delivered.id, self.shipped.id, 9999],
+        }
+        response = self.client.post('/api/orders/admin/bulk-status/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(
+            [r['result'] for r in response.data['results']],
+            ['updated', 'invalid_transition', 'unchanged', 'not_found']
+        )
+
+        self.processing.refresh_from_db()
+        self.delivered.refresh_from_db()
+        self.assertEqual(self.processing.order_status, 'shipped')
+        self.assertEqual(self.delivered.order_status, 'delivered')
+        history = self.processing.status_history.get()
+        self.assertEqual((history.from_status, history.to_status), ('processing', 'shipped'))
+
+    def test_filter_selection(self):
+        """A filter can select the orders instead of explicit ids"""
+        data = {'order_status': 'delivered', 'filter': {'order_status': 'shipped'}}
+        response = self.client.post('/api/orders/admin/bulk-status/', data, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        self.shipped.refresh_from_db()
+        self.assertEqual(self.shipped.order_status, 'delivered')
+
+    def test_requires_selection(self):
+        response = self.client.post('/api/orders/admin/bulk-status/', {'order_status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderExportTests(TestCase):
+    """Test streaming order exports"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.product = Product.objects.create(
+            name='Test Product', price=10, category='men', description='Test description', stock=10
+        )
+        self.order = Order.objects.create(user=self.staff_user, payment_method='cod', total_amount=20)
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price=10)
+        Order.objects.create(user=self.staff_user, payment_method='stripe', total_amount=5, order_status='cancelled')
+        self.client.force_authenticate(user=self.staff_user)
+
+    def test_csv_export(self):
+        response = self.client.get('/api/orders/admin/export/?order_status=processing')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'id')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith(',1'))  # item_count
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/orders/admin/export/?format=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+        self.assertEqual(rows[0]['user_email'], 'staff@test.com')
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('export_orders', '--format', 'ndjson', '--payment-method', 'stripe', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
@@ -5,7 +5,9 @@ from .views import (
     VerifyPaymentAPIView,
     UserOrderListAPIView,
     AdminOrderListAPIView,
+    AdminOrderExportAPIView,
     UpdateOrderStatusAPIView,
+    BulkUpdateOrderStatusAPIView,
     CancelOrderAPIView,
 )
 from .address_views import (
@@ -21,6 +23,8 @@ urlpatterns = [
     
     # Admin endpoints
     path("admin/all/", AdminOrderListAPIView.as_view(), name="admin-orders-list"),
+    path("admin/export/", AdminOrderExportAPIView.as_view(), name="admin-orders-export"),
+    path("admin/bulk-status/", BulkUpdateOrderStatusAPIView.as_view(), name="admin-orders-bulk-status"),
     path("<int:order_id>/status/", UpdateOrderStatusAPIView.as_view(), name="update-order-status"),
     
     # User order management
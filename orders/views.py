@@ -1,17 +1,30 @@
-import stripe
+import time
+
 from django.conf import settings
 from django.db import transaction
 import logging
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.generics import ListAPIView
 
-from .models import Order, OrderItem, Address
+from . import events, tasks
+from .exports import ORDER_EXPORT_COLUMNS, order_export_rows
+from .filters import filter_orders
+from .models import Order, OrderItem, Address, OrderStatusHistory
 from .serializers import AddressSerializer, OrderSerializer
+from core.exports import CSVExportRenderer, NDJSONExportRenderer, streaming_export_response
+from core import metrics
+from core.instrumentation import span
+from core.pagination import KeysetPagination
 from products.models import Product
 
+if settings.STRIPE_FAKE:
+    from core import fake_stripe as stripe
+else:
+    import stripe
+
 stripe.api_key = settings.STRIPE_SECRET_KEY
 logger = logging.getLogger(__name__)
 
@@ -24,6 +37,7 @@ class CreateOrderAPIView(APIView):
     Create order with COD or Stripe payment.
     """
     permission_classes = [IsAuthenticated]
+    request_class = "critical"  # core.deadlines
 
     def post(self, request):
         user = request.user
@@ -96,6 +110,7 @@ class CreateOrderAPIView(APIView):
                     order_status="processing",
                 )
 
+                events.order_created(order)
                 logger.info(f"Order {order.id} created for user {user.email}")
 
                 # Create Order Items and deduct stock
@@ -112,7 +127,7 @@ class CreateOrderAPIView(APIView):
                     
                     # Deduct stock
                     product.stock -= quantity
-                    product.save()
+                    product.save(update_fields=["stock", "updated_at"])
                     
                     logger.info(f"Stock deducted for {product.name}: {quantity} units")
 
@@ -140,8 +155,11 @@ class CreateOrderAPIView(APIView):
                         status=200,
                     )
 
-                # -------- STRIPE LOGIC --------
-                try:
+            # -------- STRIPE LOGIC --------
+            # Outside the transaction: the Stripe round trip can take seconds
+            # and must not hold the product row locks or the DB transaction.
+            try:
+                with span("stripe"):
                     session = stripe.checkout.Session.create(
                         mode="payment",
                         payment_method_types=["card"],
@@ -160,17 +178,28 @@ class CreateOrderAPIView(APIView):
                         success_url=f"{settings.FRONTEND_URL}/payment-success?session_id={{CHECKOUT_SESSION_ID}}",
                         cancel_url=f"{settings.FRONTEND_URL}/payment",
                     )
-                    
-                    order.stripe_session_id = session.id
-                    order.save()
-                    logger.info(f"Stripe session {session.id} created for order {order.id}")
-                    
-                    return Response({"checkout_url": session.url}, status=200)
-                    
-                except Exception as e:
-                    logger.error(f"Stripe error for order {order.id}: {str(e)}")
-                    # No status change needed - order remains unpaid/processing
-                    return Response({"error": str(e)}, status=500)
+                
+                metrics.CHECKOUT_SESSIONS.labels("created").inc()
+                order.stripe_session_id = session.id
+                order.save(update_fields=["stripe_session_id"])
+                logger.info(f"Stripe session {session.id} created for order {order.id}")
+                
+                return Response({"checkout_url": session.url}, status=200)
+
+            except stripe.error.APIConnectionError as e:
+                # Stripe timed out, is unreachable, or its circuit is open (core.http)
+                metrics.CHECKOUT_SESSIONS.labels("unavailable").inc()
+                logger.error(f"Stripe unavailable for order {order.id}: {e}")
+                return Response(
+                    {"error": "Payment provider unavailable, please try again shortly"},
+                    status=503,
+                    headers={"Retry-After": "30"},
+                )
+            except Exception as e:
+                metrics.CHECKOUT_SESSIONS.labels("failed").inc()
+                logger.error(f"Stripe error for order {order.id}: {str(e)}")
+                # No status change needed - order remains unpaid/processing
+                return Response({"error": str(e)}, status=500)
 
         except Exception as e:
             logger.error(f"Order creation error for user {user.email}: {str(e)}")
@@ -185,6 +214,8 @@ class VerifyPaymentAPIView(APIView):
     Verify payment status.
     """
     permission_classes = [IsAuthenticated]
+    request_class = "critical"  # core.deadlines
+    use_replica = False  # must see what the Stripe webhook job just wrote (core.replica)
 
     def get(self, request):
         session_id = request.query_params.get("session_id")
@@ -193,7 +224,15 @@ class VerifyPaymentAPIView(APIView):
 
         # Retrieve Stripe session
         try:
-            session = stripe.checkout.Session.retrieve(session_id)
+            with span("stripe"):
+                session = stripe.checkout.Session.retrieve(session_id)
+        except stripe.error.APIConnectionError as e:
+            logger.error(f"Stripe unavailable retrieving session: {e}")
+            return Response(
+                {"error": "Payment provider unavailable, please try again shortly"},
+                status=503,
+                headers={"Retry-After": "30"},
+            )
         except stripe.error.StripeError as e:
             logger.error(f"Stripe error retrieving session: {e}")
             return Response({"error": "Invalid session_id"}, status=400)
@@ -221,9 +260,11 @@ class VerifyPaymentAPIView(APIView):
 
         # -------- STRIPE LOGIC --------
         if session.get("payment_status") == "paid" and order.payment_status == "unpaid":
+            # Conditional update: the webhook may mark the same order paid concurrently
+            if Order.objects.filter(id=order.id, payment_status="unpaid").update(payment_status="paid"):
+                events.order_payment_changed(order, "unpaid", "paid")
+                logger.info(f"Payment verified for order {order.id}")
             order.payment_status = "paid"
-            order.save()
-            logger.info(f"Payment verified for order {order.id}")
 
         return Response({
             "order_id": order.id,
@@ -237,6 +278,7 @@ class VerifyPaymentAPIView(APIView):
 # STRIPE WEBHOOK
 # ======================================================================
 class StripeWebhookAPIView(APIView):
+    request_class = "critical"  # core.deadlines
 
     def post(self, request):
         payload = request.body
@@ -252,13 +294,16 @@ class StripeWebhookAPIView(APIView):
             logger.error(f"Webhook error: {str(e)}")
             return Response({"error": "Invalid signature or payload"}, status=400)
 
+        metrics.WEBHOOK_LAG.labels(event["type"]).observe(max(0, time.time() - event["created"]))
+
         if event["type"] == "checkout.session.completed":
             session = event["data"]["object"]
             order_id = session["metadata"].get("order_id")
 
+            # Acknowledge Stripe right away; a worker applies the payment
             if order_id:
-                Order.objects.filter(id=order_id).update(payment_status="paid")
-                logger.info(f"Webhook: Order {order_id} payment marked as paid")
+                tasks.mark_order_paid.enqueue(order_id=order_id)
+                logger.info(f"Webhook: queued payment for order {order_id}")
 
         return Response({"status": "success"}, status=200)
 
@@ -281,16 +326,42 @@ class UserOrderListAPIView(ListAPIView):
 # ======================================================================
 class AdminOrderListAPIView(ListAPIView):
     """
-    Admin-only endpoint to fetch all orders.
+    Admin-only endpoint to fetch orders, newest first.
+
+    Keyset paginated (?cursor=, ?page_size=) and filterable by
+    order_status, payment_status, payment_method, from/to and email.
     """
     from rest_framework.permissions import IsAdminUser
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-created_at"
 
     def get_queryset(self):
-        return Order.objects.all().select_related(
+        queryset = Order.objects.all().select_related(
             'address', 'user'
-        ).prefetch_related('items__product').order_by("-created_at")
+        ).prefetch_related('items__product')
+        return filter_orders(queryset, self.request.query_params)
+
+
+# ======================================================================
+# ADMIN: EXPORT ORDERS (CSV / NDJSON)
+# ======================================================================
+class AdminOrderExportAPIView(APIView):
+    """
+    Admin-only streaming export of orders.
+
+    ?format=csv (default) or ?format=ndjson, plus the admin list filters.
+    """
+    permission_classes = [IsAdminUser]
+    request_class = "export"  # core.deadlines
+    renderer_classes = [CSVExportRenderer, NDJSONExportRenderer]
+
+    def get(self, request, format=None):
+        rows = order_export_rows(request.query_params)
+        return streaming_export_response(
+            request.accepted_renderer.format, ORDER_EXPORT_COLUMNS, rows, "orders"
+        )
 
 
 # ======================================================================
@@ -307,11 +378,17 @@ class UpdateOrderStatusAPIView(APIView):
         new_order_status = request.data.get("order_status", "").lower()
         new_payment_status = request.data.get("payment_status", "").lower()
 
-        # Get order
-        try:
-            order = Order.objects.get(id=order_id)
-        except Order.DoesNotExist:
-            return Response({"error": "Order not found"}, status=404)
+        with transaction.atomic():
+            # Get order (locked so the rollup sees the true previous statuses)
+            try:
+                order = Order.objects.select_for_update().get(id=order_id)
+            except Order.DoesNotExist:
+                return Response({"error": "Order not found"}, status=404)
+            return self._apply(request, order, new_order_status, new_payment_status)
+
+    def _apply(self, request, order, new_order_status, new_payment_status):
+        previous_order_status = order.order_status
+        previous_payment_status = order.payment_status
 
         # Validate and update order status if provided
         if new_order_status:
@@ -337,6 +414,16 @@ class UpdateOrderStatusAPIView(APIView):
 
         order.save()
 
+        if order.order_status != previous_order_status:
+            OrderStatusHistory.objects.create(
+                order=order,
+                from_status=previous_order_status,
+                to_status=order.order_status,
+                changed_by=request.user,
+            )
+        events.order_status_changed(order, previous_order_status, order.order_status)
+        events.order_payment_changed(order, previous_payment_status, order.payment_status)
+
         # Return updated order
         serializer = OrderSerializer(order)
         return Response({
@@ -345,6 +432,110 @@ class UpdateOrderStatusAPIView(APIView):
         }, status=200)
 
 
+# ======================================================================
+# ADMIN: BULK UPDATE ORDER STATUS
+# ======================================================================
+class BulkUpdateOrderStatusAPIView(APIView):
+    """
+    Admin-only endpoint to move many orders to one order_status.
+
+    Body: {"order_status": "shipped", "order_ids": [1, 2, 3]}
+      or: {"order_status": "shipped", "filter": {"order_status": "processing", "from": "2025-01-01"}}
+
+    Only moves allowed by Order.ORDER_STATUS_TRANSITIONS are applied, with
+    a single UPDATE inside one transaction. Returns an outcome per order:
+    updated, unchanged, invalid_transition or not_found.
+    """
+    permission_classes = [IsAdminUser]
+    max_orders = 1000
+
+    def post(self, request):
+        target = str(request.data.get("order_status", "")).lower()
+        valid_order_statuses = [choice[0] for choice in Order.ORDER_STATUS_CHOICES]
+        if target not in valid_order_statuses:
+            return Response(
+                {"error": f"Invalid order status. Must be one of: {', '.join(valid_order_statuses)}"},
+                status=400
+            )
+
+        order_ids = request.data.get("order_ids")
+        filters = request.data.get("filter")
+
+        if order_ids is not None:
+            try:
+                if not isinstance(order_ids, list):
+                    raise TypeError
+                order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+            except (TypeError, ValueError):
+                return Response({"error": "order_ids must be a list of integers"}, status=400)
+            if not order_ids:
+                return Response({"error": "order_ids is empty"}, status=400)
+            if len(order_ids) > self.max_orders:
+                return Response({"error": f"At most {self.max_orders} orders per request"}, status=400)
+            queryset = Order.objects.filter(id__in=order_ids)
+        elif isinstance(filters, dict) and filters:
+            queryset = filter_orders(Order.objects.all(), filters)
+        else:
+            return Response({"error": "Provide order_ids or filter"}, status=400)
+
+        sources = Order.statuses_allowing(target)
+
+        with transaction.atomic():
+            # Lock the affected rows so outcomes match what the UPDATE sees
+            locked = list(
+                queryset.select_for_update()
+                .order_by("id")
+                .values_list("id", "order_status", "created_at")[:self.max_orders + 1]
+            )
+            current = {order_id: order_status for order_id, order_status, _ in locked}
+            created = {order_id: created_at for order_id, _, created_at in locked}
+            if len(current) > self.max_orders:
+                return Response(
+                    {"error": f"Filter matches more than {self.max_orders} orders; narrow it down"},
+                    status=400
+                )
+
+            movable = [order_id for order_id, order_status in current.items() if order_status in sources]
+            updated = 0
+            if movable:
+                updated = Order.objects.filter(
+                    id__in=movable, order_status__in=sources
+                ).update(order_status=target)
+                OrderStatusHistory.objects.bulk_create([
+                    OrderStatusHistory(
+                        order_id=order_id,
+                        from_status=current[order_id],
+                        to_status=target,
+                        changed_by=request.user,
+                    )
+                    for order_id in movable
+                ])
+                events.orders_status_changed(
+                    [(created[order_id], current[order_id]) for order_id in movable], target
+                )
+
+        results = []
+        for order_id in (order_ids if order_ids is not None else current):
+            previous = current.get(order_id)
+            if previous is None:
+                outcome = "not_found"
+            elif previous == target:
+                outcome = "unchanged"
+            elif previous in sources:
+                outcome = "updated"
+            else:
+                outcome = "invalid_transition"
+            results.append({"id": order_id, "previous_status": previous, "result": outcome})
+
+        logger.info(f"Bulk status update to {target}: {updated} orders by admin {request.user.email}")
+
+        return Response({
+            "order_status": target,
+            "updated": updated,
+            "results": results,
+        }, status=200)
+
+
 # ======================================================================
 # CANCEL ORDER
 # ======================================================================
@@ -363,27 +554,40 @@ class CancelOrderAPIView(APIView):
         except Order.DoesNotExist:
             return Response({"error": "Order not found"}, status=404)
 
-        # Only allow cancellation if order is still processing
-        if order.order_status != 'processing':
-            return Response(
-                {"error": f"Cannot cancel order with status '{order.order_status}'. Only 'processing' orders can be cancelled."},
-                status=400
-            )
-
         # Use transaction to ensure data integrity
         try:
             with transaction.atomic():
+                # Re-read the status under the row lock: a staff status update
+                # (single or bulk) may have moved the order on since
+                order.order_status = (
+                    Order.objects.select_for_update().values_list("order_status", flat=True).get(id=order.id)
+                )
+
+                # Only allow cancellation if order is still processing
+                if order.order_status != 'processing':
+                    return Response(
+                        {"error": f"Cannot cancel order with status '{order.order_status}'. Only 'processing' orders can be cancelled."},
+                        status=400
+                    )
+
                 # Restore stock for all items in the order
                 for item in order.items.all():
                     if item.product:
                         product = Product.objects.select_for_update().get(id=item.product.id)
                         product.stock += item.quantity
-                        product.save()
+                        product.save(update_fields=["stock", "updated_at"])
                         logger.info(f"Stock restored for {product.name}: +{item.quantity} units (Order #{order.id} cancelled)")
 
                 # Update order status
                 order.order_status = 'cancelled'
-                order.save()
+                order.save(update_fields=["order_status"])
+                OrderStatusHistory.objects.create(
+                    order=order,
+                    from_status='processing',
+                    to_status='cancelled',
+                    changed_by=request.user,
+                )
+                events.order_status_changed(order, 'processing', 'cancelled')
 
                 logger.info(f"Order {order.id} cancelled by user {request.user.email}")
 
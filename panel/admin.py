@@ -1,3 +1,15 @@
 from django.contrib import admin
+from .models import DailySalesRollup
 
-# Register your models here.
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ("date", "orders_count", "paid_count", "revenue", "updated_at")
+    ordering = ("-date",)
+
+    # Derived data: rebuild with `manage.py rebuild_sales_rollup`
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
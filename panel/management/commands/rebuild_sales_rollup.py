@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from panel.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollup from orders (all days, or a date range)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="from", help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="to", help="Last day, YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        days = {}
+        for key in ("from", "to"):
+            if options[key]:
+                days[key] = parse_date(options[key])
+                if days[key] is None:
+                    raise CommandError(f"--{key} must be YYYY-MM-DD")
+
+        count = rebuild(days.get("from"), days.get("to"))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rollup day(s)"))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    from panel.rollups import rebuild
+
+    rebuild(
+        order_model=apps.get_model("orders", "Order"),
+        rollup_model=apps.get_model("panel", "DailySalesRollup"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0010_orderstatushistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders_count', models.IntegerField(default=0)),
+                ('paid_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('processing_count', models.IntegerField(default=0)),
+                ('shipped_count', models.IntegerField(default=0)),
+                ('delivered_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('cod_count', models.IntegerField(default=0)),
+                ('stripe_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
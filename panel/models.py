@@ -1,3 +1,34 @@
 from django.db import models
 
-# Create your models here.
+
+class DailySalesRollup(models.Model):
+    """
+    One row per day of order activity, read by the dashboard and reports.
+
+    Maintained incrementally by panel.rollups on order create / status /
+    payment changes; `manage.py rebuild_sales_rollup` regenerates it.
+    Day boundaries follow the project TIME_ZONE, like TruncDate.
+    """
+    date = models.DateField(unique=True)
+
+    orders_count = models.IntegerField(default=0)
+    paid_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # paid orders only
+
+    # By order_status
+    processing_count = models.IntegerField(default=0)
+    shipped_count = models.IntegerField(default=0)
+    delivered_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+    # By payment_method
+    cod_count = models.IntegerField(default=0)
+    stripe_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"Sales {self.date}"
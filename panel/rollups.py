@@ -0,0 +1,156 @@
+"""
+Incremental maintenance of DailySalesRollup.
+
+Order code calls the record_* helpers right after it changes an order
+(deletes, including cascades, through orders.signals).
+Counter updates are deferred with transaction.on_commit so a rolled-back
+order never counts, and so today's (hot) rollup row is only locked for a
+single short UPDATE instead of for the whole checkout transaction.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup
+
+STATUS_FIELDS = {
+    "processing": "processing_count",
+    "shipped": "shipped_count",
+    "delivered": "delivered_count",
+    "cancelled": "cancelled_count",
+}
+
+METHOD_FIELDS = {
+    "cod": "cod_count",
+    "stripe": "stripe_count",
+}
+
+
+def _apply(day, deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    DailySalesRollup.objects.get_or_create(date=day)
+    DailySalesRollup.objects.filter(date=day).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def _bump(day, deltas):
+    transaction.on_commit(lambda: _apply(day, deltas))
+
+
+def _day(order):
+    return timezone.localdate(order.created_at)
+
+
+def _paid_deltas(total_amount, sign):
+    return {"paid_count": sign, "revenue": sign * Decimal(str(total_amount))}
+
+
+def _order_deltas(order, sign):
+    deltas = Counter({"orders_count": sign})
+    if order.order_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[order.order_status]] += sign
+    if order.payment_method in METHOD_FIELDS:
+        deltas[METHOD_FIELDS[order.payment_method]] += sign
+    if order.payment_status == "paid":
+        deltas.update(_paid_deltas(order.total_amount, sign))
+    return dict(deltas)
+
+
+def record_order_created(order):
+    _bump(_day(order), _order_deltas(order, 1))
+
+
+def record_order_deleted(order):
+    _bump(_day(order), _order_deltas(order, -1))
+
+
+def record_status_change(order, old_status, new_status):
+    if old_status == new_status:
+        return
+    deltas = Counter()
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] -= 1
+    if new_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[new_status]] += 1
+    _bump(_day(order), dict(deltas))
+
+
+def record_payment_change(order, old_status, new_status):
+    if old_status == new_status:
+        return
+    if new_status == "paid":
+        _bump(_day(order), _paid_deltas(order.total_amount, 1))
+    elif old_status == "paid":
+        _bump(_day(order), _paid_deltas(order.total_amount, -1))
+
+
+def record_bulk_status_change(changes, new_status):
+    """
+    ``changes`` is an iterable of (created_at, old_status) pairs for orders
+    that moved to ``new_status``. Applies one UPDATE per affected day.
+    """
+    by_day = defaultdict(Counter)
+    for created_at, old_status in changes:
+        if old_status == new_status:
+            continue
+        day = by_day[timezone.localdate(created_at)]
+        if old_status in STATUS_FIELDS:
+            day[STATUS_FIELDS[old_status]] -= 1
+        if new_status in STATUS_FIELDS:
+            day[STATUS_FIELDS[new_status]] += 1
+
+    for day, deltas in by_day.items():
+        _bump(day, dict(deltas))
+
+
+# ----------------------------------------------------------------
+# Rebuild / backfill
+# ----------------------------------------------------------------
+def rebuild(start=None, end=None, order_model=None, rollup_model=DailySalesRollup):
+    """
+    Recompute rollup rows from Order for days in [start, end] (inclusive;
+    None means unbounded). Returns the number of rows written.
+
+    The models are parameters so the data migration can pass historical
+    versions.
+    """
+    if order_model is None:
+        from orders.models import Order as order_model
+
+    orders = order_model.objects.annotate(day=TruncDate("created_at"))
+    rollups = rollup_model.objects.all()
+    if start:
+        orders = orders.filter(day__gte=start)
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        orders = orders.filter(day__lte=end)
+        rollups = rollups.filter(date__lte=end)
+
+    paid = Q(payment_status="paid")
+    aggregates = {
+        "orders_count": Count("id"),
+        "paid_count": Count("id", filter=paid),
+        "revenue": Sum("total_amount", filter=paid),
+    }
+    for status, field in STATUS_FIELDS.items():
+        aggregates[field] = Count("id", filter=Q(order_status=status))
+    for method, field in METHOD_FIELDS.items():
+        aggregates[field] = Count("id", filter=Q(payment_method=method))
+
+    rows = []
+    for row in orders.order_by().values("day").annotate(**aggregates):
+        day = row.pop("day")
+        row["revenue"] = row["revenue"] or 0
+        rows.append(rollup_model(date=day, **row))
+
+    with transaction.atomic():
+        rollups.delete()
+        rollup_model.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
@@ -29,9 +29,7 @@ class OrderMiniSerializer(serializers.ModelSerializer):
             return obj.product.name if obj.product else "Product Unavailable"
         
         def get_image(self, obj):
-            if obj.product and obj.product.image:
-                return obj.product.image.url
-            return None
+            return obj.product.image_url("thumbnail") if obj.product else None
     
     items = OrderItemMiniSerializer(many=True, read_only=True)
     address = AddressMiniSerializer(read_only=True)
@@ -52,7 +50,10 @@ class AdminUserListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ["id", "email", "name", "picture", "role", "isBlock"]
+        fields = [
+            "id", "email", "name", "picture", "role", "isBlock",
+            "order_count", "lifetime_value", "last_order_at",
+        ]
 
     def get_name(self, obj):
         full = f"{obj.first_name} {obj.last_name}".strip()
@@ -66,12 +67,17 @@ class AdminUserListSerializer(serializers.ModelSerializer):
 # Heavy User Serializer (Detail)
 # Includes user orders
 # ================================
+# The view passes one page of orders (with items, products and address
+# prefetched) in context["orders"]; the serializer never walks order_set.
 class AdminUserDetailSerializer(AdminUserListSerializer):
-    orders = OrderMiniSerializer(many=True, read_only=True, source="order_set")
+    orders = serializers.SerializerMethodField()
 
     class Meta(AdminUserListSerializer.Meta):
         fields = AdminUserListSerializer.Meta.fields + ["orders"]
 
+    def get_orders(self, obj):
+        return OrderMiniSerializer(self.context.get("orders", []), many=True).data
+
 
 # ================================
 # Product Serializer (Dashboard)
@@ -1,3 +1,293 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.cache import tiered
+from orders.events import rebuild_user_order_stats
+from orders.models import Order, OrderItem, Address
+from products.models import Product
+from panel.models import DailySalesRollup
+from panel.rollups import rebuild
+
+User = get_user_model()
+
+
+class SalesRollupTests(TestCase):
+    """Test that order events keep the daily sales rollup in step"""
+
+    def setUp(self):
+        cache.clear()
+        tiered.clear()
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+        self.product = Product.objects.create(
+            name='Test Product', price=50, category='men', description='Test description', stock=10
+        )
+        self.address = Address.objects.create(
+            user=self.staff_user, full_name='Test User', phone='1234567890',
+            street='123 Test St', city='Test City', pincode='123456'
+        )
+        self.client.force_authenticate(user=self.staff_user)
+
+    def place_cod_order(self):
+        data = {
+            'cart': [{'id': self.product.id, 'name': self.product.name, 'price': '50', 'quantity': 2}],
+            'address_id': self.address.id,
+            'payment_method': 'cod',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/orders/create/', data, format='json')
+        return response.data['order_id']
+
+    def test_order_lifecycle_updates_rollup(self):
+        order_id = self.place_cod_order()
+        row = DailySalesRollup.objects.get(date=timezone.localdate())
+        self.assertEqual((row.orders_count, row.processing_count, row.cod_count), (1, 1, 1))
+        self.assertEqual(row.revenue, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/orders/{order_id}/status/',
+                {'order_status': 'delivered', 'payment_status': 'paid'},
+                format='json'
+            )
+        row.refresh_from_db()
+        self.assertEqual((row.processing_count, row.delivered_count, row.paid_count), (0, 1, 1))
+        self.assertEqual(row.revenue, Decimal('100.00'))
+
+    def test_rebuild_matches_incremental(self):
+        self.place_cod_order()
+        order_id = self.place_cod_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/orders/admin/bulk-status/',
+                {'order_status': 'shipped', 'order_ids': [order_id]},
+                format='json'
+            )
+        incremental = DailySalesRollup.objects.values().get()
+
+        rebuild()
+        rebuilt = DailySalesRollup.objects.values().get()
+        for field in ('orders_count', 'processing_count', 'shipped_count', 'cod_count', 'revenue'):
+            self.assertEqual(incremental[field], rebuilt[field], field)
+
+    def test_deleted_orders_leave_the_rollup(self):
+        order_id = self.place_cod_order()
+        self.place_cod_order()
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get(id=order_id).delete()
+        row = DailySalesRollup.objects.get(date=timezone.localdate())
+        self.assertEqual((row.orders_count, row.processing_count, row.cod_count), (1, 1, 1))
+        self.staff_user.refresh_from_db()
+        self.assertEqual(self.staff_user.order_count, 1)
+
+        # Deleting a user cascades to their orders
+        customer = User.objects.create_user(email='customer@test.com', password='testpass123')
+        self.address = Address.objects.create(
+            user=customer, full_name='Customer', phone='1234567890',
+            street='1 Other St', city='Test City', pincode='123456'
+        )
+        self.client.force_authenticate(user=customer)
+        self.place_cod_order()
+        self.client.force_authenticate(user=self.staff_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/panel/users/{customer.id}/delete/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        row = DailySalesRollup.objects.get(date=timezone.localdate())
+        self.assertEqual((row.orders_count, row.processing_count, row.cod_count), (1, 1, 1))
+
+    def test_dashboard_and_reports_read_rollup(self):
+        DailySalesRollup.objects.create(
+            date=timezone.localdate(), orders_count=7, paid_count=2, revenue=Decimal('300.00'),
+            delivered_count=7, stripe_count=7
+        )
+
+        response = self.client.get('/api/panel/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_orders'], 7)
+        self.assertEqual(response.data['total_revenue'], Decimal('300.00'))
+
+        response = self.client.get('/api/panel/reports/')
+        self.assertEqual(response.data['status_distribution'], [{'name': 'Delivered', 'count': 7}])
+        self.assertEqual(response.data['payment_distribution'], [{'name': 'STRIPE', 'count': 7}])
+        self.assertEqual(len(response.data['revenue_timeline']), 1)
+
+
+class AdminReportsTests(TestCase):
+    """Test report date ranges, granularity and caching"""
+
+    def setUp(self):
+        cache.clear()
+        tiered.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='staff@test.com', password='testpass123', is_staff=True
+        ))
+        for day, revenue in ((date(2025, 1, 6), 10), (date(2025, 1, 8), 20), (date(2025, 2, 3), 40)):
+            DailySalesRollup.objects.create(
+                date=day, orders_count=1, paid_count=1, revenue=revenue, processing_count=1, cod_count=1
+            )
+
+    def test_range_and_granularity(self):
+        response = self.client.get('/api/panel/reports/?from=2025-01-01&to=2025-01-31&granularity=week')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_orders'], 2)
+        self.assertEqual(response.data['revenue_timeline'], [{'name': '2025-01-06', 'total': Decimal('30.00')}])
+
+        response = self.client.get('/api/panel/reports/?granularity=month')
+        self.assertEqual([p['name'] for p in response.data['revenue_timeline']], ['2025-01-01', '2025-02-01'])
+
+    def test_invalid_granularity(self):
+        response = self.client.get('/api/panel/reports/?granularity=hour')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_results_are_cached(self):
+        self.client.get('/api/panel/reports/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/panel/reports/')
+        self.assertEqual(response.data['total_orders'], 3)
+        self.assertEqual(tiered.stats()['panel']['l1_hits'], 1)
+
+
+class AdminUserDetailTests(TestCase):
+    """Test that the user detail endpoint has a fixed query count"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='staff@test.com', password='testpass123', is_staff=True
+        ))
+        self.customer = User.objects.create_user(email='customer@test.com', password='testpass123')
+        self.product = Product.objects.create(
+            name='Test Product', price=50, category='men', description='Test description', stock=10
+        )
+        self.address = Address.objects.create(
+            user=self.customer, full_name='Test User', phone='1234567890',
+            street='123 Test St', city='Test City', pincode='123456'
+        )
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.customer, address=self.address, payment_method='cod', total_amount=100
+            )
+            for _ in range(3):
+                OrderItem.objects.create(order=order, product=self.product, quantity=1, price=50)
+
+    def query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/panel/users/{self.customer.id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_budget_is_constant(self):
+        self.add_orders(1)
+        small, _ = self.query_count()
+
+        self.add_orders(8)
+        large, response = self.query_count()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 4)
+        self.assertEqual(len(response.data['orders'][0]['items']), 3)
+
+    def test_orders_are_paginated(self):
+        self.add_orders(12)
+        _, response = self.query_count()
+        self.assertEqual(response.data['orders_count'], 12)
+        self.assertEqual(len(response.data['orders']), 10)
+
+        response = self.client.get(response.data['orders_next'])
+        self.assertEqual(len(response.data['orders']), 2)
+        self.assertIsNone(response.data['orders_next'])
+
+
+class AdminUserListTests(TestCase):
+    """Test search, sorting and the denormalized order stats"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com', password='testpass123', is_staff=True
+        )
+        self.client.force_authenticate(user=self.staff_user)
+        self.product = Product.objects.create(
+            name='Test Product', price=50, category='men', description='Test description', stock=100
+        )
+
+    def place_order(self, user, quantity):
+        address = Address.objects.create(
+            user=user, full_name='Test User', phone='1234567890',
+            street='123 Test St', city='Test City', pincode='123456'
+        )
+        self.client.force_authenticate(user=user)
+        data = {
+            'cart': [{'id': self.product.id, 'name': self.product.name, 'price': '50', 'quantity': quantity}],
+            'address_id': address.id,
+            'payment_method': 'cod',
+        }
+        order_id = self.client.post('/api/orders/create/', data, format='json').data['order_id']
+        self.client.force_authenticate(user=self.staff_user)
+        return order_id
+
+    def test_stats_follow_order_events(self):
+        alice = User.objects.create_user(email='alice@test.com', password='testpass123')
+        order_id = self.place_order(alice, 2)
+        self.place_order(alice, 1)
+        alice.refresh_from_db()
+        self.assertEqual(alice.order_count, 2)
+        self.assertEqual(alice.lifetime_value, 0)
+        self.assertIsNotNone(alice.last_order_at)
+
+        self.client.patch(f'/api/orders/{order_id}/status/', {'payment_status': 'paid'}, format='json')
+        alice.refresh_from_db()
+        self.assertEqual(alice.lifetime_value, Decimal('100.00'))
+
+        # A full rebuild agrees with the incremental updates
+        User.objects.filter(pk=alice.pk).update(order_count=0, lifetime_value=0, last_order_at=None)
+        rebuild_user_order_stats()
+        rebuilt = User.objects.get(pk=alice.pk)
+        self.assertEqual(
+            (rebuilt.order_count, rebuilt.lifetime_value, rebuilt.last_order_at),
+            (alice.order_count, alice.lifetime_value, alice.last_order_at)
+        )
+
+    def test_search_and_sort_by_lifetime_value(self):
+        for i, name in enumerate(['ann', 'bob', 'cat']):
+            User.objects.create_user(
+                email=f'{name}@shop.com', password='testpass123', first_name=name.title(),
+                lifetime_value=(i + 1) * 100, order_count=i + 1
+            )
+
+        response = self.client.get('/api/panel/users/?search=BOB')
+        self.assertEqual([u['email'] for u in response.data['results']], ['bob@shop.com'])
+
+        emails = []
+        url = '/api/panel/users/?search=shop.com&ordering=-lifetime_value&page_size=2'
+        while url:
+            response = self.client.get(url)
+            emails.extend(u['email'] for u in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(emails, ['cat@shop.com', 'bob@shop.com', 'ann@shop.com'])
+
+    def test_null_last_order_sorts_last(self):
+        buyer = User.objects.create_user(email='buyer@test.com', password='testpass123')
+        self.place_order(buyer, 1)
 
-# Create your tests here.
+        response = self.client.get('/api/panel/users/?ordering=-last_order_at&page_size=1')
+        self.assertEqual(response.data['results'][0]['email'], 'buyer@test.com')
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['email'], 'staff@test.com')
+        self.assertIsNone(response.data['next'])
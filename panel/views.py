@@ -2,14 +2,25 @@ from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView, RetrieveAPIView, DestroyAPIView
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import SearchFilter
 from django.shortcuts import get_object_or_404
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncDate
+from django.db import transaction
+from django.db.models import Count, Max, Min, Prefetch, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
-from orders.models import Order
+from core.cache import cached_view, tiered
+from core.filters import parse_day
+from core.pagination import KeysetPagination
+from orders.models import Order, OrderItem
+from orders.signals import rebuilding_stats
 from products.models import Product
 
+from .models import DailySalesRollup
+from .rollups import METHOD_FIELDS, STATUS_FIELDS, rebuild
+
 from .serializers import (
     AdminUserListSerializer,
     AdminUserDetailSerializer,
@@ -25,20 +36,57 @@ User = get_user_model()
 # Lightweight, optimized for speed
 # ================================
 class AdminUserList(ListAPIView):
-    queryset = User.objects.all().order_by("-id")
+    """
+    Keyset paginated; ?search= matches email / first / last name and
+    ?ordering= accepts id, created_at, order_count, lifetime_value and
+    last_order_at (prefix "-" for descending).
+    """
+    queryset = User.objects.all()
     serializer_class = AdminUserListSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    filter_backends = [SearchFilter]
+    search_fields = ["email", "first_name", "last_name"]
+    keyset_ordering = "-id"
+    keyset_ordering_fields = ["id", "created_at", "order_count", "lifetime_value", "last_order_at"]
 
 
 # ================================
 # USER DETAIL
 # Heavy, includes order history
 # ================================
+class UserOrdersPagination(KeysetPagination):
+    cursor_query_param = "orders_cursor"
+    page_size_query_param = "orders_page_size"
+    page_size = 10
+
+
 class AdminUserDetail(RetrieveAPIView):
-    queryset = User.objects.select_related().all()
+    queryset = User.objects.all()
     serializer_class = AdminUserDetailSerializer
     lookup_field = "id"
     permission_classes = [IsAdminUser]
+    query_budget = 5  # user, orders count, orders page, items, + auth state on a cold cache
+
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+
+        # Fixed query count: user, order count, one page of orders + address,
+        # then items with their products in a single prefetch.
+        orders = (
+            Order.objects.filter(user=user)
+            .select_related("address")
+            .prefetch_related(
+                Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+            )
+        )
+        paginator = UserOrdersPagination()
+        page = paginator.paginate_queryset(orders, request)
+
+        data = self.get_serializer(user, context={"request": request, "orders": page}).data
+        data["orders_count"] = paginator.count
+        data["orders_next"] = paginator.get_next_link()
+        return Response(data)
 
 
 # ================================
@@ -51,7 +99,10 @@ class AdminToggleBlockUser(APIView):
     def post(self, request, id):
         user = get_object_or_404(User, id=id)
         user.is_block = not user.is_block
-        user.save(update_fields=["is_block"])
+        if user.is_block:
+            # Revoke every access/refresh token issued so far
+            user.token_version += 1
+        user.save(update_fields=["is_block", "token_version"])
         return Response({"status": "success", "isBlock": user.is_block})
 
 
@@ -68,6 +119,15 @@ class AdminDeleteUser(DestroyAPIView):
         super().delete(request, *args, **kwargs)
         return Response({"status": "deleted"})
 
+    def perform_destroy(self, instance):
+        # The user's orders go with them: rebuild the rollup for the days
+        # they span once, instead of an update per cascaded order
+        span = instance.order_set.aggregate(first=Min("created_at"), last=Max("created_at"))
+        with transaction.atomic(), rebuilding_stats():
+            instance.delete()
+            if span["first"]:
+                rebuild(timezone.localdate(span["first"]), timezone.localdate(span["last"]))
+
 
 # ================================
 # DASHBOARD STATS
@@ -75,16 +135,19 @@ class AdminDeleteUser(DestroyAPIView):
 # ================================
 class DashboardStatsView(APIView):
     permission_classes = [IsAdminUser]
+    request_class = "low"  # core.deadlines
 
+    @cached_view("panel", timeout=30, stale_for=300)
     def get(self, request):
         total_users = User.objects.count()
         total_products = Product.objects.count()
-        total_orders = Order.objects.count()
 
-        total_revenue = (
-            Order.objects.filter(payment_status="paid")
-            .aggregate(total=Sum("total_amount"))["total"] or 0
+        # Order totals come from the daily rollup, not the orders table
+        totals = DailySalesRollup.objects.aggregate(
+            orders=Sum("orders_count"), revenue=Sum("revenue")
         )
+        total_orders = totals["orders"] or 0
+        total_revenue = totals["revenue"] or 0
 
         recent_orders = (
             Order.objects.select_related("user")
@@ -119,50 +182,88 @@ class DashboardStatsView(APIView):
 # ================================
 # REPORTS
 # Revenue timeline, statuses, methods
+# Read from the daily sales rollup
+# ?from=YYYY-MM-DD&to=YYYY-MM-DD&granularity=day|week|month
 # ================================
 class AdminReportsView(APIView):
     permission_classes = [IsAdminUser]
+    request_class = "low"  # core.deadlines
 
-    def get(self, request):
-        paid = Order.objects.filter(payment_status="paid")
+    GRANULARITIES = {
+        "day": None,
+        "week": TruncWeek,
+        "month": TruncMonth,
+    }
+    cache_fresh_for = 60
+    cache_stale_for = 600
 
-        total_orders = Order.objects.count()
-        total_revenue = paid.aggregate(total=Sum("total_amount"))["total"] or 0
+    def get(self, request):
+        start = parse_day(request.query_params, "from")
+        end = parse_day(request.query_params, "to")
+        granularity = request.query_params.get("granularity", "day").lower()
+        if granularity not in self.GRANULARITIES:
+            raise ValidationError({"granularity": f"Must be one of: {', '.join(self.GRANULARITIES)}"})
 
-        # Revenue grouped by date
-        timeline = (
-            paid.annotate(date=TruncDate("created_at"))
-            .values("date")
-            .annotate(total=Sum("total_amount"))
-            .order_by("date")
+        # Same namespace and stale-while-revalidate handling as the dashboard
+        data = tiered.get_or_set(
+            "panel",
+            f"reports:{start}:{end}:{granularity}",
+            lambda: self.build_report(start, end, granularity),
+            timeout=self.cache_fresh_for,
+            stale_for=self.cache_stale_for,
         )
+        return Response(data)
+
+    def build_report(self, start, end, granularity):
+        rollup = DailySalesRollup.objects.all()
+        if start:
+            rollup = rollup.filter(date__gte=start)
+        if end:
+            rollup = rollup.filter(date__lte=end)
+
+        # Totals and both distributions in a single aggregate query
+        sums = {field: Sum(field) for field in [*STATUS_FIELDS.values(), *METHOD_FIELDS.values()]}
+        totals = rollup.aggregate(orders=Sum("orders_count"), revenue=Sum("revenue"), **sums)
+
+        total_orders = totals["orders"] or 0
+        total_revenue = totals["revenue"] or 0
+
+        # Revenue grouped by period (periods with paid orders)
+        paid_days = rollup.filter(paid_count__gt=0)
+        trunc = self.GRANULARITIES[granularity]
+        if trunc is None:
+            timeline = paid_days.order_by("date").values_list("date", "revenue")
+        else:
+            timeline = (
+                paid_days.annotate(period=trunc("date"))
+                .order_by()
+                .values("period")
+                .annotate(total=Sum("revenue"))
+                .order_by("period")
+                .values_list("period", "total")
+            )
         revenue_timeline = [
-            {"name": item["date"].isoformat(), "total": item["total"]}
-            for item in timeline
+            {"name": period.isoformat(), "total": revenue}
+            for period, revenue in timeline
         ]
 
         payment_dist = [
-            {
-                "name": (item["payment_method"] or "Unknown").upper(),
-                "count": item["count"],
-            }
-            for item in Order.objects.values("payment_method")
-            .annotate(count=Count("id"))
+            {"name": method.upper(), "count": totals[field]}
+            for method, field in METHOD_FIELDS.items()
+            if totals[field]
         ]
 
         status_dist = [
-            {
-                "name": (item["order_status"] or "").title(),
-                "count": item["count"],
-            }
-            for item in Order.objects.values("order_status")
-            .annotate(count=Count("id"))
+            {"name": status.title(), "count": totals[field]}
+            for status, field in STATUS_FIELDS.items()
+            if totals[field]
         ]
 
-        return Response({
+        return {
+            "granularity": granularity,
             "total_orders": total_orders,
             "total_revenue": total_revenue,
             "revenue_timeline": revenue_timeline,
             "payment_distribution": payment_dist,
             "status_distribution": status_dist,
-        })
+        }
@@ -1,13 +1,26 @@
 from django.contrib import admin
 from .models import Product
+from .tasks import process_product_image
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("name", "category", "price", "stock", "created_at")
-    list_filter = ("category", "created_at")
+    list_display = ("name", "category", "price", "stock", "image_status", "created_at")
+    list_filter = ("category", "image_status", "created_at")
     search_fields = ("name", "description")
     prepopulated_fields = {"slug": ("name",)}
     ordering = ("-created_at",)
 
-    readonly_fields = ("created_at", "updated_at")
+    exclude = ("image_upload",)
+    readonly_fields = ("image_status", "image_variants", "created_at", "updated_at")
+
+    def save_model(self, request, obj, form, change):
+        # The admin uploads the file itself; the variants are still built in the background
+        image_changed = "image" in form.changed_data
+        if image_changed:
+            obj.image_variants = {}
+            obj.image_upload = ""
+            obj.image_status = Product.IMAGE_PENDING if obj.image else Product.IMAGE_NONE
+        super().save_model(request, obj, form, change)
+        if image_changed and obj.image:
+            process_product_image.enqueue(product_id=obj.id)
@@ -0,0 +1,28 @@
+"""
+Row sources for product exports (see core.exports).
+"""
+from core.exports import CHUNK_SIZE
+from .filters import filter_products
+from .models import Product
+
+PRODUCT_EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "slug",
+    "category",
+    "price",
+    "stock",
+    "image",
+    "created_at",
+    "updated_at",
+]
+
+
+def product_export_rows(params, chunk_size=CHUNK_SIZE):
+    """Yield one flat dict per product matching ``params``."""
+    queryset = filter_products(Product.objects.all(), params)
+    return (
+        queryset.order_by("id")
+        .values(*PRODUCT_EXPORT_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
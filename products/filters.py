@@ -0,0 +1,24 @@
+"""
+Query-parameter filters for product exports.
+"""
+from core.filters import filter_date_range
+
+
+def filter_products(queryset, params):
+    """
+    Narrow a Product queryset.
+
+    Supported keys: category, in_stock ("true" / "false") and from / to
+    (inclusive creation dates, YYYY-MM-DD).
+    """
+    category = str(params.get("category") or "").strip().lower()
+    in_stock = str(params.get("in_stock") or "").strip().lower()
+
+    if category:
+        queryset = queryset.filter(category=category)
+    if in_stock in ("true", "1"):
+        queryset = queryset.filter(stock__gt=0)
+    elif in_stock in ("false", "0"):
+        queryset = queryset.filter(stock=0)
+
+    return filter_date_range(queryset, params, "created_at")
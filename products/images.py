@@ -0,0 +1,106 @@
+"""
+Responsive product images, processed out of band.
+
+A product image is not sent to the media storage inside the request: the
+serializer stages the upload on local disk (IMAGE_STAGING_DIR, shared by
+gunicorn and the run_jobs worker) and queues
+products.tasks.process_product_image. The job uploads the file and
+stores one URL per VARIANTS width, plus a ready-made ``srcset``, in
+Product.image_variants. Serializers only read that JSON, so listing
+products, carts and orders never calls into the storage backend.
+
+On Cloudinary the variants are transformation URLs, resized by Cloudinary
+on first request. Other storages (the local profile's FileSystemStorage)
+get real files resized here with Pillow, saved next to the original.
+"""
+import os
+import uuid
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+VARIANTS = (
+    ("thumbnail", 200),
+    ("medium", 600),
+    ("full", 1200),
+)
+
+JPEG_QUALITY = 85
+
+
+def staging_dir():
+    path = Path(getattr(settings, "IMAGE_STAGING_DIR", settings.BASE_DIR / "media-staging"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def stage(upload):
+    """Copy an uploaded file to the staging directory; returns the staged name."""
+    staged = f"{uuid.uuid4().hex}_{os.path.basename(upload.name)}"
+    with open(staging_dir() / staged, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return staged
+
+
+def staged_path(staged):
+    return staging_dir() / staged
+
+
+def original_name(staged):
+    return staged.split("_", 1)[1]
+
+
+def discard(staged):
+    if staged:
+        staged_path(staged).unlink(missing_ok=True)
+
+
+def delete_stored(storage, name):
+    """Delete a stored original and the variant files _resize() made for it."""
+    if not name:
+        return
+    names = [name]
+    if not hasattr(storage, "variant_url"):
+        stem = os.path.splitext(name)[0]
+        names += [f"{stem}_{width}w.jpg" for _, width in VARIANTS]
+    for stored in names:
+        storage.delete(stored)
+
+
+def delete_stored_on_commit(image):
+    """delete_stored() the file behind an ImageField value once the transaction commits."""
+    if image:
+        storage, name = image.storage, image.name
+        transaction.on_commit(lambda: delete_stored(storage, name), robust=True)
+
+
+def build_variants(storage, name):
+    """Return {"thumbnail": url, "medium": url, "full": url, "srcset": "..."} for a stored image."""
+    if hasattr(storage, "variant_url"):
+        urls = {variant: storage.variant_url(name, width) for variant, width in VARIANTS}
+        widths = dict(VARIANTS)
+    else:
+        urls, widths = _resize(storage, name)
+    urls["srcset"] = ", ".join(f"{urls[variant]} {widths[variant]}w" for variant, _ in VARIANTS)
+    return urls
+
+
+def _resize(storage, name):
+    stem = os.path.splitext(name)[0]
+    urls, widths = {}, {}
+    with storage.open(name) as f, Image.open(f) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    for variant, width in VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((width, image.height))  # never upscales
+        buffer = BytesIO()
+        resized.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        saved = storage.save(f"{stem}_{width}w.jpg", ContentFile(buffer.getvalue()))
+        urls[variant] = storage.url(saved)
+        widths[variant] = resized.width
+    return urls, widths
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from core.exports import EXPORT_FORMATS, write_export
+from products.exports import PRODUCT_EXPORT_COLUMNS, product_export_rows
+
+
+class Command(BaseCommand):
+    help = "Stream products to CSV or NDJSON with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output", help="File path (default: stdout)")
+        parser.add_argument("--from", dest="from", help="First creation day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="to", help="Last creation day, YYYY-MM-DD")
+        parser.add_argument("--category")
+        parser.add_argument("--in-stock", dest="in_stock", choices=("true", "false"))
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key]
+            for key in ("from", "to", "category", "in_stock")
+            if options[key]
+        }
+        try:
+            rows = product_export_rows(params, chunk_size=options["chunk_size"])
+        except ValidationError as e:
+            raise CommandError(e.detail)
+
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as stream:
+                count = write_export(stream, options["format"], PRODUCT_EXPORT_COLUMNS, rows)
+            self.stderr.write(f"Exported {count} products to {options['output']}")
+        else:
+            write_export(self.stdout, options["format"], PRODUCT_EXPORT_COLUMNS, rows)
@@ -1,6 +1,7 @@
 import json
-import requests
 from django.core.management.base import BaseCommand
+from core import http
+from core.storage import cloudinary_call
 from products.models import Product
 import cloudinary.uploader
 
@@ -21,7 +22,7 @@ class Command(BaseCommand):
 
             # Download image BYTES
             try:
-                response = requests.get(clean_url, timeout=10)
+                response = http.session().get(clean_url)
                 response.raise_for_status()
                 image_bytes = response.content
             except Exception:
@@ -30,7 +31,8 @@ class Command(BaseCommand):
 
             # Upload BYTES directly to Cloudinary
             try:
-                upload_result = cloudinary.uploader.upload(image_bytes)
+                with cloudinary_call():
+                    upload_result = cloudinary.uploader.upload(image_bytes)
                 cloud_url = upload_result["secure_url"]
             except Exception as e:
                 print(f"❌ Cloudinary upload failed for {item['name']}: {e}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.tasks import process_product_image
+
+
+class Command(BaseCommand):
+    help = "Queue variant generation for products whose image has none (e.g. created before the image pipeline)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild every product image, not only missing ones")
+        parser.add_argument("--inline", action="store_true", help="Process here instead of queueing jobs")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image="").exclude(image__isnull=True).filter(image_upload="")
+        if not options["all"]:
+            products = products.exclude(image_status=Product.IMAGE_READY)
+
+        count = 0
+        for product_id in products.values_list("id", flat=True).iterator():
+            if options["inline"]:
+                process_product_image(product_id=product_id)
+            else:
+                process_product_image.enqueue(product_id=product_id)
+            count += 1
+        self.stdout.write(f"{'Processed' if options['inline'] else 'Queued'} {count} product images")
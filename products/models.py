@@ -9,11 +9,26 @@ class Product(models.Model):
         ("women", "Women"),
     ]
 
+    IMAGE_NONE = "none"
+    IMAGE_PENDING = "pending"
+    IMAGE_READY = "ready"
+    IMAGE_FAILED = "failed"
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_NONE, "No image"),
+        (IMAGE_PENDING, "Processing"),
+        (IMAGE_READY, "Ready"),
+        (IMAGE_FAILED, "Failed"),
+    ]
+
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.CharField(max_length=10, choices=CATEGORY_CHOICES, db_index=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Filled in by products.tasks.process_product_image (see products.images)
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, default=IMAGE_NONE)
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_upload = models.CharField(max_length=255, blank=True)  # staged file waiting for that job
     description = models.TextField()
     stock = models.PositiveIntegerField(
         validators=[MinValueValidator(0), MaxValueValidator(999999)],
@@ -23,6 +38,13 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets products.signals tell when a stock-only save crosses zero
+        instance._loaded_stock = instance.__dict__.get("stock")
+        return instance
+
     def save(self, *args, **kwargs):
         # Generate slug if missing
         if not self.slug:
@@ -40,5 +62,12 @@ class Product(models.Model):
 
         super().save(*args, **kwargs)
 
+    def image_url(self, variant="full"):
+        """URL of a pre-generated image variant, or of the original until it has been processed."""
+        url = self.image_variants.get(variant)
+        if url:
+            return url
+        return self.image.url if self.image else None
+
     def __str__(self):
         return self.name
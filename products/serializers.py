@@ -1,9 +1,14 @@
 from rest_framework import serializers
+from . import images
 from .models import Product
+from .tasks import process_product_image
 from utils import validate_price_range, validate_stock_quantity
 
 
 class ProductSerializer(serializers.ModelSerializer):
+    # Written here, uploaded by a background job; read back as image_url() (see products.images)
+    image = serializers.ImageField(write_only=True, required=False, allow_null=True)
+
     name = serializers.CharField(
         max_length=255,
         min_length=3,
@@ -43,5 +48,38 @@ class ProductSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["image_upload"]
+        read_only_fields = ["image_status", "image_variants"]
+
+    def create(self, validated_data):
+        upload = self._stage_image(validated_data)
+        product = super().create(validated_data)
+        self._queue_image(product, upload)
+        return product
+
+    def update(self, instance, validated_data):
+        if "image" in validated_data and validated_data["image"] is None:
+            images.delete_stored_on_commit(instance.image)
+            validated_data.update(image_variants={}, image_status=Product.IMAGE_NONE, image_upload="")
+        # A new upload replaces the stored image once its job has run (products.tasks)
+        upload = self._stage_image(validated_data)
+        product = super().update(instance, validated_data)
+        self._queue_image(product, upload)
+        return product
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["image"] = instance.image_url()
+        return data
+
+    def _stage_image(self, validated_data):
+        if not validated_data.get("image"):
+            return None
+        upload = images.stage(validated_data.pop("image"))
+        validated_data.update(image_upload=upload, image_status=Product.IMAGE_PENDING)
+        return upload
+
+    def _queue_image(self, product, upload):
+        if upload:
+            process_product_image.enqueue(product_id=product.id, upload=upload)
 
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import tiered
+
+from . import images
+from .models import Product
+
+CATALOG_NAMESPACE = "catalog"
+STOCK_FIELDS = {"stock", "updated_at"}  # what checkout and cancellation save
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, update_fields=None, **kwargs):
+    # Stock moves on every order: let the cached catalog show it up to its
+    # TTL late (checkout re-checks stock under the row lock), unless the
+    # product just sold out or came back in stock
+    loaded, instance._loaded_stock = getattr(instance, "_loaded_stock", None), instance.stock
+    if (
+        update_fields and set(update_fields) <= STOCK_FIELDS
+        and loaded is not None and (loaded > 0) == (instance.stock > 0)
+    ):
+        return
+    # After commit, so no worker can re-cache the old rows under the new version
+    transaction.on_commit(lambda: tiered.invalidate(CATALOG_NAMESPACE))
+
+
+@receiver(post_delete, sender=Product)
+def delete_image_files(sender, instance, **kwargs):
+    images.delete_stored_on_commit(instance.image)
+    staged = instance.image_upload
+    if staged:
+        transaction.on_commit(lambda: images.discard(staged))
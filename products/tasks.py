@@ -0,0 +1,66 @@
+"""Background jobs for products (run by `manage.py run_jobs`)."""
+import logging
+
+from django.core.files import File
+from django.db import transaction
+
+from jobs.queue import task
+
+from . import images
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+def image_failed(product_id, upload=None):
+    updated = Product.objects.filter(id=product_id, image_upload=upload or "").update(
+        image_status=Product.IMAGE_FAILED, image_upload=""
+    )
+    if updated:
+        images.discard(upload)
+
+
+@task(max_attempts=5, on_failure=image_failed)
+def process_product_image(product_id, upload=None):
+    """
+    Upload a staged product image (``upload``, from images.stage) and
+    record its variants; without ``upload``, just (re)build the variants of
+    the current image. A newer upload supersedes this one.
+    """
+    product = Product.objects.filter(id=product_id).first()
+    if product is None or (upload and product.image_upload != upload):
+        images.discard(upload)
+        return
+
+    if upload:
+        with open(images.staged_path(upload), "rb") as f:
+            product.image.save(images.original_name(upload), File(f), save=False)
+    if not product.image:
+        return
+    name = product.image.name
+    variants = images.build_variants(product.image.storage, name)
+
+    replaced = None
+    with transaction.atomic():
+        current = Product.objects.select_for_update().filter(id=product_id).first()
+        superseded = (
+            current is None
+            or current.image_upload != (upload or "")
+            or (not upload and current.image.name != name)
+        )
+        if not superseded:
+            if current.image.name != name:
+                replaced = current.image.name
+            current.image = name
+            current.image_variants = variants
+            current.image_status = Product.IMAGE_READY
+            current.image_upload = ""
+            current.save(update_fields=["image", "image_variants", "image_status", "image_upload", "updated_at"])
+    storage = product.image.storage
+    if superseded:
+        logger.info(f"Image {upload or name} for product {product_id} was superseded")
+        if upload:
+            images.delete_stored(storage, name)  # uploaded above, now referenced by nothing
+    elif replaced:
+        images.delete_stored(storage, replaced)
+    images.discard(upload)
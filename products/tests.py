@@ -1,8 +1,24 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
+from PIL import Image
+from core.cache import tiered
+from jobs.queue import run_pending
+from orders.models import Order, OrderItem
+from products import images
 from products.models import Product
+from products.tasks import process_product_image
 
 User = get_user_model()
 
@@ -11,6 +27,7 @@ class ProductPermissionTests(TestCase):
     """Test that product mutations require staff permissions"""
     
     def setUp(self):
+        tiered.clear()
         self.client = APIClient()
         
         # Create regular user
@@ -105,3 +122,244 @@ class ProductPermissionTests(TestCase):
         self.client.force_authenticate(user=self.user)
         response = self.client.get(f'/api/products/{self.product.id}/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProductExportTests(TestCase):
+    """Test the staff-only streaming product export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+        Product.objects.create(name='In Stock', price=10, category='men', description='Test description', stock=3)
+        Product.objects.create(name='Sold Out', price=10, category='women', description='Test description', stock=0)
+
+    def test_regular_user_cannot_export(self):
+        self.client.force_authenticate(user=User.objects.create_user(email='u@test.com', password='testpass123'))
+        for fmt in ('csv', 'ndjson'):
+            response = self.client.get(f'/api/products/export/?format={fmt}')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('detail', response.json())
+
+    def test_export_filters(self):
+        self.client.force_authenticate(user=self.staff_user)
+        response = self.client.get('/api/products/export/?in_stock=true')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('In Stock', lines[1])
+
+
+class CatalogCacheTests(TestCase):
+    """Test that catalog reads are cached and invalidated on product writes"""
+
+    def setUp(self):
+        tiered.clear()
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(email='staff@test.com', password='testpass123', is_staff=True)
+        self.product = Product.objects.create(
+            name='Cached Product', price=10, category='men', description='A cached description', stock=3
+        )
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_list_and_detail_are_cached(self):
+        for path in ('/api/products/?category=men', f'/api/products/{self.product.id}/'):
+            _, first = self.get(path)
+            self.assertGreater(first, 0)
+            _, second = self.get(path)
+            self.assertEqual(second, 0)
+
+    def test_product_update_invalidates_catalog(self):
+        self.get('/api/products/')
+        self.client.force_authenticate(user=self.staff_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/products/{self.product.id}/', {'stock': 7})
+        self.client.force_authenticate(user=None)
+
+        response, _ = self.get('/api/products/')
+        self.assertEqual(response.data[0]['stock'], 7)
+
+    def test_stock_only_saves_keep_catalog_until_sold_out(self):
+        self.get('/api/products/')
+        product = Product.objects.get(id=self.product.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 1
+            product.save(update_fields=['stock', 'updated_at'])
+        response, queries = self.get('/api/products/')
+        self.assertEqual((response.data[0]['stock'], queries), (3, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 0
+            product.save(update_fields=['stock', 'updated_at'])
+        response, _ = self.get('/api/products/')
+        self.assertEqual(response.data[0]['stock'], 0)
+
+    def test_cancel_restocking_a_sold_out_product_invalidates_catalog(self):
+        Product.objects.filter(id=self.product.id).update(stock=0)
+        order = Order.objects.create(user=self.staff_user, payment_method='cod', total_amount=20)
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, price=10)
+        response, _ = self.get('/api/products/')
+        self.assertEqual(response.data[0]['stock'], 0)
+
+        self.client.force_authenticate(user=self.staff_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/orders/{order.id}/cancel/')
+        self.client.force_authenticate(user=None)
+
+        response, _ = self.get('/api/products/')
+        self.assertEqual(response.data[0]['stock'], 2)
+
+    def test_not_found_is_not_cached(self):
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/products/999999/')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(len(queries), 1)
+
+
+def png_upload(width=1600, height=800, name='shirt.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ProductImagePipelineTests(TestCase):
+    """Test that image uploads are processed in the background into responsive variants"""
+
+    def setUp(self):
+        tiered.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        on_disk = override_settings(
+            STORAGES={'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+            MEDIA_ROOT=self.media_root,
+            IMAGE_STAGING_DIR=f'{self.media_root}/staging',
+        )
+        on_disk.enable()
+        self.addCleanup(on_disk.disable)
+
+        self.client = APIClient()
+        self.staff_user = User.objects.create_user(email='staff@test.com', password='testpass123', is_staff=True)
+        self.client.force_authenticate(user=self.staff_user)
+
+    def create(self, **extra):
+        data = {
+            'name': 'Image Product', 'price': 20, 'category': 'men',
+            'description': 'A product with an image', 'stock': 4, **extra,
+        }
+        return self.client.post('/api/products/create/', data, format='multipart')
+
+    def test_create_returns_before_the_upload(self):
+        with mock.patch('django.core.files.storage.FileSystemStorage._save') as save:
+            response = self.create(image=png_upload())
+        save.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['image_status'], 'pending')
+        self.assertIsNone(response.data['image'])
+        self.assertNotIn('image_upload', response.data)
+
+    def test_job_builds_variants_and_srcset(self):
+        product_id = self.create(image=png_upload()).data['id']
+        self.assertEqual(run_pending(), 1)
+
+        product = Product.objects.get(id=product_id)
+        self.assertEqual(product.image_status, Product.IMAGE_READY)
+        self.assertEqual(product.image_upload, '')
+        self.assertTrue(product.image.name.startswith('products/shirt'))
+        variants = product.image_variants
+        for variant, width in (('thumbnail', 200), ('medium', 600), ('full', 1200)):
+            self.assertTrue(variants[variant].endswith(f'_{width}w.jpg'))
+            self.assertIn(f'{variants[variant]} {width}w', variants['srcset'])
+        with Image.open(product.image.storage.path(variants['medium'].removeprefix('/media/'))) as medium:
+            self.assertEqual(medium.size, (600, 300))
+
+        response = self.client.get(f'/api/products/{product_id}/')
+        self.assertEqual(response.data['image'], variants['full'])
+        self.assertEqual(response.data['image_variants']['srcset'], variants['srcset'])
+
+    def test_reads_do_not_touch_storage(self):
+        product_id = self.create(image=png_upload()).data['id']
+        run_pending()
+        order = Order.objects.create(user=self.staff_user, total_amount=20)
+        OrderItem.objects.create(order=order, product_id=product_id, quantity=1, price=20)
+
+        with mock.patch('django.core.files.storage.FileSystemStorage.url') as url:
+            products = self.client.get('/api/products/')
+            orders = self.client.get('/api/orders/my/')
+        url.assert_not_called()
+        self.assertEqual(products.data[0]['image'], Product.objects.get(id=product_id).image_url())
+        self.assertTrue(orders.data[0]['items'][0]['image'].endswith('_200w.jpg'))
+
+    def test_newer_upload_supersedes_older(self):
+        product_id = self.create(image=png_upload(name='old.png')).data['id']
+        self.client.patch(f'/api/products/{product_id}/', {'image': png_upload(name='new.png')}, format='multipart')
+        run_pending()
+
+        product = Product.objects.get(id=product_id)
+        self.assertTrue(product.image.name.startswith('products/new'))
+        self.assertEqual(product.image_status, Product.IMAGE_READY)
+
+    def stored_files(self):
+        root = os.path.join(self.media_root, 'products')
+        return sorted(os.listdir(root)) if os.path.isdir(root) else []
+
+    def test_replaced_image_is_deleted_from_storage(self):
+        product_id = self.create(image=png_upload(name='old.png')).data['id']
+        run_pending()
+        self.client.patch(f'/api/products/{product_id}/', {'image': png_upload(name='new.png')}, format='multipart')
+        run_pending()
+
+        stored = self.stored_files()
+        self.assertEqual(len(stored), 4)
+        self.assertTrue(all(name.startswith('new') for name in stored))
+
+    def test_cleared_or_deleted_images_are_deleted_from_storage(self):
+        for clear in (True, False):
+            product_id = self.create(image=png_upload()).data['id']
+            run_pending()
+            self.assertEqual(len(self.stored_files()), 4)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                if clear:
+                    self.client.patch(f'/api/products/{product_id}/', {'image': ''}, format='multipart')
+                else:
+                    self.client.delete(f'/api/products/{product_id}/')
+            self.assertEqual(self.stored_files(), [])
+
+    def test_upload_superseded_mid_job_is_deleted_from_storage(self):
+        product_id = self.create(image=png_upload()).data['id']
+        build_variants = images.build_variants
+
+        def superseded_while_building(storage, name):
+            Product.objects.filter(id=product_id).update(image_upload='newer.png')
+            return build_variants(storage, name)
+
+        with mock.patch('products.images.build_variants', side_effect=superseded_while_building):
+            run_pending()
+        self.assertEqual(self.stored_files(), [])
+        self.assertIsNone(Product.objects.get(id=product_id).image.name or None)
+
+    def test_failure_is_recorded(self):
+        product_id = self.create(image=png_upload()).data['id']
+        with mock.patch('products.images.build_variants', side_effect=OSError('disk full')), \
+                mock.patch('jobs.queue.backoff', return_value=0):
+            run_pending()
+        product = Product.objects.get(id=product_id)
+        self.assertEqual((product.image_status, product.image_upload), (Product.IMAGE_FAILED, ''))
+
+    @skipUnless(settings.CLOUDINARY_ENABLED, 'Cloudinary is not configured')
+    def test_cloudinary_variants_are_transformation_urls(self):
+        from core.storage import InstrumentedMediaCloudinaryStorage
+
+        storage = InstrumentedMediaCloudinaryStorage()
+        url = storage.variant_url('products/shirt.png', 200)
+        self.assertIn('c_limit,f_auto,q_auto,w_200', url)
+        self.assertTrue(url.startswith('https://'))
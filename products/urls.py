@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import ProductListView, ProductCreateView, ProductDetailView
+from .views import ProductListView, ProductCreateView, ProductDetailView, ProductExportView
 
 urlpatterns = [
     path("", ProductListView.as_view(), name="product-list"),              # GET with filters
     path("create/", ProductCreateView.as_view(), name="product-create"),   # POST
+    path("export/", ProductExportView.as_view(), name="product-export"),   # GET (staff, CSV/NDJSON)
     path("<int:pk>/", ProductDetailView.as_view(), name="product-detail"), # GET, PUT, PATCH, DELETE
 ]
@@ -1,9 +1,14 @@
 from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework.views import APIView
 from django.db.models import Q
+from core.cache import cached_view
+from core.exports import CSVExportRenderer, NDJSONExportRenderer, streaming_export_response
+from .exports import PRODUCT_EXPORT_COLUMNS, product_export_rows
 from .models import Product
 from .serializers import ProductSerializer
+from .signals import CATALOG_NAMESPACE
 
 
 class ProductListView(ListAPIView):
@@ -12,6 +17,10 @@ class ProductListView(ListAPIView):
     filter_backends = [SearchFilter]
     search_fields = ["name", "description"]
 
+    @cached_view(CATALOG_NAMESPACE, timeout=300, stale_for=60)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_queryset(self):
         queryset = super().get_queryset()
 
@@ -40,9 +49,30 @@ class ProductCreateView(CreateAPIView):
 class ProductDetailView(RetrieveUpdateDestroyAPIView):
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
-    
+
+    @cached_view(CATALOG_NAMESPACE, timeout=300, stale_for=60)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_permissions(self):
         # Allow anyone to view (GET), but only staff can update/delete
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAdminUser()]
+
+
+class ProductExportView(APIView):
+    """
+    Staff-only streaming export of the catalog.
+
+    ?format=csv (default) or ?format=ndjson; filters: category, in_stock, from, to.
+    """
+    permission_classes = [IsAdminUser]
+    request_class = "export"  # core.deadlines
+    renderer_classes = [CSVExportRenderer, NDJSONExportRenderer]
+
+    def get(self, request, format=None):
+        rows = product_export_rows(request.query_params)
+        return streaming_export_response(
+            request.accepted_renderer.format, PRODUCT_EXPORT_COLUMNS, rows, "products"
+        )
@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
@@ -12,7 +13,16 @@ env_path = BASE_DIR / ".env"
 if env_path.exists():
     load_dotenv(env_path)
 
+# STORE_PROFILE=local runs the whole app on one box with no external
+# services: SQLite unless DATABASE_URL says otherwise, media on the local
+# filesystem unless Cloudinary credentials are set, and the in-process fake
+# Stripe (core.fake_stripe) unless Stripe keys are set. For development,
+# load tests and profiling only.
+LOCAL_PROFILE = os.getenv("STORE_PROFILE", "production") == "local"
+
 SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY and LOCAL_PROFILE:
+    SECRET_KEY = "local-profile-insecure-secret-key"
 if not SECRET_KEY:
     raise RuntimeError("SECRET_KEY missing")
 
@@ -51,14 +61,19 @@ INSTALLED_APPS = [
     "cloudinary",
     "cloudinary_storage",
 
+    "core",
     "accounts",
     "products",
     "cart",
     "orders",
     "panel",
+    "jobs",
 ]
 
 MIDDLEWARE = [
+    "core.instrumentation.InstrumentationMiddleware",  # First, so its timings cover everything
+    "core.deadlines.DeadlineMiddleware",  # Sheds before any other work is done
+    "core.replica.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # Serve static files in production
@@ -91,16 +106,74 @@ WSGI_APPLICATION = "store.wsgi.application"
 
 # --- Database ---
 DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL and LOCAL_PROFILE:
+    DATABASE_URL = f"sqlite:///{BASE_DIR / 'local.sqlite3'}"
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL missing")
 
-DATABASES = {
-    "default": dj_database_url.parse(
-        DATABASE_URL,
-        conn_max_age=600,
-        ssl_require=False if DEBUG else True,
+# TLS to the database; defaults to on outside DEBUG and the local profile.
+# SQLite has no such option.
+DB_SSL_REQUIRE = (
+    os.getenv("DB_SSL_REQUIRE", str(not DEBUG and not LOCAL_PROFILE)) == "True"
+    and not DATABASE_URL.startswith("sqlite")
+)
+
+# DB_POOL=True uses psycopg3's native pool (Django 5.1+). Pooled
+# connections are returned to the pool at the end of each request, so
+# persistent connections (CONN_MAX_AGE) must be off. Without the pool each
+# worker thread keeps its own connection for DB_CONN_MAX_AGE seconds.
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+
+def _database(url):
+    return dj_database_url.parse(
+        url,
+        conn_max_age=0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        conn_health_checks=os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
+        ssl_require=DB_SSL_REQUIRE and not url.startswith("sqlite"),
     )
-}
+
+
+DATABASES = {"default": _database(DATABASE_URL)}
+
+# Optional read replica: GET requests read from it unless the user wrote
+# moments ago or it is down or lagging (core.replica). Tests mirror it
+# onto the default test database.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = _database(DATABASE_REPLICA_URL)
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["core.replica.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))  # read-your-writes window
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))  # seconds behind before reads fall back
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+for database in DATABASES.values():
+    if database["ENGINE"] == "django.db.backends.sqlite3":
+        # Web threads and the job worker write concurrently: take the write lock
+        # at BEGIN (so waiting uses the busy timeout instead of failing) and let
+        # readers run alongside the writer
+        database.setdefault("OPTIONS", {}).update({
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+            "init_command": "PRAGMA journal_mode=WAL;",
+        })
+
+    if DB_POOL and database["ENGINE"] == "django.db.backends.postgresql":
+        from psycopg_pool import ConnectionPool
+
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),  # max wait for a free connection
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            # Health check on checkout: a cheap round trip that discards dead connections
+            "check": ConnectionPool.check_connection,
+        }
+
+# Seconds between each worker's copies of its pool stats into the db_pool_* metrics (core.db)
+DB_POOL_METRICS_INTERVAL = float(os.getenv("DB_POOL_METRICS_INTERVAL", "5"))
 
 AUTH_USER_MODEL = "accounts.User"
 
@@ -188,7 +261,7 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # WhiteNoise configuration for serving static files
 STORAGES = {
     "default": {
-        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage",
+        "BACKEND": "core.storage.InstrumentedMediaCloudinaryStorage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
@@ -202,32 +275,139 @@ cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
 api_key = os.getenv("CLOUDINARY_API_KEY")
 api_secret = os.getenv("CLOUDINARY_API_SECRET")
 
-if not cloud_name or not api_key or not api_secret:
-    raise RuntimeError("Cloudinary credentials missing")
-
-CLOUDINARY_STORAGE = {
-    "CLOUD_NAME": cloud_name,
-    "API_KEY": api_key,
-    "API_SECRET": api_secret,
-}
+CLOUDINARY_ENABLED = bool(cloud_name and api_key and api_secret)
 
+if CLOUDINARY_ENABLED:
+    CLOUDINARY_STORAGE = {
+        "CLOUD_NAME": cloud_name,
+        "API_KEY": api_key,
+        "API_SECRET": api_secret,
+    }
 
-cloudinary.config(
-    cloud_name=cloud_name,
-    api_key=api_key,
-    api_secret=api_secret,
-    secure=True,
-)
+    cloudinary.config(
+        cloud_name=cloud_name,
+        api_key=api_key,
+        api_secret=api_secret,
+        secure=True,
+    )
+elif LOCAL_PROFILE:
+    # Media on disk, served by store.urls
+    STORAGES["default"] = {"BACKEND": "django.core.files.storage.FileSystemStorage"}
+    INSTALLED_APPS.remove("cloudinary_storage")
+else:
+    raise RuntimeError("Cloudinary credentials missing")
 
 MEDIA_URL = "/media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+
+# Product image uploads wait here for the image job (products.images); the
+# web and run_jobs processes must share it
+IMAGE_STAGING_DIR = os.getenv("IMAGE_STAGING_DIR", BASE_DIR / "media-staging")
 
 # --- Stripe ---
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 
-if not STRIPE_SECRET_KEY or not STRIPE_WEBHOOK_SECRET:
+# Outbound HTTP (core.http), per service: (connect, read) timeouts in
+# seconds, retries, pool size, and the circuit breaker (open after N
+# failures in a row, probe again after breaker_reset seconds). Keys left
+# out use core.http.DEFAULTS.
+OUTBOUND_HTTP = {
+    "stripe": {
+        "read_timeout": float(os.getenv("STRIPE_TIMEOUT", "10")),
+        "breaker_failures": int(os.getenv("STRIPE_BREAKER_FAILURES", "5")),
+    },
+    "google": {"read_timeout": 5},
+    "cloudinary": {"read_timeout": float(os.getenv("CLOUDINARY_TIMEOUT", "30")), "retries": 1},
+    "default": {"read_timeout": 10},
+}
+
+# Fake Stripe (local profile only): API latency, and seconds until the
+# fake customer pays and the webhook fires (negative: never)
+STRIPE_FAKE = LOCAL_PROFILE and os.getenv("STRIPE_FAKE", str(not STRIPE_SECRET_KEY)) == "True"
+STRIPE_FAKE_LATENCY_MS = int(os.getenv("STRIPE_FAKE_LATENCY_MS", "250"))
+STRIPE_FAKE_PAY_AFTER = float(os.getenv("STRIPE_FAKE_PAY_AFTER", "2"))
+
+if STRIPE_FAKE:
+    STRIPE_WEBHOOK_SECRET = STRIPE_WEBHOOK_SECRET or "whsec_local"
+elif not STRIPE_SECRET_KEY or not STRIPE_WEBHOOK_SECRET:
     raise RuntimeError("Stripe keys missing")
 
+# --- Caches ---
+# "shared" and "auth" are visible to every gunicorn worker on the host;
+# "auth" carries the user cache's cross-worker invalidations.
+CACHE_DIR = os.getenv("CACHE_DIR", "/tmp/souled-cache")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_DIR, "shared"),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # Entries that must not be culled to make room (accounts.user_cache
+    # invalidation tokens): they expire on their own, so it stays small
+    "auth": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(CACHE_DIR, "auth"),
+        "OPTIONS": {"MAX_ENTRIES": sys.maxsize},
+    },
+}
+
+# Tiered cache (core.cache.tiered): L1 per-process LRU in front of "shared"
+CACHE_L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", "2048"))
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", "30"))
+CACHE_VERSION_TTL = int(os.getenv("CACHE_VERSION_TTL", "2"))
+CACHE_WAIT_TIMEOUT = float(os.getenv("CACHE_WAIT_TIMEOUT", "5"))
+
+# Cross-process single-flight lock files (core.singleflight)
+SINGLEFLIGHT_DIR = os.getenv("SINGLEFLIGHT_DIR", os.path.join(CACHE_DIR, "singleflight"))
+
+# Sliding-window rate limit counters shared by all workers (core.ratelimit)
+RATELIMIT_DB_PATH = os.getenv("RATELIMIT_DB_PATH", os.path.join(CACHE_DIR, "ratelimit.sqlite3"))
+# Client address for the "ip" key: nginx overwrites X-Real-IP with the real
+# peer (deploy/nginx.conf); without the header (runserver, tests) REMOTE_ADDR
+RATELIMIT_IP_META_KEY = os.getenv("RATELIMIT_IP_META_KEY", "HTTP_X_REAL_IP")
+
+# Per-worker authenticated user cache (accounts.user_cache)
+AUTH_USER_CACHE_MAXSIZE = int(os.getenv("AUTH_USER_CACHE_MAXSIZE", "1024"))
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+
+# --- Request instrumentation (core.instrumentation) ---
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "True") == "True"
+# Per-view query budgets by URL name; views may also set `query_budget`
+QUERY_BUDGETS = {}
+QUERY_BUDGET_ACTION = os.getenv("QUERY_BUDGET_ACTION", "raise" if DEBUG else "log")
+
+# --- Request deadlines and load shedding (core.deadlines) ---
+# Per request class: total deadline and Postgres statement_timeout in
+# seconds (None: no limit), and the queue wait (nginx X-Request-Start)
+# after which the request is shed with a 503 (None: never). Views set
+# `request_class`; REQUEST_CLASS_ROUTES ({view name: class}) overrides it.
+DEADLINES_ENABLED = os.getenv("DEADLINES_ENABLED", "True") == "True"
+REQUEST_CLASSES = {
+    "critical": {"deadline": 60, "statement_timeout": 30, "shed_after": None},  # checkout, payments
+    "default": {"deadline": 30, "statement_timeout": 10, "shed_after": 30},
+    "low": {"deadline": 60, "statement_timeout": 30, "shed_after": float(os.getenv("SHED_LOW_AFTER", "2"))},
+    # Streaming exports: the server-side cursor is one statement for the whole download
+    "export": {"deadline": 60, "statement_timeout": None, "shed_after": float(os.getenv("SHED_LOW_AFTER", "2"))},
+}
+REQUEST_CLASS_ROUTES = {}
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "5"))
+
+# --- Background jobs (jobs app, `manage.py run_jobs`) ---
+JOBS_WORKER_THREADS = int(os.getenv("JOBS_WORKER_THREADS", "2"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1"))  # idle sleep, seconds
+JOBS_BACKOFF_BASE = float(os.getenv("JOBS_BACKOFF_BASE", "5"))  # first retry delay, doubling after
+JOBS_BACKOFF_MAX = float(os.getenv("JOBS_BACKOFF_MAX", "3600"))
+JOBS_STALE_AFTER = int(os.getenv("JOBS_STALE_AFTER", "600"))  # running this long = worker died
+JOBS_KEEP_DONE_DAYS = int(os.getenv("JOBS_KEEP_DONE_DAYS", "7"))
+
+# Bearer token required by /metrics when set (nginx also limits it to localhost)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 # --- Logging ---
 LOGGING = {
     "version": 1,